@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Railway Track Monitoring System - Speed and Delay Anomalies
+Streaming detector of abnormal train behaviour.  Every train keeps robust
+running statistics of its speed and delay in fixed-size arrays: an
+exponentially weighted mean and mean absolute deviation, updated with
+winsorized samples so a single outlier barely moves them.  A sample whose
+z-score against those statistics exceeds ``ANOMALY_Z`` is flagged.
+
+A batch of samples is scored and folded into the statistics in one
+vectorized pass over all fields, so the cost per sample is a handful of
+array operations whatever the fleet size.  Flags are written to the
+``Anomaly`` column of the store, so the live and congested tables show
+them.
+"""
+
+import numpy as np
+
+import config
+from instrumentation import instrument
+from network_generator import SCHEMAS, LABELS
+from track_store import column_samples, synchronized
+
+FIELDS = ('speed', 'delay')
+
+# Mean absolute deviation of a normal distribution is 0.7979 sigma
+_MAD_TO_SIGMA = 1.2533
+
+
+class AnomalyDetector:
+    """Robust EWMA z-scores of speed and delay per train, flagged into a store's Anomaly column.
+
+    Trains are integer keys in ``range(size)``; by default one per store
+    row, which is how the apps keep one train per live track.  Samples
+    arrive through ``ingest`` or, keyed by row, from every store update of
+    the Speed or Delay columns.
+    """
+
+    def __init__(self, store, schema='streamlit', size=None):
+        self.store = store
+        self.names = SCHEMAS[schema]
+        self.labels = LABELS[schema]['anomalies']
+        self.column = self.names['anomaly']
+        size = len(store) if size is None else size
+        self._columns = {self.names[field]: field for field in FIELDS}
+        self.train_column = self.names['train']
+
+        self.mean = np.zeros((len(FIELDS), size), dtype=np.float32)
+        self.deviation = np.zeros((len(FIELDS), size), dtype=np.float32)
+        self.samples = np.zeros((len(FIELDS), size), dtype=np.int32)
+        self.score = np.zeros((len(FIELDS), size), dtype=np.float32)  # z-score of each train's latest sample
+        self.flags = np.zeros(size, dtype=np.uint8)  # Bit i set: FIELDS[i] is anomalous
+        self.min_scale = np.array([config.ANOMALY_MIN_SCALE[field] for field in FIELDS], dtype=np.float32)[:, None]
+
+        if self.column not in store.columns:
+            store.set_values(store.rows(), {self.column: np.full(len(store), self.labels[0], dtype=object)})
+        rows = store.rows()
+        self.ingest(rows, {field: self._column_values(field, rows) for field in FIELDS})
+        store.subscribe(self.on_store_change)
+
+    def _column_values(self, field, rows):
+        column = self.names[field]
+        if column not in self.store.columns:
+            return np.full(len(rows), np.nan)
+        # A blank cell is no sample
+        return column_samples(self.store, column, rows)
+
+    def reset(self, trains):
+        """Forget the statistics and flags of ``trains`` (another train, or none, now runs there)"""
+        trains = np.asarray(trains, dtype=np.int64)
+        self.mean[:, trains] = 0.0
+        self.deviation[:, trains] = 0.0
+        self.samples[:, trains] = 0
+        self.score[:, trains] = 0.0
+        self.flags[trains] = 0
+
+    def on_store_change(self, rows, columns):
+        """Store listener: new speed or delay values are samples of the trains on those rows.
+
+        A track changing category or train starts over, so the statistics of
+        the previous train never judge the next one.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if 'category' in columns or self.train_column in columns:
+            self.reset(rows)
+            self.publish(rows, self.flags[rows])
+        fields = [self._columns[column] for column in columns if column in self._columns]
+        if fields:
+            self.ingest(rows, {field: self._column_values(field, rows) for field in fields})
+
+    # ------------------------------------------------------------------
+    # Streaming update
+    # ------------------------------------------------------------------
+    @instrument("anomaly_detector.ingest")
+    @synchronized
+    def ingest(self, trains, samples, rows=None):
+        """Score ``{field: values}`` samples of ``trains`` and update their statistics.
+
+        Missing fields and NaN values are no sample.  ``rows`` are the store
+        rows the trains run on (the trains themselves by default); their
+        Anomaly cells are updated.  Returns the flags of ``trains``.
+        """
+        trains = np.asarray(trains, dtype=np.int64)
+        x = np.full((len(FIELDS), len(trains)), np.nan, dtype=np.float32)
+        for index, field in enumerate(FIELDS):
+            if field in samples:
+                x[index] = samples[field]
+
+        mean = self.mean[:, trains]
+        deviation = self.deviation[:, trains]
+        count = self.samples[:, trains]
+        valid = ~np.isnan(x)
+        first = valid & (count == 0)
+
+        scale = np.maximum(_MAD_TO_SIGMA * deviation, self.min_scale)
+        with np.errstate(invalid='ignore'):
+            z = np.where(valid, (x - mean) / scale, 0.0)
+            flagged = valid & (count >= config.ANOMALY_WARMUP_SAMPLES) & (np.abs(z) > config.ANOMALY_Z)
+
+            # Winsorized update: an outlier counts as a sample at the clip limit
+            limit = config.ANOMALY_CLIP * scale
+            clipped = np.clip(x, mean - limit, mean + limit)
+            # Plain averages until a train has 1 / ALPHA samples, so the deviation is not underestimated early
+            alpha = np.maximum(config.ANOMALY_ALPHA, 1.0 / np.maximum(count + 1, 1)).astype(np.float32)
+            new_mean = np.where(first, x, np.where(valid, mean + alpha * (clipped - mean), mean))
+            new_deviation = np.where(first, 0.0,
+                                     np.where(valid, deviation + alpha * (np.abs(clipped - mean) - deviation), deviation))
+
+        self.mean[:, trains] = new_mean
+        self.deviation[:, trains] = new_deviation
+        self.samples[:, trains] = count + valid
+        self.score[:, trains] = np.where(valid, z, self.score[:, trains])
+        # A field without a sample keeps its flag
+        bits = (1 << np.arange(len(FIELDS), dtype=np.uint8))[:, None]
+        old = self.flags[trains]
+        flags = ((old & ~(np.bitwise_or.reduce(bits * valid, axis=0))) | np.bitwise_or.reduce(bits * flagged, axis=0))
+        self.flags[trains] = flags = flags.astype(np.uint8)
+
+        self.publish(trains if rows is None else np.asarray(rows, dtype=np.int64), flags)
+        return flags
+
+    def publish(self, rows, flags):
+        """Write the labels of ``flags`` to the Anomaly cells of ``rows`` that change"""
+        # Several trains on one track: the track shows every anomaly among them
+        rows, inverse = np.unique(rows, return_inverse=True)
+        merged = np.zeros(len(rows), dtype=np.uint8)
+        np.bitwise_or.at(merged, inverse, flags)
+        labels = np.array(self.labels, dtype=object)[merged]
+        changed = labels != self.store.columns[self.column][rows]
+        if changed.any():
+            self.store.set_values(rows[changed], {self.column: labels[changed]})
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    @synchronized
+    def flagged(self, rows=None):
+        """Store rows (among ``rows``) whose Anomaly cell is set"""
+        rows = self.store.rows() if rows is None else np.asarray(rows, dtype=np.int64)
+        return rows[self.store.columns[self.column][rows] != self.labels[0]]
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Railway Track Monitoring System - Benchmark Suite
+Times the hot paths of both applications headlessly at several network
+sizes, reports p50/p95 latency and peak memory as JSON and compares the
+results against stored baselines.
+
+Usage:
+    python run_application.py --bench
+    python benchmark.py --sizes 1000,10000 --repeat 5 --output bench_output.txt
+    python benchmark.py --save-baseline
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+import config
+
+
+class HeadlessCanvas:
+    """Minimal stand-in for ``tkinter.Canvas`` that records items without a display.
+
+    Only the calls the track renderer makes are implemented.  ``after_idle``
+    callbacks are queued and run by :meth:`flush`, the way Tk runs them once
+    the event loop goes idle.
+    """
+
+    def __init__(self, width=1000, height=430):
+        self.width = width
+        self.height = height
+        self.items = {}
+        self.idle = deque()
+        self._next_id = 0
+
+    def winfo_width(self):
+        return self.width
+
+    def winfo_height(self):
+        return self.height
+
+    def bind(self, sequence, callback, add=None):
+        pass
+
+    def after_idle(self, callback):
+        self.idle.append(callback)
+        return len(self.idle)
+
+    def flush(self):
+        """Run pending idle callbacks"""
+        while self.idle:
+            self.idle.popleft()()
+
+    def _create(self, kind, coords, options):
+        self._next_id += 1
+        self.items[self._next_id] = {'kind': kind, 'coords': list(coords), 'options': options}
+        return self._next_id
+
+    def create_line(self, *coords, **options):
+        return self._create('line', coords, options)
+
+    def create_oval(self, *coords, **options):
+        return self._create('oval', coords, options)
+
+    def create_text(self, *coords, **options):
+        return self._create('text', coords, options)
+
+    def create_image(self, *coords, **options):
+        return self._create('image', coords, options)
+
+    def coords(self, item, *coords):
+        if coords:
+            self.items[item]['coords'] = list(coords)
+        return self.items[item]['coords']
+
+    def itemconfig(self, item, **options):
+        self.items[item]['options'].update(options)
+
+    def delete(self, item):
+        self.items.pop(item, None)
+
+    def move(self, tag, dx, dy):
+        for item in self.items.values():
+            if tag in item['options'].get('tags', ()):
+                item['coords'] = [value + (dx if index % 2 == 0 else dy)
+                                  for index, value in enumerate(item['coords'])]
+
+    def tag_lower(self, tag):
+        pass
+
+    def tag_raise(self, tag):
+        pass
+
+
+def headless_renderer(store):
+    """Canvas renderer drawing onto a :class:`HeadlessCanvas`"""
+    from canvas_renderer import CanvasTrackRenderer
+
+    class HeadlessTrackRenderer(CanvasTrackRenderer):
+        def photo_image(self, image):
+            return image
+
+    return HeadlessTrackRenderer(HeadlessCanvas(), store, padding=60)
+
+
+def measure(function, repeat, setup=None):
+    """Time ``function`` ``repeat`` times and trace its peak memory once.
+
+    ``setup`` runs untimed before every call and its result is passed on.
+    """
+    prepare = setup or (lambda: None)
+    call = function if setup else (lambda _: function())
+    call(prepare())  # warm-up
+
+    durations = []
+    for _ in range(repeat):
+        argument = prepare()
+        started = time.perf_counter()
+        call(argument)
+        durations.append((time.perf_counter() - started) * 1000)
+
+    argument = prepare()
+    tracemalloc.start()
+    call(argument)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'p50_ms': round(float(np.percentile(durations, 50)), 3),
+        'p95_ms': round(float(np.percentile(durations, 95)), 3),
+        'peak_kb': round(peak / 1024, 1),
+        'runs': repeat,
+    }
+
+
+def streamlit_benchmarks(size):
+    """Folium map build and HTML serialization, and the DataFrame-building views"""
+    import streamlit.logger
+    import railway_track_monitoring_streamlit as web
+    streamlit.logger.set_log_level("error")  # bare-mode ScriptRunContext warnings
+
+    config.SYNTHETIC_NETWORK_TRACKS = size
+    config.TELEMETRY_ENABLED = False  # No background store writes while timing
+    app = web.RailwayTrackMonitoringStreamlit()
+    benchmarks = {
+        'streamlit.show_live_tracks': lambda: web.show_live_tracks(app),
+        'streamlit.show_congested_tracks': lambda: web.show_congested_tracks(app),
+        'streamlit.show_blocked_tracks': lambda: web.show_blocked_tracks(app),
+        'streamlit.show_free_tracks': lambda: web.show_free_tracks(app),
+    }
+    if web.MAP_AVAILABLE:
+        def build_map():
+            return web.build_track_map(app, "OpenStreetMap", "Medium", True, True, False)
+        benchmarks['streamlit.build_track_map'] = build_map
+        benchmarks['streamlit.map_html'] = (lambda m: m.get_root().render(), build_map)
+    return benchmarks
+
+
+def tkinter_benchmarks(size):
+    """Live data refresh and schematic drawing against a headless canvas"""
+    from railway_track_monitoring_tkinter import RailwayTrackMonitoringApp
+
+    config.SYNTHETIC_NETWORK_TRACKS = size
+    # The data side of the app needs no window
+    app = RailwayTrackMonitoringApp.__new__(RailwayTrackMonitoringApp)
+    app.initialize_mock_data()
+    renderer = headless_renderer(app.track_store)
+    renderer.render()
+
+    def refresh_live_data():
+        app.update_live_data()
+        renderer.canvas.flush()
+
+    zoom = {'level': 0}
+
+    def zoom_in():
+        # A new zoom level every call, so the static raster is drawn cold
+        zoom['level'] += 1
+        if zoom['level'] > 12:
+            zoom['level'] = 0
+            renderer.reset_view()
+        renderer.zoom_at(1.25, renderer.canvas.width / 2, renderer.canvas.height / 2)
+
+    def fitted_view():
+        renderer.reset_view()
+        return renderer
+
+    def first_render(fresh):
+        fresh.render()
+        app.track_store.unsubscribe(fresh.on_store_change)
+
+    return {
+        'tkinter.refresh_live_data': refresh_live_data,
+        'schematic.first_render': (first_render, lambda: headless_renderer(app.track_store)),
+        'schematic.zoom': zoom_in,
+        'schematic.pan': (lambda view: view.pan(40, 0), fitted_view),
+    }
+
+
+def telemetry_benchmarks(size):
+    """Telemetry batches through the alert rules and the anomaly detector"""
+    from network_generator import generate_network
+    from operations_simulator import TelemetryStream, store_trains
+    from alert_rules import AlertEngine
+    from anomaly_detector import AnomalyDetector
+
+    store = generate_network(size, seed=config.SYNTHETIC_NETWORK_SEED, schema='tkinter')
+    alerts = AlertEngine(store, schema='tkinter')
+    anomalies = AnomalyDetector(store, schema='tkinter')
+    stream = TelemetryStream(store, store_trains(store, 'tkinter'), start_time=alerts.origin)
+
+    def ingest_batch():
+        batch = stream.next_batch(config.TELEMETRY_INTERVAL_S)
+        samples = {'speed': batch['speed_kmh'], 'delay': batch['delay_min']}
+        alerts.ingest(batch['track_row'], samples, batch['timestamp'][0])
+        anomalies.ingest(batch['train'], samples, rows=batch['track_row'])
+
+    return {'telemetry.ingest_batch': ingest_batch}
+
+
+def run_benchmarks(sizes, repeat, only=None):
+    """Run every benchmark at every size; returns ``{size: {name: stats}}``"""
+    results = {}
+    saved_tracks = config.SYNTHETIC_NETWORK_TRACKS
+    try:
+        for size in sizes:
+            results[str(size)] = {}
+            for suite in (streamlit_benchmarks, tkinter_benchmarks, telemetry_benchmarks):
+                for name, benchmark in suite(size).items():
+                    if only and not any(part in name for part in only):
+                        continue
+                    function, setup = benchmark if isinstance(benchmark, tuple) else (benchmark, None)
+                    results[str(size)][name] = measure(function, repeat, setup)
+                    print(f"   {size:>8,} {name:<34} p50 {results[str(size)][name]['p50_ms']:>10.2f} ms",
+                          file=sys.stderr)
+    finally:
+        config.SYNTHETIC_NETWORK_TRACKS = saved_tracks
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """List p50/p95/peak changes against the baseline; flags changes above ``tolerance``"""
+    comparison = []
+    for size, benchmarks in results.items():
+        for name, stats in benchmarks.items():
+            reference = baseline.get(size, {}).get(name)
+            if not reference:
+                continue
+            for metric in ('p50_ms', 'p95_ms', 'peak_kb'):
+                if not reference.get(metric):
+                    continue
+                change = stats[metric] / reference[metric] - 1
+                comparison.append({
+                    'size': int(size), 'benchmark': name, 'metric': metric,
+                    'baseline': reference[metric], 'current': stats[metric],
+                    'change': round(change, 3), 'regression': change > tolerance,
+                })
+    return comparison
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as handle:
+        return json.load(handle).get('results', {})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the railway monitoring hot paths")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in config.BENCH_SIZES),
+                        help="comma-separated network sizes (tracks)")
+    parser.add_argument("--repeat", type=int, default=config.BENCH_REPEAT)
+    parser.add_argument("--only", default="", help="comma-separated benchmark name filters")
+    parser.add_argument("--baseline", default=config.BENCH_BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=config.BENCH_REGRESSION_TOLERANCE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--output", help="write the JSON report to a file instead of stdout")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    only = [part.strip() for part in args.only.split(",") if part.strip()]
+
+    print(f"⏱️  Benchmarking {', '.join(f'{size:,}' for size in sizes)} tracks, {args.repeat} runs each",
+          file=sys.stderr)
+    results = run_benchmarks(sizes, args.repeat, only)
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'tolerance': args.tolerance,
+        },
+        'results': results,
+        'comparison': compare(results, load_baseline(args.baseline), args.tolerance),
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            handle.write(text + "\n")
+    else:
+        print(text)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as handle:
+            json.dump({'meta': report['meta'], 'results': results}, handle, indent=2)
+            handle.write("\n")
+        print(f"💾 Baseline saved to {args.baseline}", file=sys.stderr)
+        return 0
+
+    regressions = [entry for entry in report['comparison'] if entry['regression']]
+    for entry in regressions:
+        print(f"❌ {entry['benchmark']} @ {entry['size']:,}: {entry['metric']} "
+              f"{entry['baseline']} → {entry['current']} ({entry['change']:+.0%})", file=sys.stderr)
+    if not regressions:
+        print("✅ No regressions against the baseline", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,694 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Railway Track Monitoring System - Canvas Track Renderer
+Draws the track store on a Tkinter canvas with pan and zoom.  Off-screen
+tracks are culled through a uniform grid index, labels are hidden when
+zoomed out, and at far zoom tracks of the same style are merged into a small
+number of aggregated polylines so the canvas item count stays bounded.
+
+Rendering is split into two layers.  The static layer (stations, free tracks
+and labels) is rasterized with Pillow into cached image tiles once per zoom
+level; the dynamic layer (congested, live and blocked tracks plus train
+positions) is made of canvas items and is the only part redrawn per tick.
+"""
+
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+
+import config
+from map_projection import CanvasProjection, mercator, segment_lengths_km
+from track_store import CATEGORIES, parse_quantity
+
+# Pillow rasterizes the static layer; without it everything is drawn as canvas items
+try:
+    from PIL import Image, ImageDraw, ImageFont, ImageTk
+    RASTER_AVAILABLE = True
+except ImportError:
+    RASTER_AVAILABLE = False
+
+# Drawing styles, indexed by the codes returned from style_codes()
+STYLE_KEYS = ('high_congestion', 'medium_congestion', 'live_tracks', 'blocked_tracks', 'free_tracks')
+STYLE_ICONS = ('🔴', '🟠', '🟢', '🚫', '✅')
+STYLE_DASHES = ((), (), (), (10, 5), ())
+
+# Styles drawn into the cached static raster rather than as canvas items
+STATIC_STYLES = (STYLE_KEYS.index('free_tracks'),)
+
+# Store columns whose changes invalidate the static raster
+STATIC_COLUMNS = {'category', 'route', 'severity', 'route_coords'}
+
+
+def style_codes(store):
+    """Vectorized style code (index into STYLE_KEYS) for every track"""
+    codes = np.full(len(store), STYLE_KEYS.index('free_tracks'), dtype=np.int8)
+    category = store.category
+    codes[category == CATEGORIES.index('live_tracks')] = STYLE_KEYS.index('live_tracks')
+    codes[category == CATEGORIES.index('blocked_tracks')] = STYLE_KEYS.index('blocked_tracks')
+
+    congested = category == CATEGORIES.index('congested_tracks')
+    severity = store.columns.get('severity')
+    high = congested if severity is None else congested & (severity == 'high')
+    codes[congested] = STYLE_KEYS.index('medium_congestion')
+    codes[high] = STYLE_KEYS.index('high_congestion')
+    return codes
+
+
+def track_label(store, row, code, icons=True):
+    """Canvas label for one track (icons are left out for the Pillow raster)"""
+    route = store.value(row, 'route') if 'route' in store.columns else store.track_ids[row]
+    prefix = f"{STYLE_ICONS[code]} " if icons else ""
+    if code == 0:
+        return f"{prefix}{route} (HIGH)"
+    if code == 1:
+        return f"{prefix}{route} (MED)"
+    return f"{prefix}{route}"
+
+
+def station_points(store):
+    """Station names and [lat, lon] taken from the track end points"""
+    stations = {}
+    routes = store.columns.get('route')
+    for row in range(len(store)):
+        coords = store.route_coords(row)
+        names = str(routes[row]).split('-') if routes is not None else []
+        if len(coords) == 0 or len(names) < 2:
+            continue
+        stations.setdefault(names[0], coords[0])
+        stations.setdefault(names[-1], coords[-1])
+    names = list(stations)
+    coords = np.array([stations[name] for name in names], dtype=np.float64).reshape(-1, 2)
+    return names, coords
+
+
+def vertex_ranges(offsets, rows):
+    """Concatenated vertex indices of ``rows`` and the per-row vertex counts"""
+    starts = offsets[rows]
+    lengths = offsets[rows + 1] - starts
+    total = int(lengths.sum())
+    first = np.cumsum(lengths) - lengths
+    indices = np.arange(total, dtype=np.int64) + np.repeat(starts - first, lengths)
+    return indices, lengths
+
+
+class GridIndex:
+    """Uniform grid over track bounding boxes for fast viewport queries"""
+
+    def __init__(self, boxes, grid_size=64):
+        self.boxes = boxes
+        valid = np.isfinite(boxes).all(axis=1)
+        if valid.any():
+            self.low = boxes[valid, :2].min(axis=0)
+            high = boxes[valid, 2:].max(axis=0)
+        else:
+            self.low, high = np.zeros(2), np.ones(2)
+        self.grid_size = grid_size
+        self.cell = np.maximum((high - self.low) / grid_size, 1e-12)
+
+        rows = np.flatnonzero(valid)
+        x0, y0 = self._cells(boxes[rows, 0], boxes[rows, 1])
+        x1, y1 = self._cells(boxes[rows, 2], boxes[rows, 3])
+
+        # Expand every track into the cells its box covers, without a Python loop
+        nx, ny = x1 - x0 + 1, y1 - y0 + 1
+        counts = nx * ny
+        local = np.arange(int(counts.sum()), dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+        cell_x = np.repeat(x0, counts) + local % np.repeat(nx, counts)
+        cell_y = np.repeat(y0, counts) + local // np.repeat(nx, counts)
+        cell_ids = cell_y * grid_size + cell_x
+
+        order = np.argsort(cell_ids, kind='stable')
+        self.cell_ids = cell_ids[order]
+        self.cell_rows = np.repeat(rows, counts)[order]
+
+    @classmethod
+    def from_store(cls, store, points, grid_size=64):
+        """Build from projected (mercator) vertices laid out like ``store.coords``"""
+        boxes = np.full((len(store), 4), np.nan)
+        lengths = np.diff(store.coord_offsets)
+        rows = np.flatnonzero(lengths > 0)
+        if len(rows):
+            starts = store.coord_offsets[rows]
+            boxes[rows, 0] = np.minimum.reduceat(points[:, 0], starts)
+            boxes[rows, 1] = np.minimum.reduceat(points[:, 1], starts)
+            boxes[rows, 2] = np.maximum.reduceat(points[:, 0], starts)
+            boxes[rows, 3] = np.maximum.reduceat(points[:, 1], starts)
+        return cls(boxes, grid_size)
+
+    def _cells(self, x, y):
+        cx = np.clip(((x - self.low[0]) / self.cell[0]).astype(np.int64), 0, self.grid_size - 1)
+        cy = np.clip(((y - self.low[1]) / self.cell[1]).astype(np.int64), 0, self.grid_size - 1)
+        return cx, cy
+
+    def query(self, xmin, ymin, xmax, ymax):
+        """Rows whose bounding box intersects the given rectangle"""
+        (x0, x1), (y0, y1) = self._cells(np.array([xmin, xmax]), np.array([ymin, ymax]))
+        chunks = []
+        for cy in range(int(y0), int(y1) + 1):
+            lo = np.searchsorted(self.cell_ids, cy * self.grid_size + x0, side='left')
+            hi = np.searchsorted(self.cell_ids, cy * self.grid_size + x1, side='right')
+            chunks.append(self.cell_rows[lo:hi])
+        if not chunks:
+            return np.empty(0, dtype=np.int64)
+        candidates = np.unique(np.concatenate(chunks))
+
+        # Exact box test removes tracks that only share a cell with the view
+        boxes = self.boxes[candidates]
+        hit = (boxes[:, 0] <= xmax) & (boxes[:, 2] >= xmin) & (boxes[:, 1] <= ymax) & (boxes[:, 3] >= ymin)
+        return candidates[hit]
+
+
+def chain_edges(edges):
+    """Walk each connected component of an edge list as one polyline.
+
+    The walk is a depth-first traversal that retraces its steps, so every
+    edge is drawn without inventing connections between separate segments.
+    """
+    adjacency = defaultdict(list)
+    for a, b in edges:
+        adjacency[a].append(b)
+        adjacency[b].append(a)
+
+    visited = set()
+    drawn = set()
+    chains = []
+    for start in adjacency:
+        if start in visited:
+            continue
+        visited.add(start)
+        path = [start]
+        stack = [(start, iter(adjacency[start]))]
+        while stack:
+            node, neighbours = stack[-1]
+            for nxt in neighbours:
+                edge = (node, nxt) if node < nxt else (nxt, node)
+                if edge in drawn:
+                    continue
+                drawn.add(edge)
+                if nxt not in visited:
+                    visited.add(nxt)
+                    path.append(nxt)
+                    stack.append((nxt, iter(adjacency[nxt])))
+                    break
+                path.extend((nxt, node))
+            else:
+                stack.pop()
+                if stack:
+                    path.append(stack[-1][0])
+        chains.append(path)
+    return chains
+
+
+class CanvasTrackRenderer:
+    """Level-of-detail track renderer for a Tkinter canvas"""
+
+    def __init__(self, canvas, store, padding=60):
+        self.canvas = canvas
+        self.store = store
+        self.projection = CanvasProjection(padding=padding)
+        self.fitted = False
+
+        self.track_items = {}
+        self.free_items = []
+        self.aggregate_items = []
+        self.station_items = {}
+        self.title_item = None
+
+        self.tile_items = {}
+        self.train_items = []
+
+        self.drag_origin = None
+        self.drag_offset = np.zeros(2)
+        self.visible_count = 0
+        self.aggregated = False
+        self.static_version = 0
+        self._tile_cache = OrderedDict()
+        self._codes = None
+        self._index = None
+        self._index_key = None
+        self._stations = None
+        self._vertex_km = None
+        self._pending_render = None
+        self._static_dirty = False
+
+        self.store.subscribe(self.on_store_change)
+        self.canvas.bind("<Destroy>", self.on_destroy, add="+")
+
+    # ------------------------------------------------------------------
+    # View control
+    # ------------------------------------------------------------------
+    def bind_navigation(self):
+        """Mouse wheel zoom and drag-to-pan"""
+        self.canvas.bind("<MouseWheel>", lambda e: self.zoom_at(1.25 if e.delta > 0 else 0.8, e.x, e.y))
+        self.canvas.bind("<Button-4>", lambda e: self.zoom_at(1.25, e.x, e.y))
+        self.canvas.bind("<Button-5>", lambda e: self.zoom_at(0.8, e.x, e.y))
+        self.canvas.bind("<ButtonPress-1>", self.on_drag_start)
+        self.canvas.bind("<B1-Motion>", self.on_drag)
+        self.canvas.bind("<ButtonRelease-1>", self.on_drag_end)
+
+    def zoom_at(self, factor, x, y):
+        zoom = min(max(self.projection.zoom * factor, config.CANVAS_MIN_ZOOM), config.CANVAS_MAX_ZOOM)
+        self.projection.set_zoom(zoom, anchor=(x, y))
+        self.render()
+
+    def pan(self, dx, dy):
+        self.projection.pan_by(dx, dy)
+        self.render()
+
+    def reset_view(self):
+        self.projection.zoom = 1.0
+        self.projection.pan = np.zeros(2)
+        self.render()
+
+    def zoom_to(self, bounds):
+        """Centre the view on ``[[south, west], [north, east]]`` at the zoom that fits it"""
+        width, height = self.canvas_size()
+        projection = self.projection
+        if not self.fitted or (width, height) != (projection.width, projection.height):
+            projection.fit(self.store.coords, width, height)
+            self.fitted = True
+        points = mercator(np.asarray(bounds, dtype=np.float64))
+        low, high = points.min(axis=0), points.max(axis=0)
+        usable = np.maximum([width - 2 * projection.padding, height - 2 * projection.padding], 1)
+        zoom = min(usable / np.maximum(high - low, 1e-9)) / projection.base_scale
+        projection.zoom = float(min(max(zoom, config.CANVAS_MIN_ZOOM), config.CANVAS_MAX_ZOOM))
+        projection.pan = ((low + high) / 2 - projection.center) * projection.scale * np.array([-1.0, 1.0])
+        self.render()
+
+    def on_drag_start(self, event):
+        self.drag_origin = (event.x, event.y)
+        self.drag_offset = np.zeros(2)
+
+    def on_drag(self, event):
+        # Move the existing items for instant feedback; cull again on release
+        if self.drag_origin is None:
+            return
+        dx, dy = event.x - self.drag_origin[0], event.y - self.drag_origin[1]
+        step = np.array([dx, dy]) - self.drag_offset
+        self.canvas.move("track_layer", step[0], step[1])
+        self.drag_offset = np.array([dx, dy], dtype=np.float64)
+
+    def on_drag_end(self, event):
+        if self.drag_origin is None:
+            return
+        self.drag_origin = None
+        if self.drag_offset.any():
+            self.pan(*self.drag_offset)
+
+    # ------------------------------------------------------------------
+    # Culling
+    # ------------------------------------------------------------------
+    def grid_index(self):
+        """Grid index over track boxes, rebuilt only when the geometry changes"""
+        coords = self.store.coords
+        key = (id(coords), len(coords))
+        if self._index_key != key:
+            points = self.projection.mercator_cached('tracks', coords)
+            self._index = GridIndex.from_store(self.store, points, config.CANVAS_GRID_SIZE)
+            self._index_key = key
+        return self._index
+
+    def visible_rows(self):
+        """Rows whose bounding box overlaps the canvas"""
+        margin = 20
+        return self.grid_index().query(*self.projection.view_bounds(margin))
+
+    def labels_visible(self, count):
+        return config.SHOW_TRACK_LABELS and (
+            self.projection.zoom >= config.CANVAS_LABEL_MIN_ZOOM or count <= config.CANVAS_MAX_LABELS)
+
+    # ------------------------------------------------------------------
+    # Rendering
+    # ------------------------------------------------------------------
+    def canvas_size(self):
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        # Fall back to the requested size before the canvas is first mapped
+        return (width if width > 1 else 1000), (height if height > 1 else 430)
+
+    def style_codes(self):
+        if self._codes is None:
+            self._codes = style_codes(self.store)
+        return self._codes
+
+    def render(self):
+        """Draw the visible part of the network at the current level of detail"""
+        width, height = self.canvas_size()
+        projection = self.projection
+        if not self.fitted:
+            projection.fit(self.store.coords, width, height)
+            self.fitted = True
+        elif (width, height) != (projection.width, projection.height):
+            projection.fit(self.store.coords, width, height)
+
+        self._static_dirty = False
+        codes = self.style_codes()
+        rows = self.visible_rows()
+        if RASTER_AVAILABLE:
+            self.draw_static_layer(len(rows))
+        self.render_dynamic(self.dynamic_rows(rows, codes), codes)
+        if not RASTER_AVAILABLE:
+            self.draw_stations(self.labels_visible(len(rows)))
+        self.draw_title(width)
+
+    def dynamic_rows(self, rows, codes):
+        """Visible rows drawn as canvas items; the raster layer holds the rest"""
+        return rows[~np.isin(codes[rows], STATIC_STYLES)] if RASTER_AVAILABLE else rows
+
+    def render_dynamic(self, rows, codes):
+        """Redraw only the canvas-item layer (tracks and trains that change per tick)"""
+        self._pending_render = None
+        self.visible_count = len(rows)
+        self.aggregated = len(rows) > config.CANVAS_AGGREGATE_THRESHOLD
+
+        if self.aggregated:
+            self.release_track_items(set())
+            self.draw_aggregated(rows, codes)
+            self.draw_trains(np.empty(0, dtype=np.int64))
+        else:
+            self.hide_aggregates(0)
+            # With the raster layer, labels are part of the static image
+            show_labels = not RASTER_AVAILABLE and self.labels_visible(len(rows))
+            self.draw_tracks(rows, codes, show_labels)
+            self.draw_trains(rows[self.store.category[rows] == CATEGORIES.index('live_tracks')])
+
+    def on_store_change(self, rows, columns):
+        """Invalidate cached layers and schedule one redraw per batch of updates.
+
+        Updates of telemetry columns only redraw the canvas-item layer.
+        """
+        if STATIC_COLUMNS & set(columns):
+            self.static_version += 1
+            self._codes = None
+            self._stations = None
+            self._static_dirty = True
+        if 'route_coords' in columns:
+            self._vertex_km = None
+        if self._pending_render is None:
+            self._pending_render = self.canvas.after_idle(self.redraw)
+
+    def redraw(self):
+        """Scheduled redraw: every layer after a static change, otherwise only the dynamic one"""
+        if self._static_dirty or not self.fitted:
+            self.render()
+        else:
+            codes = self.style_codes()
+            self.render_dynamic(self.dynamic_rows(self.visible_rows(), codes), codes)
+
+    def on_destroy(self, event):
+        if event.widget is self.canvas:
+            self.store.unsubscribe(self.on_store_change)
+
+    def draw_title(self, width):
+        if self.title_item is None:
+            self.title_item = self.canvas.create_text(
+                0, 0, text="🗺️ Railway Network - Track Status Visualization",
+                font=("Arial", 16, "bold"), fill="#2c3e50")
+        self.canvas.coords(self.title_item, width // 2, 30)
+        self.canvas.tag_raise(self.title_item)
+
+    def release_track_items(self, keep):
+        """Hide items of rows that left the view and return them to the pool"""
+        for row in [row for row in self.track_items if row not in keep]:
+            line, label = self.track_items.pop(row)
+            self.canvas.itemconfig(line, state='hidden')
+            self.canvas.itemconfig(label, state='hidden')
+            self.free_items.append((line, label))
+
+    def draw_tracks(self, rows, codes, show_labels):
+        """One line (and optional label) per visible track, reusing pooled items"""
+        store = self.store
+        self.release_track_items(set(rows.tolist()))
+        points = self.projection.project_cached('tracks', store.coords)
+        label_state = 'normal' if show_labels else 'hidden'
+
+        for row in rows.tolist():
+            segment = points[store.coord_offsets[row]:store.coord_offsets[row + 1]]
+            if len(segment) < 2:
+                continue
+            code = int(codes[row])
+            key = STYLE_KEYS[code]
+            items = self.track_items.get(row)
+            if items is None:
+                if self.free_items:
+                    items = self.free_items.pop()
+                else:
+                    items = (self.canvas.create_line(0, 0, 0, 0, capstyle='round', tags=("track_layer",)),
+                             self.canvas.create_text(0, 0, font=("Arial", 8, "bold"), tags=("track_layer",)))
+                self.track_items[row] = items
+            line, label = items
+            mid_x, mid_y = segment.mean(axis=0)
+            self.canvas.coords(line, *segment.ravel().tolist())
+            self.canvas.itemconfig(line, fill=config.TRACK_COLORS[key], width=config.TRACK_WIDTHS[key],
+                                   dash=STYLE_DASHES[code], state='normal')
+            self.canvas.coords(label, mid_x, mid_y - 15)
+            if show_labels:
+                self.canvas.itemconfig(label, text=track_label(store, row, code),
+                                       fill=config.TRACK_COLORS[key], state=label_state)
+            else:
+                self.canvas.itemconfig(label, state=label_state)
+
+    def aggregate_polylines(self, rows, codes):
+        """Merge visible tracks into a bounded number of (code, flat coords) polylines"""
+        store = self.store
+        indices, lengths = vertex_ranges(store.coord_offsets, rows)
+        if len(indices) < 2:
+            return []
+        points = self.projection.mercator_to_canvas(
+            self.projection.mercator_cached('tracks', store.coords)[indices])
+
+        # Consecutive vertices of the same track form edges
+        same_track = np.ones(len(indices) - 1, dtype=bool)
+        same_track[np.cumsum(lengths)[:-1] - 1] = False
+        vertex_codes = np.repeat(codes[rows], lengths)[:-1][same_track]
+
+        cell_size = config.CANVAS_AGGREGATE_CELL
+        while True:
+            cells = np.floor(points / cell_size).astype(np.int64) + (1 << 20)
+            cell_ids = (cells[:, 0] << 21) | cells[:, 1]
+            a, b = cell_ids[:-1][same_track], cell_ids[1:][same_track]
+            moving = a != b
+            edges = np.column_stack((vertex_codes[moving], np.minimum(a, b)[moving], np.maximum(a, b)[moving]))
+            edges = np.unique(edges, axis=0)
+
+            polylines = []
+            for code in np.unique(edges[:, 0]).tolist():
+                for chain in chain_edges(edges[edges[:, 0] == code, 1:].tolist()):
+                    chain = np.array(chain, dtype=np.int64)
+                    xy = np.column_stack(((chain >> 21) - (1 << 20), (chain & ((1 << 21) - 1)) - (1 << 20)))
+                    polylines.append((code, ((xy + 0.5) * cell_size).ravel().tolist()))
+
+            # Coarsen the grid until the item budget holds
+            if len(polylines) <= config.CANVAS_MAX_ITEMS:
+                return polylines
+            cell_size *= 2
+
+    def draw_aggregated(self, rows, codes):
+        polylines = self.aggregate_polylines(rows, codes)
+        for index, (code, flat) in enumerate(polylines):
+            key = STYLE_KEYS[code]
+            if index == len(self.aggregate_items):
+                self.aggregate_items.append(
+                    self.canvas.create_line(0, 0, 0, 0, capstyle='round', joinstyle='round', tags=("track_layer",)))
+            item = self.aggregate_items[index]
+            if len(flat) < 4:
+                flat = flat * 2
+            self.canvas.coords(item, *flat)
+            self.canvas.itemconfig(item, fill=config.TRACK_COLORS[key],
+                                   width=max(1, config.TRACK_WIDTHS[key] // 2),
+                                   dash=STYLE_DASHES[code], state='normal')
+        self.hide_aggregates(len(polylines))
+
+    def hide_aggregates(self, start):
+        for item in self.aggregate_items[start:]:
+            self.canvas.itemconfig(item, state='hidden')
+
+    def draw_stations(self, show_labels):
+        """Station markers, culled to the view and hidden when too many are visible"""
+        if self._stations is None:
+            self._stations = station_points(self.store)
+        names, coords = self._stations
+        positions = self.projection.project_cached('stations', coords)
+        width, height = self.projection.width, self.projection.height
+        inside = ((positions[:, 0] >= 0) & (positions[:, 0] <= width) &
+                  (positions[:, 1] >= 0) & (positions[:, 1] <= height))
+        show = inside if inside.sum() <= config.CANVAS_MAX_STATIONS else np.zeros(len(names), dtype=bool)
+
+        for index in np.flatnonzero(show | np.isin(np.arange(len(names)), list(self.station_items))).tolist():
+            name = names[index]
+            x, y = positions[index]
+            items = self.station_items.get(index)
+            if items is None:
+                items = (self.canvas.create_oval(0, 0, 0, 0, fill="#34495e", outline="#2c3e50", width=2,
+                                                 tags=("track_layer",)),
+                         self.canvas.create_text(0, 0, text=name, font=("Arial", 9, "bold"), fill="#2c3e50",
+                                                 tags=("track_layer",)))
+                self.station_items[index] = items
+            circle, label = items
+            state = 'normal' if show[index] else 'hidden'
+            self.canvas.coords(circle, x-6, y-6, x+6, y+6)
+            self.canvas.coords(label, x, y+16)
+            self.canvas.itemconfig(circle, state=state)
+            self.canvas.itemconfig(label, state=state if show_labels else 'hidden')
+
+    # ------------------------------------------------------------------
+    # Static raster layer
+    # ------------------------------------------------------------------
+    def draw_static_layer(self, count):
+        """Place cached raster tiles of the static layer under the dynamic items (``count`` tracks in view)"""
+        projection = self.projection
+        size = config.CANVAS_RASTER_TILE_SIZE
+        origin = np.array([projection.width / 2, projection.height / 2]) + projection.pan
+        # Tile (tx, ty) covers view-independent pixels [tx*size, (tx+1)*size)
+        first = np.floor(-origin / size).astype(int)
+        last = np.floor((np.array([projection.width, projection.height]) - origin) / size).astype(int)
+        show_labels = self.labels_visible(count)
+        level = (round(projection.scale, 9), tuple(projection.center), self.static_version, show_labels)
+
+        wanted = set()
+        for tile_x in range(first[0], last[0] + 1):
+            for tile_y in range(first[1], last[1] + 1):
+                wanted.add((tile_x, tile_y))
+                image = self.raster_tile(level, tile_x, tile_y, show_labels)
+                x, y = origin + np.array([tile_x, tile_y]) * size
+                item = self.tile_items.get((tile_x, tile_y))
+                if item is None:
+                    item = self.canvas.create_image(x, y, anchor='nw', image=image,
+                                                    tags=("track_layer", "static_layer"))
+                    self.tile_items[(tile_x, tile_y)] = item
+                else:
+                    self.canvas.coords(item, x, y)
+                    self.canvas.itemconfig(item, image=image, state='normal')
+
+        for key in list(self.tile_items):
+            if key not in wanted:
+                self.canvas.delete(self.tile_items.pop(key))
+        self.canvas.tag_lower("static_layer")
+
+    def raster_tile(self, level, tile_x, tile_y, show_labels):
+        """PhotoImage for one static tile, rasterized once per zoom level"""
+        key = (level, tile_x, tile_y)
+        image = self._tile_cache.get(key)
+        if image is not None:
+            self._tile_cache.move_to_end(key)
+            return image
+
+        image = self.photo_image(self.rasterize_tile(tile_x, tile_y, show_labels))
+        self._tile_cache[key] = image
+        while len(self._tile_cache) > config.CANVAS_RASTER_CACHE_TILES:
+            self._tile_cache.popitem(last=False)
+        return image
+
+    def photo_image(self, image):
+        """Wrap a Pillow image for the canvas (headless renderers keep the Pillow image)"""
+        return ImageTk.PhotoImage(image)
+
+    def rasterize_tile(self, tile_x, tile_y, show_labels):
+        """Draw stations, free tracks and labels that fall inside one tile"""
+        projection = self.projection
+        store = self.store
+        size = config.CANVAS_RASTER_TILE_SIZE
+        image = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(image)
+        font = _raster_font()
+
+        # Tile pixels relative to the projection centre, grown for line widths and labels
+        margin = 80
+        left, top = tile_x * size, tile_y * size
+        scale, center = projection.scale, projection.center
+        bounds = ((left - margin) / scale + center[0], -(top + size + margin) / scale + center[1],
+                  (left + size + margin) / scale + center[0], -(top - margin) / scale + center[1])
+
+        def to_tile(points):
+            pixels = np.empty_like(points)
+            pixels[:, 0] = (points[:, 0] - center[0]) * scale - left
+            pixels[:, 1] = -(points[:, 1] - center[1]) * scale - top
+            return pixels
+
+        codes = self.style_codes()
+        mercator_points = projection.mercator_cached('tracks', store.coords)
+        rows = self.grid_index().query(*bounds)
+        for row in rows.tolist():
+            code = int(codes[row])
+            segment = mercator_points[store.coord_offsets[row]:store.coord_offsets[row + 1]]
+            if len(segment) < 2:
+                continue
+            pixels = to_tile(segment)
+            if code in STATIC_STYLES:
+                key = STYLE_KEYS[code]
+                draw.line([tuple(point) for point in pixels.tolist()], fill=config.TRACK_COLORS[key],
+                          width=config.TRACK_WIDTHS[key], joint="curve")
+            if show_labels:
+                mid_x, mid_y = pixels.mean(axis=0)
+                draw.text((mid_x, mid_y - 15), track_label(store, row, code, icons=False),
+                          fill=config.TRACK_COLORS[STYLE_KEYS[code]], font=font, anchor="mm")
+
+        if self._stations is None:
+            self._stations = station_points(store)
+        names, coords = self._stations
+        positions = to_tile(projection.mercator_cached('stations', coords))
+        inside = ((positions[:, 0] > -margin) & (positions[:, 0] < size + margin) &
+                  (positions[:, 1] > -margin) & (positions[:, 1] < size + margin))
+        if inside.sum() <= config.CANVAS_MAX_STATIONS:
+            for index in np.flatnonzero(inside).tolist():
+                x, y = positions[index]
+                draw.ellipse((x - 6, y - 6, x + 6, y + 6), fill="#34495e", outline="#2c3e50", width=2)
+                if show_labels or len(names) <= config.CANVAS_MAX_STATIONS:
+                    draw.text((x, y + 16), names[index], fill="#2c3e50", font=font, anchor="mm")
+        return image
+
+    # ------------------------------------------------------------------
+    # Train positions
+    # ------------------------------------------------------------------
+    def vertex_km(self):
+        """Cumulative distance along its track for every vertex, computed once"""
+        if self._vertex_km is None:
+            store = self.store
+            edges = np.concatenate(([0.0], segment_lengths_km(store.coords)))
+            # Distances restart at the first vertex of every track
+            edges[store.coord_offsets[:-1][np.diff(store.coord_offsets) > 0]] = 0.0
+            cumulative = np.cumsum(edges)
+            starts = np.repeat(store.coord_offsets[:-1], np.diff(store.coord_offsets))
+            self._vertex_km = cumulative - cumulative[starts] if len(cumulative) else cumulative
+        return self._vertex_km
+
+    def train_position(self, row):
+        """Canvas position of the train on a live track, from its 'location' kilometre"""
+        store = self.store
+        if 'location' not in store.columns:
+            return None
+        km = parse_quantity(store.value(row, 'location'))
+        start, end = store.coord_offsets[row], store.coord_offsets[row + 1]
+        if km is None or end - start < 2:
+            return None
+        distances = self.vertex_km()[start:end]
+        km = min(max(km, 0.0), distances[-1])
+        index = min(int(np.searchsorted(distances, km, side='right')), len(distances) - 1)
+        span = max(distances[index] - distances[index - 1], 1e-9)
+        t = (km - distances[index - 1]) / span
+        points = self.projection.project_cached('tracks', store.coords)
+        return points[start + index - 1] * (1 - t) + points[start + index] * t
+
+    def draw_trains(self, rows):
+        """One marker per visible live train, reusing pooled oval items"""
+        positions = [position for position in (self.train_position(row) for row in rows.tolist())
+                     if position is not None]
+        for index, (x, y) in enumerate(positions):
+            if index == len(self.train_items):
+                self.train_items.append(self.canvas.create_oval(
+                    0, 0, 0, 0, fill="#ffffff", outline=config.TRACK_COLORS['live_tracks'], width=3,
+                    tags=("track_layer", "dynamic_layer")))
+            item = self.train_items[index]
+            self.canvas.coords(item, x - 5, y - 5, x + 5, y + 5)
+            self.canvas.itemconfig(item, state='normal')
+        for item in self.train_items[len(positions):]:
+            self.canvas.itemconfig(item, state='hidden')
+
+
+def _raster_font():
+    """Small font for raster labels (Pillow >= 10.1 accepts a size)"""
+    try:
+        return ImageFont.load_default(size=11)
+    except TypeError:
+        return ImageFont.load_default()
@@ -34,6 +34,7 @@ DASH_PATTERNS = {
 # System Settings
 AUTO_REFRESH_INTERVAL = 30  # seconds
 MAX_TRACKS_DISPLAY = 50
+TABLE_PAGE_SIZE = 500  # Rows per page of the Streamlit tables; larger tables get filter, sort and paging
 ENABLE_TOOLTIPS = True
 SHOW_TRACK_LABELS = True
 
@@ -41,3 +42,119 @@ SHOW_TRACK_LABELS = True
 AI_UPDATE_INTERVAL = 300  # seconds
 MAX_RECOMMENDATIONS = 4
 ENABLE_PREDICTIVE_ANALYSIS = True
+
+# Congestion Hotspots (top MAX_TRACKS_DISPLAY congested tracks by score)
+HOTSPOT_SCORE_WEIGHTS = {"trains_count": 1.0, "delay": 0.5, "severity": 10.0}  # Score = sum of weight x value
+HOTSPOT_SIDEBAR_COUNT = 5
+
+# Delay Propagation (knock-on delays through shared stations and corridors)
+DELAY_CONNECTION_SHARE = 0.5  # Share of the largest delay at a track's end stations passed to connections
+DELAY_CORRIDOR_SHARE = 0.8  # Share of the largest delay between the same two stations passed to following trains
+DELAY_RECOVERY_MIN = 5  # Knock-on minutes absorbed by timetable slack
+DELAY_MAX_HOPS = 30
+
+# Emergency Scenarios (Monte Carlo what-if of blockages)
+SCENARIO_RUNS = 2000
+SCENARIO_WORKERS = 0  # Worker processes; 0 uses every CPU
+SCENARIO_CLEARANCE_SPREAD = 0.35  # Log-normal sigma of the actual closure around the estimated clearance
+SCENARIO_REROUTE_PROBABILITY = 0.6  # Chance a blockage's trains are rerouted when an alternative exists
+
+# Scheduled Transitions (clearance expiries, departures and arrivals)
+SCHEDULER_ENABLED = True
+SCHEDULER_TICK_S = 1.0  # Timing wheel resolution in seconds
+SCHEDULER_WHEEL_BITS = 8  # 256 slots per level...
+SCHEDULER_WHEEL_LEVELS = 4  # ...so four levels span 2^32 ticks (136 years at 1 s)
+SCHEDULER_POLL_S = 5  # Seconds between Tkinter scheduler checks
+SCHEDULER_AVERAGE_SPEED_KMH = 80  # Running speed used to schedule arrivals
+
+# Maintenance ETA (least-squares fit of crew progress reports)
+MAINTENANCE_CONFIDENCE_Z = 1.96  # Width of the ETA band (1.96 = 95%)
+MAINTENANCE_PUBLISH_ETA = True  # Write fitted ETAs to the Estimated Clearance column
+MAINTENANCE_DISPLAY_COUNT = 5  # Tracks shown with progress bars, soonest first
+
+# Impact Index (services planned over each track)
+TIMETABLE_EXTRA_SERVICES = 0.25  # Generated services per track, on top of the named trains (at least 50)
+TIMETABLE_MAX_LEGS = 6  # Tracks a generated service runs over
+IMPACT_CONNECTION_WINDOW_MIN = 30  # Departures this soon after an affected arrival count as connections
+
+# Simulated Telemetry (speed, delay and location of the trains on live and congested tracks)
+TELEMETRY_ENABLED = True
+TELEMETRY_INTERVAL_S = 5  # Seconds between telemetry batches written to the store
+
+# Alert Rules (name, expression, severity), evaluated on every telemetry batch
+ALERT_RULES = [
+    ("Sustained delay", "delay > 30 min for 3 consecutive samples", "high"),
+    ("Rising delay", "delay > 15 min for 2 samples", "medium"),
+    ("Sudden slowdown", "speed drop > 40% within 5 min", "high"),
+    ("Crawling train", "speed < 40 km/h for 3 samples", "medium"),
+    ("Blocked past ETA", "blocked past eta", "medium"),
+    ("Clearance overrun", "blocked past eta by 30 min", "high"),
+]
+ALERT_SUPPRESS_S = 600  # An alert that fired is not raised again for the same track within this window
+ALERT_HISTORY_SAMPLES = 16  # Samples kept per track and field (drop windows see at most this many)
+ALERT_LOG_SIZE = 500  # Recent alerts and resolutions kept for display
+ALERT_POLL_S = 5  # Seconds between Tkinter checks of the time-based rules
+
+# Speed and Delay Anomalies (robust EWMA z-scores per train)
+ANOMALY_ALPHA = 0.1  # Weight of each new sample in the running mean and deviation
+ANOMALY_Z = 4.0  # Samples further than this many deviations from a train's mean are flagged
+ANOMALY_CLIP = 3.0  # Outliers update the statistics as if they were this many deviations out
+ANOMALY_WARMUP_SAMPLES = 5  # Samples a train needs before it can be flagged
+ANOMALY_MIN_SCALE = {'speed': 2.0, 'delay': 1.0}  # Smallest deviation assumed (km/h, min)
+
+# Offline Map Tiles
+OFFLINE_TILES_ENABLED = False  # Point both maps at the local tile server
+TILE_OFFLINE_ONLY = True  # Never contact the upstream server (air-gapped control rooms)
+TILE_CACHE_PATH = "map_tiles.mbtiles"
+TILE_MEMORY_CACHE_MB = 64
+TILE_SERVER_HOST = "127.0.0.1"
+TILE_SERVER_PORT = 8765
+TILE_UPSTREAM_URL = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
+TILE_USER_AGENT = "RailwayTrackMonitoring/1.0 (tile prefetch)"
+TILE_PREFETCH_BOUNDS = [[6.5, 68.0], [35.7, 97.5]]  # India bounding box around MAP_DEFAULT_CENTER
+TILE_PREFETCH_ZOOMS = (4, 10)
+
+# Canvas Renderer (Tkinter schematic map)
+CANVAS_MIN_ZOOM = 0.5
+CANVAS_MAX_ZOOM = 200.0
+CANVAS_LABEL_MIN_ZOOM = 4.0  # Track labels appear from this zoom...
+CANVAS_MAX_LABELS = 60  # ...or whenever few enough tracks are visible
+CANVAS_MAX_STATIONS = 300
+CANVAS_GRID_SIZE = 64  # Cells per side of the culling grid
+CANVAS_AGGREGATE_THRESHOLD = 1500  # Visible tracks above which same-style tracks are merged
+CANVAS_AGGREGATE_CELL = 4  # Pixel grid used when merging tracks
+CANVAS_MAX_ITEMS = 2000  # Upper bound on aggregated polylines
+CANVAS_RASTER_TILE_SIZE = 512  # Pixels per side of a cached static-layer tile
+CANVAS_RASTER_CACHE_TILES = 48
+
+# Synthetic Network (load testing)
+SYNTHETIC_NETWORK_TRACKS = 0  # 1k-1M generated tracks replace the sample data when non-zero
+SYNTHETIC_NETWORK_SEED = 42
+
+# Benchmarks (python run_application.py --bench)
+BENCH_SIZES = (1000, 10000)  # Network sizes in tracks
+BENCH_REPEAT = 5
+BENCH_BASELINE_PATH = "bench_baseline.json"
+BENCH_REGRESSION_TOLERANCE = 0.25  # Flag p50/p95/peak memory growth above 25%
+
+# Instrumentation (Performance panel and Prometheus metrics)
+INSTRUMENTATION_ENABLED = True
+INSTRUMENTATION_TRACE_ALLOCATIONS = False  # Allocation histograms via tracemalloc (slows Python code ~2x)
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 0  # e.g. 9108 to serve /metrics; 0 disables the endpoint
+METRICS_FILE = "railway_metrics.prom"
+
+# Streamlit rerun profiler (?profile=1 or the sidebar toggle)
+PROFILER_MAX_RERUNS = 20  # Reruns kept per session
+
+# Snapshots (warm restarts)
+SNAPSHOT_ENABLED = False  # Restore the network from a snapshot on startup and keep it saved
+SNAPSHOT_PATH = "railway_state.snap"  # Each app appends its schema, e.g. railway_state_tkinter.snap
+SNAPSHOT_INTERVAL_S = 300  # Seconds between periodic snapshots; 0 writes only on shutdown
+SNAPSHOT_GEOMETRY = "float64"  # "float64" (memory-mapped) or "polyline" (about 1/2 the size, ~1 m precision)
+
+# Network Import (real GTFS / OSM / GeoJSON data)
+NETWORK_DATA_PATH = ""  # GTFS directory, .osm or .geojson file loaded instead of the sample data
+IMPORT_CHUNK_ROWS = 100000  # Rows or features parsed per chunk
+IMPORT_WORKERS = 0  # Worker processes for shapes and GeoJSON; 0 uses every CPU
+IMPORT_RAILWAY_TYPES = ("rail", "light_rail", "narrow_gauge", "subway", "monorail")
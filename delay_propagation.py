@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Railway Track Monitoring System - Cascading Delay Propagation
+Spreads each track's primary delay (its ``Average Delay``) to the tracks it
+depends on.  Tracks meeting at a station share connecting trains, and
+tracks between the same two stations share a corridor.  As in max-plus
+timetable models, a track inherits a share of the largest delay among the
+other tracks of each group, less the recovery margin a train can absorb,
+and keeps whichever is larger, its own delay or the inherited one.
+
+Stations are the track end points, snapped to a small grid.  Each grouping
+is a sparse track-by-group incidence matrix kept in CSR form; one
+propagation step is a max-plus sparse product over it (segment maxima with
+``np.maximum.reduceat``) and never materializes the track-by-track matrix.
+Shares below one make every hop shrink a delay, so propagation settles,
+and each hop only revisits groups whose maximum may have changed, so a
+what-if such as "T004 loses another 20 minutes" touches a neighbourhood
+rather than the whole network.
+"""
+
+import numpy as np
+
+import config
+from instrumentation import instrument
+from network_generator import SCHEMAS
+from track_store import column_numbers, group_csr, gather_csr, synchronized
+
+STATION_SNAP_DEG = 1e-3  # End points closer than ~100 m are the same station
+TOLERANCE_MIN = 0.01  # Delay changes below this do not propagate further
+
+
+def station_ids(coord_offsets, coords):
+    """``(n, 2)`` station ids of every track's two end points (-1 for tracks without geometry)"""
+    lengths = np.diff(coord_offsets)
+    valid = lengths > 0
+    ends = np.stack([coord_offsets[:-1], coord_offsets[1:] - 1], axis=1)[valid]
+    grid = np.round(coords[ends.ravel()] / STATION_SNAP_DEG).astype(np.int64)
+    keys = (grid[:, 0] + 100000) * 400000 + (grid[:, 1] + 200000)
+    _, inverse = np.unique(keys, return_inverse=True)
+    stations = np.full((len(lengths), 2), -1, dtype=np.int64)
+    stations[valid] = inverse.reshape(-1, 2)
+    return stations
+
+
+class Grouping:
+    """Sparse track-by-group incidence: each track belongs to up to ``width`` groups"""
+
+    def __init__(self, membership, share):
+        self.membership = membership  # (n, width) group ids, -1 for none
+        self.share = share
+        valid = membership >= 0
+        self.size = int(membership.max()) + 1 if valid.any() else 0
+        tracks = np.broadcast_to(np.arange(len(membership))[:, None], membership.shape)[valid]
+        groups = membership[valid]
+        self.offsets, self.members = group_csr(groups, self.size, tracks)
+
+    def maxima(self, delay, groups=None):
+        """``(first, owner, second)``: largest delay of each group, its track, and the runner-up"""
+        groups = np.arange(self.size) if groups is None else groups
+        counts = self.offsets[groups + 1] - self.offsets[groups]
+        first = np.zeros(len(groups))
+        owner = np.full(len(groups), -1, dtype=np.int64)
+        second = np.zeros(len(groups))
+        filled = np.flatnonzero(counts)
+        if len(filled):
+            members = gather_csr(self.offsets, self.members, groups[filled])
+            values = delay[members]
+            starts = np.cumsum(counts[filled]) - counts[filled]
+            first[filled] = np.maximum.reduceat(values, starts)
+            segment = np.repeat(np.arange(len(filled)), counts[filled])
+            # First member holding each maximum; the runner-up is the maximum without it
+            top = np.flatnonzero(values == first[filled][segment])
+            _, at = np.unique(segment[top], return_index=True)
+            owner[filled] = members[top[at]]
+            values[top[at]] = 0.0
+            second[filled] = np.maximum.reduceat(values, starts)
+        return first, owner, second
+
+    def inherited(self, rows, state):
+        """``share`` x the largest delay of another track in any group of ``rows``"""
+        first, owner, second = state
+        groups = self.membership[rows]
+        safe = np.maximum(groups, 0)
+        other = np.where(owner[safe] == rows[:, None], second[safe], first[safe])
+        return self.share * np.where(groups >= 0, other, 0.0).max(axis=1, initial=0.0)
+
+    def update(self, state, delay, rows):
+        """Refresh the maxima of the groups of ``rows``; returns their other members"""
+        groups = self.membership[rows].ravel()
+        groups = np.unique(groups[groups >= 0])
+        for array, values in zip(state, self.maxima(delay, groups)):
+            array[groups] = values
+        return gather_csr(self.offsets, self.members, groups)
+
+
+def propagate(groupings, primary, delay, state, rows):
+    """Settle ``delay`` and the group maxima ``state`` in place after the inputs of ``rows`` changed.
+
+    Returns the rows whose delay changed.
+    """
+    rows = np.unique(np.asarray(rows, dtype=np.int64))
+    changed = []
+    hops = 0
+    while len(rows) and hops <= config.DELAY_MAX_HOPS:
+        inherited = np.max([grouping.inherited(rows, group_state)
+                            for grouping, group_state in zip(groupings, state)], axis=0)
+        new = np.maximum(primary[rows], inherited - config.DELAY_RECOVERY_MIN)
+        moved = np.abs(new - delay[rows]) > TOLERANCE_MIN
+        rows = rows[moved]
+        if not len(rows):
+            break
+        delay[rows] = new[moved]
+        changed.append(rows)
+        # Only members of groups whose maxima may have changed need another look
+        rows = np.unique(np.concatenate([grouping.update(group_state, delay, rows)
+                                         for grouping, group_state in zip(groupings, state)]))
+        hops += 1
+    return np.unique(np.concatenate(changed)) if changed else np.empty(0, dtype=np.int64)
+
+
+class DelayPropagation:
+    """Knock-on delays of every track of a store, kept current as delays change.
+
+    ``primary`` holds the delays reported per track, ``delay`` the
+    propagated totals and ``state`` the maxima of every grouping;
+    ``what_if`` answers a hypothetical extra delay.
+    """
+
+    def __init__(self, store, schema='streamlit'):
+        self.store = store
+        self.delay_column = SCHEMAS[schema]['delay']
+        stations = station_ids(store.coord_offsets, store.coords)
+        pair = np.where((stations >= 0).all(axis=1),
+                        np.minimum(stations[:, 0], stations[:, 1]) * (stations.max() + 1)
+                        + np.maximum(stations[:, 0], stations[:, 1]), -1)
+        corridors = np.full((len(store), 1), -1, dtype=np.int64)
+        valid = pair >= 0
+        corridors[valid, 0] = np.unique(pair[valid], return_inverse=True)[1]
+        self.groupings = [Grouping(stations, config.DELAY_CONNECTION_SHARE),
+                          Grouping(corridors, config.DELAY_CORRIDOR_SHARE)]
+
+        self.primary = self.primary_delays(np.arange(len(store)))
+        self.delay = self.primary.copy()
+        self.state = [grouping.maxima(self.delay) for grouping in self.groupings]
+        self._propagate(self.primary, self.delay, self.state, np.arange(len(store)))
+        store.subscribe(self.on_store_change)
+
+    @synchronized
+    def primary_delays(self, rows):
+        if self.delay_column not in self.store.columns:
+            return np.zeros(len(rows), dtype=np.float64)
+        return column_numbers(self.store, self.delay_column, rows)
+
+    @property
+    @synchronized
+    def knock_on(self):
+        """Delay each track inherits from the rest of the network (minutes)"""
+        return self.delay - self.primary
+
+    @instrument("delay_propagation.propagate")
+    def _propagate(self, primary, delay, state, rows):
+        return propagate(self.groupings, primary, delay, state, rows)
+
+    def on_store_change(self, rows, columns):
+        """Store listener: propagate new reported delays"""
+        if self.delay_column in columns:
+            rows = np.asarray(rows, dtype=np.int64)
+            self.primary[rows] = self.primary_delays(rows)
+            # A lower delay has to be re-derived, so start these rows from their new report
+            self.delay[rows] = self.primary[rows]
+            neighbours = [grouping.update(group_state, self.delay, rows)
+                          for grouping, group_state in zip(self.groupings, self.state)]
+            self._propagate(self.primary, self.delay, self.state, np.concatenate([rows, *neighbours]))
+
+    @instrument("delay_propagation.what_if")
+    @synchronized
+    def what_if(self, extra):
+        """Added delay of every track (minutes) if ``extra`` ``{row: minutes}`` were lost on top of today's.
+
+        The current state is left untouched.
+        """
+        rows = np.fromiter(extra, dtype=np.int64, count=len(extra))
+        primary = self.primary.copy()
+        primary[rows] += np.fromiter(extra.values(), dtype=np.float64, count=len(extra))
+        delay = self.delay.copy()
+        state = [tuple(array.copy() for array in group_state) for group_state in self.state]
+        self._propagate(primary, delay, state, rows)
+        return delay - self.delay
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Railway Track Monitoring System - Scheduled State Transitions
+Turns the time columns of the store into events that change track state
+when they fall due: a blocked track whose ``Estimated Clearance`` runs out
+becomes free, a free track becomes live at its ``Next Scheduled Train``
+departure, and a departed train frees its track again on arrival.
+
+Events sit in a hierarchical timing wheel (as in the Linux kernel and
+Kafka purgatory).  Level 0 has one slot per tick; each level above covers
+a full turn of the level below per slot.  Scheduling puts an event in the
+slot of the lowest level whose turn contains its due tick, and whenever a
+lower level completes a turn the matching slot of the level above is
+re-spread over the levels below.  An event is therefore touched once per
+level at most, so scheduling and firing cost O(1) amortized whatever the
+number of pending events.  Slots hold arrays of event ids, so a batch of
+a million clearances is scheduled and fired with array operations.
+
+Rescheduling never searches the wheel: every (kind, track) pair has a
+stamp, and events whose stamp is no longer current are dropped when they
+fire.
+"""
+
+import time
+
+import numpy as np
+
+import config
+from instrumentation import instrument
+from map_projection import track_lengths_km
+from network_generator import SCHEMAS, LABELS
+from track_store import CATEGORIES, column_numbers
+
+
+class TimingWheel:
+    """Hierarchical timing wheel of ``(kind, row, stamp)`` events due at whole ticks"""
+
+    def __init__(self, start_tick, slot_bits=8, levels=4):
+        self.bits = slot_bits
+        self.mask = (1 << slot_bits) - 1
+        self.levels = levels
+        self.tick = int(start_tick)  # Last processed tick
+        self._slots = [[[] for _ in range(1 << slot_bits)] for _ in range(levels)]
+        self._counts = [0] * levels
+        self._overdue = []
+        self._overflow = []  # Beyond the top level; re-spread whenever the top level turns
+
+        # Event table in parallel arrays, grown by doubling; fired ids are reused
+        self._due = np.empty(0, dtype=np.int64)
+        self._kind = np.empty(0, dtype=np.int16)
+        self._row = np.empty(0, dtype=np.int64)
+        self._stamp = np.empty(0, dtype=np.int64)
+        self._free = np.empty(0, dtype=np.int64)
+        self._used = 0
+
+    def __len__(self):
+        """Pending events (including superseded ones not yet dropped)"""
+        return sum(self._counts) + sum(map(len, self._overdue)) + sum(map(len, self._overflow))
+
+    def _allocate(self, count):
+        reused = self._free[:count]
+        self._free = self._free[count:]
+        fresh = count - len(reused)
+        if self._used + fresh > len(self._due):
+            size = max(1024, 2 * (self._used + fresh))
+            for name in ('_due', '_kind', '_row', '_stamp'):
+                grown = np.zeros(size, dtype=getattr(self, name).dtype)
+                grown[:self._used] = getattr(self, name)[:self._used]
+                setattr(self, name, grown)
+        ids = np.concatenate([reused, np.arange(self._used, self._used + fresh, dtype=np.int64)])
+        self._used += fresh
+        return ids
+
+    def schedule(self, due_ticks, kind, rows, stamps):
+        """Add one event per row, due at ``due_ticks``"""
+        ids = self._allocate(len(rows))
+        self._due[ids] = due_ticks
+        self._kind[ids] = kind
+        self._row[ids] = rows
+        self._stamp[ids] = stamps
+        self._place(ids)
+
+    def _place(self, ids):
+        """Spread event ids over the slots relative to the current tick"""
+        if not len(ids):
+            return
+        due = self._due[ids]
+        overdue = due <= self.tick
+        if overdue.any():
+            self._overdue.append(ids[overdue])
+            ids, due = ids[~overdue], due[~overdue]
+        # Level: the highest group of slot bits in which the due tick differs from now
+        differing = due ^ self.tick
+        level = np.zeros(len(ids), dtype=np.int64)
+        for shift in range(1, self.levels + 1):
+            level += (differing >> (shift * self.bits)) > 0
+        beyond = level >= self.levels
+        if beyond.any():
+            self._overflow.append(ids[beyond])
+            ids, due, level = ids[~beyond], due[~beyond], level[~beyond]
+        slot = (due >> (level * self.bits)) & self.mask
+        key = level * (self.mask + 1) + slot
+        order = np.argsort(key, kind='stable')
+        keys, starts = np.unique(key[order], return_index=True)
+        for key, chunk in zip(keys.tolist(), np.split(ids[order], starts[1:])):
+            level, slot = divmod(key, self.mask + 1)
+            self._slots[level][slot].append(chunk)
+            self._counts[level] += len(chunk)
+
+    def _take(self, level, slot):
+        chunks = self._slots[level][slot]
+        if not chunks:
+            return np.empty(0, dtype=np.int64)
+        self._slots[level][slot] = []
+        ids = np.concatenate(chunks)
+        self._counts[level] -= len(ids)
+        return ids
+
+    def advance(self, tick):
+        """Process every tick up to ``tick``; returns ``(kind, row, stamp, due)`` arrays of the fired events"""
+        fired = self._overdue
+        self._overdue = []
+        tick = int(tick)
+        while self.tick < tick:
+            if not any(self._counts) and not self._overflow:
+                self.tick = tick
+                break
+            if self._counts[0] == 0:
+                # Nothing on level 0: jump to the end of its turn, where the next cascade happens
+                self.tick = min(tick, ((self.tick >> self.bits) + 1) << self.bits) - 1
+            self.tick += 1
+            if self.tick & self.mask == 0:
+                self._cascade()
+            fired.append(self._take(0, self.tick & self.mask))
+            fired.extend(self._overdue)
+            self._overdue = []
+
+        ids = np.concatenate(fired) if fired else np.empty(0, dtype=np.int64)
+        ids = ids[np.argsort(self._due[ids], kind='stable')]
+        events = self._kind[ids], self._row[ids], self._stamp[ids], self._due[ids]
+        self._free = np.concatenate([self._free, ids])
+        return events
+
+    def _cascade(self):
+        """Re-spread the slots of higher levels whose turn starts at the current tick"""
+        for level in range(self.levels - 1, 0, -1):
+            if self.tick & ((1 << (level * self.bits)) - 1) == 0:
+                self._place(self._take(level, (self.tick >> (level * self.bits)) & self.mask))
+        if self.tick & ((1 << (self.levels * self.bits)) - 1) == 0 and self._overflow:
+            overflow, self._overflow = self._overflow, []
+            self._place(np.concatenate(overflow))
+
+
+def next_clock_time(now, minutes):
+    """Epoch seconds of the next local clock time ``minutes`` after midnight"""
+    midnight = time.mktime(time.localtime(now)[:3] + (0, 0, 0, 0, 0, -1))
+    due = midnight + np.asarray(minutes, dtype=np.float64) * 60.0
+    return np.where(due <= now, due + 86400.0, due)
+
+
+class EventScheduler:
+    """Fires the clearance, departure and arrival transitions of a store's tracks.
+
+    Call ``advance()`` periodically; it applies every transition due by now
+    and returns them as ``(kind, rows)`` pairs.  The schedule follows the
+    store: new clearance estimates or departure times reschedule their
+    tracks, and tracks that leave a category drop its pending events.
+    """
+
+    KINDS = ('clearance', 'departure', 'arrival')
+
+    def __init__(self, store, schema='streamlit', now=None):
+        self.store = store
+        self.schema = schema
+        self.names = SCHEMAS[schema]
+        self.labels = LABELS[schema]
+        self.tick_s = float(config.SCHEDULER_TICK_S)
+        now = time.time() if now is None else now
+        self.wheel = TimingWheel(int(now // self.tick_s), config.SCHEDULER_WHEEL_BITS, config.SCHEDULER_WHEEL_LEVELS)
+        self._stamps = np.zeros((len(self.KINDS), len(store)), dtype=np.int64)
+        self._track_km = None
+        # Several Streamlit sessions share the scheduler; it serializes on the store's lock, which
+        # store updates already hold when their transitions re-enter through the listener
+        self._lock = store.lock
+        self.reschedule(store.rows(), ('category',), now)
+        store.subscribe(self.on_store_change)
+
+    def __len__(self):
+        return len(self.wheel)
+
+    # ------------------------------------------------------------------
+    # Scheduling
+    # ------------------------------------------------------------------
+    def schedule(self, kind, rows, times):
+        """Schedule ``kind`` for ``rows`` at epoch seconds ``times``, replacing their pending ones"""
+        with self._lock:
+            code = self.KINDS.index(kind)
+            rows = np.asarray(rows, dtype=np.int64)
+            self._stamps[code, rows] += 1
+            ticks = np.ceil(np.asarray(times, dtype=np.float64) / self.tick_s).astype(np.int64)
+            self.wheel.schedule(np.broadcast_to(ticks, rows.shape), code, rows, self._stamps[code, rows])
+
+    def cancel(self, kind, rows):
+        with self._lock:
+            self._stamps[self.KINDS.index(kind), rows] += 1
+
+    def _times(self, field, rows):
+        """Numeric values of a time column at ``rows`` and the mask of non-blank cells"""
+        column = self.names[field]
+        if column not in self.store.columns or not len(rows):
+            return np.zeros(len(rows)), np.zeros(len(rows), dtype=bool)
+        blank = np.array([str(value).strip() == '' for value in self.store.columns[column][rows].tolist()], dtype=bool)
+        return column_numbers(self.store, column, rows), ~blank
+
+    @instrument("event_scheduler.reschedule")
+    def reschedule(self, rows, columns, now=None):
+        """Re-derive the events of ``rows`` after ``columns`` changed"""
+        now = time.time() if now is None else now
+        rows = np.unique(np.asarray(rows, dtype=np.int64))
+        category = self.store.category[rows]
+        blocked = category == CATEGORIES.index('blocked_tracks')
+        free = category == CATEGORIES.index('free_tracks')
+
+        if 'category' in columns or self.names['clearance'] in columns:
+            minutes, present = self._times('clearance', rows)
+            due = blocked & present
+            self.schedule('clearance', rows[due], now + minutes[due] * 60.0)
+            self.cancel('clearance', rows[~due])
+        if 'category' in columns or self.names['next_scheduled'] in columns:
+            minutes, present = self._times('next_scheduled', rows)
+            due = free & present
+            self.schedule('departure', rows[due], next_clock_time(now, minutes[due]))
+            self.cancel('departure', rows[~due])
+        if 'category' in columns:
+            self.cancel('arrival', rows[category != CATEGORIES.index('live_tracks')])
+
+    def on_store_change(self, rows, columns):
+        """Store listener: follow new time estimates and category changes"""
+        if 'category' in columns or self.names['clearance'] in columns or self.names['next_scheduled'] in columns:
+            with self._lock:
+                self.reschedule(rows, columns)
+
+    # ------------------------------------------------------------------
+    # Firing
+    # ------------------------------------------------------------------
+    @instrument("event_scheduler.advance")
+    def advance(self, now=None):
+        """Apply every transition due by ``now``; returns ``[(kind, rows), ...]`` in firing order.
+
+        Handlers receive the rows of a batch and the epoch second each was due.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            applied = []
+            fired = self.wheel.advance(int(now // self.tick_s))
+            # Transitions can schedule events that are already due (an arrival after a long pause)
+            while len(fired[0]):
+                kinds, rows, stamps, due = fired
+                current = stamps == self._stamps[kinds, rows]
+                kinds, rows, due = kinds[current], rows[current], due[current] * self.tick_s
+                # Consecutive events of one kind are applied as a batch
+                breaks = np.flatnonzero(np.diff(kinds)) + 1
+                for start, stop in zip(np.r_[0, breaks], np.r_[breaks, len(kinds)]):
+                    if stop > start:
+                        kind = self.KINDS[kinds[start]]
+                        # Latest event per track wins
+                        batch, last = np.unique(rows[start:stop][::-1], return_index=True)
+                        getattr(self, '_on_' + kind)(batch, due[start:stop][::-1][last])
+                        applied.append((kind, batch))
+                fired = self.wheel.advance(int(now // self.tick_s))
+            return applied
+
+    def _on_clearance(self, rows, due):
+        """Blocked → free: the track is handed back with full capacity"""
+        names = self.names
+        self.store.set_values(rows, {names['reason']: [''] * len(rows), names['clearance']: [''] * len(rows),
+                                     names['capacity']: ['100%'] * len(rows)})
+        self.store.set_category(rows, 'free_tracks')
+
+    def _on_departure(self, rows, due):
+        """Free → live: the scheduled train leaves and is due to arrive after its running time"""
+        names = self.names
+        self.store.set_values(rows, {
+            names['train']: [f"Scheduled {time.strftime('%H:%M', time.localtime(at))} Service" for at in due.tolist()],
+            names['status']: [self.labels['running']] * len(rows),
+            names['speed']: [f"{config.SCHEDULER_AVERAGE_SPEED_KMH} km/h"] * len(rows),
+            names['location']: ['Kilometer 0'] * len(rows),
+            names['capacity']: [''] * len(rows),
+            names['next_scheduled']: [''] * len(rows),
+        })
+        self.store.set_category(rows, 'live_tracks')
+        if self._track_km is None:
+            self._track_km = track_lengths_km(self.store.coord_offsets, self.store.coords)
+        self.schedule('arrival', rows, due + self._track_km[rows] / config.SCHEDULER_AVERAGE_SPEED_KMH * 3600.0)
+
+    def _on_arrival(self, rows, due):
+        """Live → free: the train has cleared the track"""
+        names = self.names
+        self.store.set_values(rows, {
+            names['train']: [''] * len(rows), names['status']: [''] * len(rows),
+            names['speed']: [''] * len(rows), names['location']: [''] * len(rows),
+            names['capacity']: ['100%'] * len(rows),
+        })
+        self.store.set_category(rows, 'free_tracks')
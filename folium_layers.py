@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Railway Track Monitoring System - Folium Track Layers
+Draws thousands of tracks as one folium element.  Geometry is sent to the
+browser as encoded polylines and decoded there, and each track carries only
+an index into a shared list of line styles, so the page is several times
+smaller than one ``folium.PolyLine`` (with its own JSON coordinates and
+options) per track.
+"""
+
+import html
+import json
+
+from branca.element import Element, MacroElement
+from jinja2 import Template
+
+import polyline_codec
+
+
+# Escapes for JSON embedded in a <script>: the HTML specials, and braces,
+# because branca parses the rendered script again as a Jinja template
+_SCRIPT_ESCAPES = {ord(character): f"\\u{ord(character):04x}" for character in "<>&'{}"}
+
+
+def _script_json(value):
+    """JSON of lists, strings and numbers that is safe inside a script element"""
+    return json.dumps(value, ensure_ascii=False).translate(_SCRIPT_ESCAPES)
+
+
+def _text(value):
+    """Popup/tooltip HTML of plain text (track data may come from imported files)"""
+    return html.escape(value).replace("\n", "<br>") if value else None
+
+
+class EncodedPolylines(MacroElement):
+    """A feature group of polylines given as encoded polyline strings.
+
+    ``styles`` are Leaflet path options; ``style_indices[i]`` picks the style
+    of ``polylines[i]``.  Popups and tooltips are optional plain text.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.featureGroup();
+            (function (group) {
+                var styles = {{ this.styles|tojson }};
+                {{ this.tracks_json }}.forEach(function (t) {
+                    var line = L.polyline(decodePolyline(t[0]), styles[t[1]]);
+                    if (t[2]) { line.bindPopup(t[2]); }
+                    if (t[3]) { line.bindTooltip(t[3], {sticky: true}); }
+                    line.addTo(group);
+                });
+            })({{ this.get_name() }});
+            {{ this.get_name() }}.addTo({{ this._parent.get_name() }});
+        {% endmacro %}
+    """)
+
+    def __init__(self, polylines, style_indices, styles, popups=None, tooltips=None):
+        super().__init__()
+        self._name = "EncodedPolylines"
+        count = len(polylines)
+        popups = popups if popups is not None else [None] * count
+        tooltips = tooltips if tooltips is not None else [None] * count
+        self.styles = list(styles)
+        self.tracks_json = _script_json([[line, int(style), _text(popup), _text(tooltip)]
+                                         for line, style, popup, tooltip
+                                         in zip(polylines, style_indices, popups, tooltips)])
+
+    def render(self, **kwargs):
+        super().render(**kwargs)
+        # One copy of the decoder per page, however many layers use it
+        self.get_root().header.add_child(
+            Element(f"<script>{polyline_codec.DECODE_JS}</script>"), name="decode_polyline")
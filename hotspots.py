@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Railway Track Monitoring System - Congestion Hotspot Ranking
+Keeps the congested tracks in an indexed max-heap ordered by a congestion
+score (a weighted sum of trains count, delay, severity and any other
+numeric column named in ``config.HOTSPOT_SCORE_WEIGHTS``).
+
+The heap is built once by sorting (a descending order is already a valid
+heap) and then follows the store: a telemetry update re-scores only the
+rows it touched and moves each one up or down the heap in O(log n).  The
+K best tracks are read off the top of the heap in O(K log K), so panels
+and maps never sort the whole network on a render.
+"""
+
+import heapq
+
+import numpy as np
+
+import config
+from instrumentation import instrument
+from network_generator import SCHEMAS
+from track_store import CATEGORIES, parse_quantity, column_numbers, synchronized
+
+# Numeric value of severity labels in the score
+SEVERITY_SCORES = {'high': 1.0, 'medium': 0.5, 'low': 0.0}
+
+
+def _number(value):
+    """Score contribution of one cell: a severity level or the number in a display value"""
+    severity = SEVERITY_SCORES.get(str(value).strip().lower())
+    if severity is not None:
+        return severity
+    number = parse_quantity(value)
+    return 0.0 if number is None or number != number else number
+
+
+class HotspotRanking:
+    """Top-K congestion hotspots of one store category, updated incrementally.
+
+    ``weights`` maps canonical field names (``'trains_count'``, ``'delay'``,
+    ``'severity'``) or plain store columns to score weights.
+    """
+
+    def __init__(self, store, schema='streamlit', category='congested_tracks', weights=None):
+        self.store = store
+        self.category = category
+        names = SCHEMAS[schema]
+        weights = config.HOTSPOT_SCORE_WEIGHTS if weights is None else weights
+        self.weights = {names.get(field, field): float(weight) for field, weight in weights.items()}
+        self.version = 0
+        self._top = None
+        self._build()
+        store.subscribe(self.on_store_change)
+
+    @synchronized
+    def scores(self, rows):
+        """Congestion scores of ``rows``"""
+        rows = np.asarray(rows, dtype=np.int64)
+        total = np.zeros(len(rows), dtype=np.float64)
+        for column, weight in self.weights.items():
+            if column in self.store.columns:
+                total += weight * column_numbers(self.store, column, rows, _number)
+        return total
+
+    @instrument("hotspots.build")
+    def _build(self):
+        rows = self.store.rows(self.category)
+        score = np.zeros(len(self.store), dtype=np.float64)
+        score[rows] = self.scores(rows)
+        heap = rows[np.argsort(-score[rows], kind='stable')]
+        position = np.full(len(self.store), -1, dtype=np.int64)
+        position[heap] = np.arange(len(heap))
+        # Lists: the sift loops below touch single elements, which lists do far faster than arrays
+        self._score, self._heap, self._position = score.tolist(), heap.tolist(), position.tolist()
+        self.version += 1
+
+    def __len__(self):
+        return len(self._heap)
+
+    # ------------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------------
+    def on_store_change(self, rows, columns):
+        """Store listener: re-score rows whose score columns or category changed"""
+        if 'category' not in columns and not set(columns) & set(self.weights):
+            return
+        rows = np.unique(np.asarray(rows, dtype=np.int64))
+        if len(self._position) != len(self.store) or len(rows) > max(1024, len(self._heap) // 8):
+            self._build()
+        else:
+            self.update(rows)
+
+    def update(self, rows):
+        """Re-score ``rows``, adding or removing those that joined or left the category"""
+        rows = np.asarray(rows, dtype=np.int64)
+        inside = self.store.category[rows] == CATEGORIES.index(self.category)
+        scores = self.scores(rows)
+        for row, member, score in zip(rows.tolist(), inside.tolist(), scores.tolist()):
+            index = self._position[row]
+            self._score[row] = score
+            if member and index < 0:
+                self._heap.append(row)
+                self._position[row] = len(self._heap) - 1
+                self._sift_up(len(self._heap) - 1)
+            elif not member and index >= 0:
+                self._remove(index)
+            elif member:
+                self._sift_down(self._sift_up(index))
+        self.version += 1
+
+    def _remove(self, index):
+        heap, position = self._heap, self._position
+        last = heap.pop()
+        position[last if index == len(heap) else heap[index]] = -1
+        if index < len(heap):
+            heap[index] = last
+            position[last] = index
+            self._sift_down(self._sift_up(index))
+
+    def _sift_up(self, index):
+        heap, position, score = self._heap, self._position, self._score
+        row = heap[index]
+        while index > 0:
+            parent = (index - 1) // 2
+            if score[heap[parent]] >= score[row]:
+                break
+            heap[index] = heap[parent]
+            position[heap[index]] = index
+            index = parent
+        heap[index] = row
+        position[row] = index
+        return index
+
+    def _sift_down(self, index):
+        heap, position, score = self._heap, self._position, self._score
+        row, size = heap[index], len(heap)
+        while True:
+            child = 2 * index + 1
+            if child >= size:
+                break
+            if child + 1 < size and score[heap[child + 1]] > score[heap[child]]:
+                child += 1
+            if score[heap[child]] <= score[row]:
+                break
+            heap[index] = heap[child]
+            position[heap[index]] = index
+            index = child
+        heap[index] = row
+        position[row] = index
+        return index
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    @synchronized
+    def top(self, k=None):
+        """Rows of the ``k`` highest-scoring tracks (``MAX_TRACKS_DISPLAY`` by default), best first"""
+        k = config.MAX_TRACKS_DISPLAY if k is None else int(k)
+        if self._top is not None and self._top[0] == (self.version, k):
+            return self._top[1]
+        heap, score = self._heap, self._score
+        rows = []
+        frontier = [(-score[heap[0]], 0)] if heap else []
+        while frontier and len(rows) < k:
+            _, index = heapq.heappop(frontier)
+            rows.append(heap[index])
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (-score[heap[child]], child))
+        top = np.array(rows, dtype=np.int64)
+        self._top = ((self.version, k), top)
+        return top
+
+    @synchronized
+    def score(self, row):
+        return self._score[row]
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Railway Track Monitoring System - Track Impact Index
+Reverse index from tracks to the services planned over them.  A timetable
+is a list of legs (service, track, from and to station, start and end
+minute); the index keeps CSR postings of the legs by track and by
+departure station, so the services crossing a blocked track, and the
+services they connect to at their next station, are gathered from a few
+array slices instead of scanning every timetable.
+
+Reroutes and retimings replace the legs of one service: the old legs are
+marked dead and the new ones go to a tail that is searched together with
+the postings, and the postings are rebuilt only when the tail has grown
+past a tenth of the timetable.  The index listens to its store: a train
+departing onto a track (the event scheduler's departures) runs a new
+service over it until the track stops being live.
+"""
+
+import time
+
+import numpy as np
+
+import config
+from instrumentation import instrument
+from map_projection import track_lengths_km
+from network_generator import SCHEMAS
+from delay_propagation import station_ids
+from track_store import CATEGORIES, group_csr, gather_csr, synchronized
+
+DAY_MIN = 24 * 60
+_LEG_FIELDS = ('service', 'row', 'from', 'to', 'start', 'end')
+
+
+def _postings(index, keys):
+    """Values of every key in ``keys`` from CSR ``(offsets, values)``, concatenated"""
+    offsets, values = index
+    return gather_csr(offsets, values, keys[keys < len(offsets) - 1])
+
+
+def overlaps(start, end, window_start, window_end):
+    """Legs running at some point of the window; both repeat daily"""
+    if window_end - window_start >= DAY_MIN:
+        return np.ones(len(start), dtype=bool)
+    hit = np.zeros(len(start), dtype=bool)
+    for shift in (-DAY_MIN, 0, DAY_MIN):
+        hit |= (start + shift < window_end) & (end + shift > window_start)
+    return hit
+
+
+def clock(minutes):
+    """'HH:MM' of minutes after midnight"""
+    minutes = int(round(minutes)) % DAY_MIN
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class ImpactIndex:
+    """Services affected by each track, built from a ``operations_simulator.generate_timetable``-style timetable"""
+
+    def __init__(self, store, timetable, schema='streamlit'):
+        self.store = store
+        self.train_column = SCHEMAS[schema]['train']
+        self.names = np.asarray(timetable['name'], dtype=object)
+        self._legs = {field: np.asarray(timetable['leg_' + field]) for field in _LEG_FIELDS}
+        self._size = len(self._legs['row'])
+        self._alive = np.ones(self._size, dtype=bool)
+        self._service_offsets, self._service_legs = group_csr(self._legs['service'], len(self.names))
+        self._rerouted = {}  # service -> leg ids replacing its base legs
+        self._running = {}  # row -> service added for the train that departed onto it
+        self._stations = None
+        self._track_km = None
+        self._build()
+        store.subscribe(self.on_store_change)
+
+    def __len__(self):
+        """Planned legs currently in the timetable"""
+        return int(self._alive[:self._size].sum())
+
+    @instrument("impact_index.build")
+    def _build(self):
+        legs = np.flatnonzero(self._alive[:self._size])
+        stations = int(max(self._legs['from'][:self._size].max(initial=-1),
+                           self._legs['to'][:self._size].max(initial=-1))) + 1
+        self._by_row = group_csr(self._legs['row'][legs], len(self.store), legs)
+        self._by_station = group_csr(self._legs['from'][legs], stations, legs)
+        self._tail = self._size  # Legs from here on are not in the postings yet
+
+    # ------------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------------
+    def on_store_change(self, rows, columns):
+        """Store listener: trains departing onto tracks start services, which end when the track stops being live"""
+        if 'category' not in columns:
+            return
+        rows = np.asarray(rows, dtype=np.int64)
+        live = self.store.category[rows] == CATEGORIES.index('live_tracks')
+        for row in rows[~live].tolist():
+            if row in self._running:
+                self.cancel(self._running.pop(row))
+        trains = self.store.columns[self.train_column][rows[live]] if self.train_column in self.store.columns else []
+        departed = [(row, train) for row, train in zip(rows[live].tolist(), trains)
+                    if str(train).strip() and row not in self._running]
+        if departed:
+            self._depart(*(np.array(values, dtype=object) for values in zip(*departed)))
+
+    def _depart(self, rows, trains):
+        """Add a one-leg service for each train that has just left on one of ``rows``"""
+        if self._stations is None:
+            self._stations = station_ids(self.store.coord_offsets, self.store.coords)
+            self._track_km = track_lengths_km(self.store.coord_offsets, self.store.coords)
+        rows = rows.astype(np.int64)
+        placed = (self._stations[rows] >= 0).all(axis=1)
+        rows, trains = rows[placed], trains[placed]
+        now = time.localtime()
+        start = float(now.tm_hour * 60 + now.tm_min)
+        services = np.arange(len(self.names), len(self.names) + len(rows))
+        self.names = np.concatenate([self.names, trains])
+        for service, row in zip(services.tolist(), rows.tolist()):
+            self.set_path(service, [row], self._stations[row],
+                          [start], [start + self._track_km[row] / config.SCHEDULER_AVERAGE_SPEED_KMH * 60.0])
+            self._running[row] = service
+
+    @synchronized
+    def legs_of(self, service):
+        """Leg ids of one service, in travel order"""
+        if service in self._rerouted:
+            return self._rerouted[service]
+        offsets = self._service_offsets
+        if service + 1 >= len(offsets):
+            return self._service_legs[:0]  # Added after the index was built
+        return self._service_legs[offsets[service]:offsets[service + 1]]
+
+    @synchronized
+    def set_path(self, service, rows, stations, starts, ends):
+        """Replace the planned legs of ``service`` (a reroute or a new timing).
+
+        ``stations`` lists the ``len(rows) + 1`` stations the service calls
+        at; ``starts`` and ``ends`` are minutes after midnight per leg.
+        """
+        self._alive[self.legs_of(service)] = False
+        count = len(rows)
+        if self._size + count > len(self._alive):
+            capacity = max(2 * len(self._alive), self._size + count)
+            self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), dtype=bool)])
+            for field, values in self._legs.items():
+                grown = np.zeros(capacity, dtype=values.dtype)
+                grown[:self._size] = values[:self._size]
+                self._legs[field] = grown
+        legs = np.arange(self._size, self._size + count)
+        stations = np.asarray(stations, dtype=np.int64)
+        for field, values in zip(_LEG_FIELDS, (service, rows, stations[:-1], stations[1:], starts, ends)):
+            self._legs[field][legs] = values
+        self._alive[legs] = True
+        self._size += count
+        self._rerouted[service] = legs
+
+        if self._size - self._tail > max(1000, self._tail // 10):
+            self._build()
+
+    @synchronized
+    def cancel(self, service):
+        """Drop every leg of ``service``"""
+        self._alive[self.legs_of(service)] = False
+        self._rerouted[service] = self._service_legs[:0]
+
+    @synchronized
+    def retime(self, service, minutes):
+        """Shift every leg of ``service`` by ``minutes``"""
+        legs = self.legs_of(service)
+        stations = np.append(self._legs['from'][legs], self._legs['to'][legs][-1:])
+        self.set_path(service, self._legs['row'][legs], stations,
+                      self._legs['start'][legs] + minutes, self._legs['end'][legs] + minutes)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def _lookup(self, index, field, keys):
+        """Live leg ids whose ``field`` is in ``keys``: postings plus a scan of the tail"""
+        keys = np.unique(np.asarray(keys, dtype=np.int64))
+        tail = np.arange(self._tail, self._size)
+        legs = np.concatenate([_postings(index, keys), tail[np.isin(self._legs[field][tail], keys)]])
+        return legs[self._alive[legs]]
+
+    def legs(self, legs):
+        """Leg fields of leg ids, as a dict of arrays"""
+        return {'leg': legs, **{field: values[legs] for field, values in self._legs.items()}}
+
+    @instrument("impact_index.affected")
+    @synchronized
+    def affected(self, rows, start=None, end=None):
+        """Legs planned over ``rows``, optionally only those running between minutes ``start`` and ``end``"""
+        legs = self._lookup(self._by_row, 'row', rows)
+        if start is not None:
+            legs = legs[overlaps(self._legs['start'][legs], self._legs['end'][legs], start, end)]
+        return self.legs(legs[np.argsort(self._legs['start'][legs], kind='stable')])
+
+    @synchronized
+    def connections(self, affected, window=None):
+        """Legs of other services leaving the arrival stations of ``affected`` legs within ``window`` minutes"""
+        window = config.IMPACT_CONNECTION_WINDOW_MIN if window is None else window
+        legs = self._lookup(self._by_station, 'from', affected['to'])
+        if not len(legs) or not len(affected['leg']):
+            return self.legs(legs[:0])
+        # Pair every candidate with the affected legs arriving at its station
+        order = np.argsort(affected['to'], kind='stable')
+        arrivals = affected['to'][order]
+        low = np.searchsorted(arrivals, self._legs['from'][legs], side='left')
+        high = np.searchsorted(arrivals, self._legs['from'][legs], side='right')
+        counts = high - low
+        candidate = np.repeat(legs, counts)
+        feeder = order[np.repeat(low - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())]
+        wait = (self._legs['start'][candidate] - affected['end'][feeder]) % DAY_MIN
+        keep = (wait <= window) & (self._legs['service'][candidate] != affected['service'][feeder])
+        legs = np.unique(candidate[keep])
+        return self.legs(legs[np.argsort(self._legs['start'][legs], kind='stable')])
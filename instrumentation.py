@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Railway Track Monitoring System - Hot-Path Instrumentation
+Decorators and context managers that record duration and allocation
+histograms for named code paths, exported in Prometheus text format (HTTP
+endpoint or file) and summarized for the in-app Performance panels.
+
+Usage:
+    @instrument("streamlit.show_live_tracks")
+    def show_live_tracks(app): ...
+
+    with span("streamlit.sidebar"):
+        ...
+
+A thread can also record a timeline of its spans (``start_timeline`` /
+``stop_timeline``) with ``annotate`` sizes and ``cache_event`` counters,
+which the Streamlit rerun profiler keeps per rerun.
+
+Each thread records into its own buffer, so the hot path takes no locks;
+readers merge the buffers when metrics are exported.  Allocation sizes are
+only recorded while ``tracemalloc`` is tracing (INSTRUMENTATION_TRACE_ALLOCATIONS).
+"""
+
+import os
+import time
+import threading
+import functools
+import tracemalloc
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+
+# Histogram upper bounds (Prometheus "le" labels); the last bucket is +Inf
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+ALLOCATION_BUCKETS = tuple(1024 * 4 ** power for power in range(11))  # 1 KB .. 1 GB
+
+METRIC_PREFIX = "railway"
+
+
+class SpanStats:
+    """Duration and allocation histograms of one span in one thread"""
+
+    __slots__ = ('duration_counts', 'duration_sum', 'duration_max',
+                 'allocation_counts', 'allocation_sum')
+
+    def __init__(self):
+        self.duration_counts = [0] * (len(DURATION_BUCKETS) + 1)
+        self.duration_sum = 0.0
+        self.duration_max = 0.0
+        self.allocation_counts = [0] * (len(ALLOCATION_BUCKETS) + 1)
+        self.allocation_sum = 0
+
+    def record(self, seconds, allocated):
+        self.duration_counts[bisect_left(DURATION_BUCKETS, seconds)] += 1
+        self.duration_sum += seconds
+        if seconds > self.duration_max:
+            self.duration_max = seconds
+        if allocated is not None:
+            self.allocation_counts[bisect_left(ALLOCATION_BUCKETS, allocated)] += 1
+            self.allocation_sum += allocated
+
+    def merge(self, other):
+        for index, count in enumerate(other.duration_counts):
+            self.duration_counts[index] += count
+        self.duration_sum += other.duration_sum
+        self.duration_max = max(self.duration_max, other.duration_max)
+        for index, count in enumerate(other.allocation_counts):
+            self.allocation_counts[index] += count
+        self.allocation_sum += other.allocation_sum
+
+    @property
+    def count(self):
+        return sum(self.duration_counts)
+
+    @property
+    def allocation_count(self):
+        return sum(self.allocation_counts)
+
+
+class MetricsRegistry:
+    """Per-thread span buffers plus the list of every buffer for export"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._buffers = []  # (thread, spans) pairs
+        self._retired = {}  # merged spans of threads that have finished
+        self._buffers_lock = threading.Lock()  # only taken when a thread records its first span
+
+    def buffer(self):
+        """This thread's ``{span name: SpanStats}`` buffer"""
+        try:
+            return self._local.spans
+        except AttributeError:
+            spans = self._local.spans = {}
+            self._local.stack = []
+            with self._buffers_lock:
+                self._buffers.append((threading.current_thread(), spans))
+            return spans
+
+    def stack(self):
+        self.buffer()
+        return self._local.stack
+
+    def record(self, name, seconds, allocated=None):
+        spans = self.buffer()
+        stats = spans.get(name)
+        if stats is None:
+            stats = spans[name] = SpanStats()
+        stats.record(seconds, allocated)
+
+    def snapshot(self):
+        """Merge every thread's buffer into ``{span name: SpanStats}``"""
+        with self._buffers_lock:
+            # Streamlit runs each rerun on a new thread; fold finished threads away
+            alive = []
+            for thread, spans in self._buffers:
+                if thread.is_alive():
+                    alive.append((thread, spans))
+                else:
+                    for name, stats in spans.items():
+                        self._retired.setdefault(name, SpanStats()).merge(stats)
+            self._buffers = alive
+            buffers = [spans for _, spans in alive]
+
+            merged = {}
+            for name, stats in self._retired.items():
+                merged.setdefault(name, SpanStats()).merge(stats)
+        for spans in buffers:
+            for name, stats in list(spans.items()):
+                merged.setdefault(name, SpanStats()).merge(stats)
+        return merged
+
+    def reset(self):
+        with self._buffers_lock:
+            self._retired.clear()
+            for _, spans in self._buffers:
+                spans.clear()
+
+
+registry = MetricsRegistry()
+
+
+class Timeline:
+    """Ordered spans, annotations and cache counters of one thread.
+
+    Started with :func:`start_timeline`; while it is active every span on
+    the thread is appended as an event with its nesting depth and offset.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.duration_ms = None
+        self.events = []
+        self.open = []
+        self.counters = {}
+
+    def enter(self, name, started):
+        event = {'name': name, 'depth': len(self.open),
+                 'start_ms': (started - self.origin) * 1000, 'duration_ms': None}
+        self.events.append(event)
+        self.open.append(event)
+        return event
+
+    def exit(self, event, elapsed):
+        event['duration_ms'] = elapsed * 1000
+        if self.open and self.open[-1] is event:
+            self.open.pop()
+
+    def annotate(self, values):
+        """Add numeric values to the innermost open span (or to the timeline itself)"""
+        target = self.open[-1] if self.open else self.counters
+        for key, value in values.items():
+            target[key] = target.get(key, 0) + value
+
+
+def start_timeline():
+    """Begin recording a timeline of this thread's spans"""
+    timeline = registry._local.timeline = Timeline()
+    return timeline
+
+
+def stop_timeline():
+    """Finish and return this thread's timeline (None when none was started)"""
+    timeline = getattr(registry._local, 'timeline', None)
+    registry._local.timeline = None
+    if timeline is not None:
+        timeline.duration_ms = (time.perf_counter() - timeline.origin) * 1000
+    return timeline
+
+
+def timeline_active():
+    return getattr(registry._local, 'timeline', None) is not None
+
+
+def annotate(**values):
+    """Attach sizes or counts to the current span when a timeline is being recorded"""
+    timeline = getattr(registry._local, 'timeline', None)
+    if timeline is not None:
+        timeline.annotate(values)
+
+
+def cache_event(cache, hit):
+    """Count a cache hit or miss on the active timeline"""
+    timeline = getattr(registry._local, 'timeline', None)
+    if timeline is not None:
+        key = f"{cache}.{'hit' if hit else 'miss'}"
+        timeline.counters[key] = timeline.counters.get(key, 0) + 1
+
+
+class span:
+    """Context manager timing a named block; nesting is allowed"""
+
+    __slots__ = ('name', 'started', 'memory_start', 'memory_peak', 'timeline', 'event')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        if tracemalloc.is_tracing():
+            stack = registry.stack()
+            current, peak = tracemalloc.get_traced_memory()
+            # Keep the enclosing span's peak before the peak is reset for this one
+            if stack:
+                stack[-1].memory_peak = max(stack[-1].memory_peak, peak)
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            self.memory_start = self.memory_peak = current
+            stack.append(self)
+        else:
+            self.memory_start = None
+        self.timeline = getattr(registry._local, 'timeline', None)
+        self.started = time.perf_counter()
+        if self.timeline is not None:
+            self.event = self.timeline.enter(self.name, self.started)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        elapsed = time.perf_counter() - self.started
+        allocated = None
+        if self.memory_start is not None and tracemalloc.is_tracing():
+            peak = max(tracemalloc.get_traced_memory()[1], self.memory_peak)
+            allocated = max(0, peak - self.memory_start)
+            stack = registry.stack()
+            if stack and stack[-1] is self:
+                stack.pop()
+            if stack:
+                stack[-1].memory_peak = max(stack[-1].memory_peak, peak)
+        registry.record(self.name, elapsed, allocated)
+        if self.timeline is not None:
+            self.timeline.exit(self.event, elapsed)
+            if allocated is not None:
+                self.event['allocated_bytes'] = allocated
+        return False
+
+
+def instrument(name=None):
+    """Decorator recording every call of the function as span ``name``"""
+    def decorator(function):
+        if not config.INSTRUMENTATION_ENABLED:
+            return function
+        label = name or f"{function.__module__}.{function.__qualname__}"
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(label):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def enable_allocation_tracing():
+    """Start tracemalloc when allocation histograms are configured"""
+    if config.INSTRUMENTATION_TRACE_ALLOCATIONS and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+# ----------------------------------------------------------------------
+# Export
+# ----------------------------------------------------------------------
+def _histogram_lines(metric, help_text, bounds, series):
+    lines = [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+    for name, counts, total in series:
+        label = name.replace("\\", "\\\\").replace('"', '\\"')
+        cumulative = 0
+        for bound, count in zip(bounds + (float('inf'),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float('inf') else repr(bound)
+            lines.append(f'{metric}_bucket{{span="{label}",le="{le}"}} {cumulative}')
+        lines.append(f'{metric}_sum{{span="{label}"}} {total}')
+        lines.append(f'{metric}_count{{span="{label}"}} {cumulative}')
+    return lines
+
+
+def prometheus_text(snapshot=None):
+    """All span histograms in the Prometheus text exposition format"""
+    snapshot = registry.snapshot() if snapshot is None else snapshot
+    names = sorted(snapshot)
+    lines = _histogram_lines(
+        f"{METRIC_PREFIX}_span_duration_seconds", "Wall time of instrumented code paths",
+        DURATION_BUCKETS,
+        [(name, snapshot[name].duration_counts, round(snapshot[name].duration_sum, 6)) for name in names])
+    traced = [name for name in names if snapshot[name].allocation_count]
+    if traced:
+        lines += _histogram_lines(
+            f"{METRIC_PREFIX}_span_allocation_bytes", "Peak Python memory allocated inside instrumented code paths",
+            ALLOCATION_BUCKETS,
+            [(name, snapshot[name].allocation_counts, snapshot[name].allocation_sum) for name in traced])
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics_file(path=None):
+    """Atomically write the metrics for a node-exporter style textfile collector"""
+    path = path or config.METRICS_FILE
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as handle:
+        handle.write(prometheus_text())
+    os.replace(temporary, path)
+    return path
+
+
+def histogram_quantile(quantile, bounds, counts):
+    """Estimate a quantile from bucket counts by linear interpolation inside the bucket"""
+    total = sum(counts)
+    if not total:
+        return 0.0
+    target = quantile * total
+    cumulative = 0
+    lower = 0.0
+    for bound, count in zip(bounds + (bounds[-1],), counts):
+        if cumulative + count >= target and count:
+            return lower + (bound - lower) * (target - cumulative) / count
+        cumulative += count
+        lower = bound
+    return bounds[-1]
+
+
+def summary_rows(snapshot=None):
+    """One row per span for the Performance panels, slowest total time first"""
+    snapshot = registry.snapshot() if snapshot is None else snapshot
+    rows = []
+    for name, stats in sorted(snapshot.items(), key=lambda item: -item[1].duration_sum):
+        count = stats.count
+        if not count:
+            continue
+        rows.append({
+            'Span': name,
+            'Calls': count,
+            'Mean (ms)': round(stats.duration_sum / count * 1000, 2),
+            # Bucket interpolation can overshoot, the recorded maximum cannot
+            'p50 (ms)': round(min(histogram_quantile(0.5, DURATION_BUCKETS, stats.duration_counts),
+                                  stats.duration_max) * 1000, 2),
+            'p95 (ms)': round(min(histogram_quantile(0.95, DURATION_BUCKETS, stats.duration_counts),
+                                  stats.duration_max) * 1000, 2),
+            'Max (ms)': round(stats.duration_max * 1000, 2),
+            'Total (s)': round(stats.duration_sum, 3),
+            'Mean Alloc (KB)': (round(stats.allocation_sum / stats.allocation_count / 1024, 1)
+                                if stats.allocation_count else ''),
+        })
+    return rows
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Serves /metrics in the Prometheus text format"""
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404, "Only /metrics is served")
+            return
+        data = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_metrics_server = None
+_metrics_error = None
+_metrics_lock = threading.Lock()
+
+
+def ensure_metrics_server():
+    """Start (once per process) the configured /metrics endpoint and return its URL.
+
+    Returns None when the endpoint is disabled or the port is taken; a
+    failed bind is remembered, so later calls (every Streamlit rerun) do not
+    retry it.
+    """
+    global _metrics_server, _metrics_error
+    if not config.METRICS_PORT:
+        return None
+    with _metrics_lock:
+        if _metrics_error is not None:
+            return None
+        if _metrics_server is None:
+            try:
+                _metrics_server = ThreadingHTTPServer((config.METRICS_HOST, config.METRICS_PORT),
+                                                      MetricsRequestHandler)
+            except OSError as e:
+                _metrics_error = str(e)
+                print(f"⚠️  Metrics endpoint unavailable: {e}")
+                return None
+            _metrics_server.daemon_threads = True
+            threading.Thread(target=_metrics_server.serve_forever, daemon=True).start()
+        host, port = _metrics_server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
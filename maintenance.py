@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Railway Track Monitoring System - Maintenance Progress and ETA
+Follows the progress reports of the crews working on blocked tracks and
+estimates when each track will be handed back.  Every track keeps the
+running sums of an ordinary least-squares fit of progress (%) on time, so
+a report costs O(1) and the fits of all blocked tracks are evaluated in
+one vectorized pass.  The ETA is where the fitted line reaches 100 %; its
+confidence band combines the uncertainty of the current level and of the
+work rate.
+
+With ``MAINTENANCE_PUBLISH_ETA`` the estimates are written back to the
+``Estimated Clearance`` column, so tables, maps and the event scheduler
+all use the latest forecast.  Tracks without a usable fit (fewer than two
+reports, or no progress) keep the estimate already in that column.
+"""
+
+import time
+
+import numpy as np
+
+import config
+from instrumentation import instrument
+from network_generator import SCHEMAS
+from track_store import CATEGORIES, column_numbers, synchronized
+
+# Running sums kept per track, in this order
+_SUMS = ('count', 't', 'p', 'tt', 'tp', 'pp')
+
+
+def format_minutes(minutes):
+    """Display form of a duration, matching the store's '45 min' / '2 hours' values"""
+    if minutes < 60:
+        return f"{max(0, round(minutes))} min"
+    hours = round(minutes / 60, 1)
+    return f"{hours:g} hour" if hours == 1 else f"{hours:g} hours"
+
+
+class MaintenanceTracker:
+    """Online progress fits and ETA estimates of the blocked tracks of a store"""
+
+    def __init__(self, store, schema='streamlit', now=None):
+        self.store = store
+        self.clearance_column = SCHEMAS[schema]['clearance']
+        self.origin = time.time() if now is None else now  # Fit times are minutes after this
+        self._sums = np.zeros((len(_SUMS), len(store)), dtype=np.float64)
+        self.last_time = np.full(len(store), np.nan)
+        self.last_progress = np.full(len(store), np.nan)
+        store.subscribe(self.on_store_change)
+
+    def reset(self, rows):
+        """Forget the reports of ``rows`` (new work starts from scratch)"""
+        self._sums[:, rows] = 0.0
+        self.last_time[rows] = np.nan
+        self.last_progress[rows] = np.nan
+
+    def on_store_change(self, rows, columns):
+        """Store listener: tracks entering or leaving the blocked category start over"""
+        if 'category' in columns:
+            self.reset(np.asarray(rows, dtype=np.int64))
+
+    # ------------------------------------------------------------------
+    # Reports
+    # ------------------------------------------------------------------
+    @instrument("maintenance.ingest")
+    @synchronized
+    def ingest(self, rows, progress, times=None):
+        """Add progress reports (%) of ``rows`` taken at epoch seconds ``times`` (now by default)"""
+        rows = np.asarray(rows, dtype=np.int64)
+        progress = np.clip(np.asarray(progress, dtype=np.float64), 0.0, 100.0)
+        times = np.broadcast_to(time.time() if times is None else np.asarray(times, dtype=np.float64), rows.shape)
+        t = (times - self.origin) / 60.0
+        values = np.stack([np.ones(len(rows)), t, progress, t * t, t * progress, progress * progress])
+        np.add.at(self._sums, (slice(None), rows), values)
+
+        # Sorted by time, so the latest report of a track is written last
+        order = np.argsort(times, kind='stable')
+        newer = ~(times[order] < self.last_time[rows[order]])
+        self.last_time[rows[order][newer]] = times[order][newer]
+        self.last_progress[rows[order][newer]] = progress[order][newer]
+        if config.MAINTENANCE_PUBLISH_ETA:
+            self.publish(np.unique(rows))
+
+    # ------------------------------------------------------------------
+    # Estimates
+    # ------------------------------------------------------------------
+    @synchronized
+    def estimates(self, rows=None, now=None):
+        """ETA estimates of ``rows`` (every blocked track by default), as a dict of arrays.
+
+        ``progress`` is the fitted progress now (the last report where there
+        is no fit), ``eta_min`` the minutes until completion, and
+        ``eta_low_min`` / ``eta_high_min`` its confidence band (NaN when
+        unknown, inf when the work might not finish).  ``fitted`` marks the
+        tracks estimated from their reports rather than the clearance column.
+        """
+        rows = self.store.rows('blocked_tracks') if rows is None else np.asarray(rows, dtype=np.int64)
+        now = time.time() if now is None else now
+        count, st, sp, stt, stp, spp = self._sums[:, rows]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_t, mean_p = st / count, sp / count
+            sxx = stt - st * mean_t
+            sxy = stp - st * mean_p
+            syy = spp - sp * mean_p
+            slope = sxy / sxx
+            fitted = (count >= 2) & (sxx > 1e-9) & (slope > 0)
+
+            t = (now - self.origin) / 60.0
+            level = mean_p + slope * (t - mean_t)
+            progress = np.where(fitted, np.clip(level, self.last_progress[rows], 100.0), self.last_progress[rows])
+            eta = np.where(fitted, (100.0 - progress) / slope, np.nan)
+
+            # Residual variance, then standard errors of the current level and of the rate
+            variance = np.maximum(syy - slope * sxy, 0.0) / (count - 2)
+            level_error = np.sqrt(variance * (1.0 / count + (t - mean_t) ** 2 / sxx))
+            slope_error = np.sqrt(variance / sxx)
+            z = config.MAINTENANCE_CONFIDENCE_Z
+            slow = slope - z * slope_error
+            low = (100.0 - np.minimum(progress + z * level_error, 100.0)) / (slope + z * slope_error)
+            high = np.where(slow > 0, (100.0 - np.maximum(progress - z * level_error, 0.0)) / slow, np.inf)
+        banded = fitted & (count > 2)
+
+        # Without a fit, the clearance estimate in the store stands
+        if self.clearance_column in self.store.columns:
+            eta = np.where(fitted, eta, column_numbers(self.store, self.clearance_column, rows))
+        return {
+            'rows': rows,
+            'progress': progress,
+            'eta_min': np.maximum(eta, 0.0),
+            'eta_low_min': np.where(banded, np.maximum(low, 0.0), np.nan),
+            'eta_high_min': np.where(banded, np.maximum(high, 0.0), np.nan),
+            'fitted': fitted,
+            'reports': count.astype(np.int64),
+        }
+
+    def publish(self, rows):
+        """Write the fitted ETAs of blocked ``rows`` to the clearance column where the display value changes"""
+        rows = rows[self.store.category[rows] == CATEGORIES.index('blocked_tracks')]
+        estimate = self.estimates(rows)
+        rows, eta = rows[estimate['fitted']], estimate['eta_min'][estimate['fitted']]
+        if not len(rows) or self.clearance_column not in self.store.columns:
+            return
+        labels = [format_minutes(minutes) for minutes in eta.tolist()]
+        changed = [index for index, (label, current) in
+                   enumerate(zip(labels, self.store.columns[self.clearance_column][rows].tolist())) if label != current]
+        if changed:
+            self.store.set_values(rows[changed], {self.clearance_column: [labels[index] for index in changed]})
+
+
+def soonest(estimate, count=None):
+    """Positions in an ``estimates`` result of the ``count`` tracks due back first"""
+    count = config.MAINTENANCE_DISPLAY_COUNT if count is None else count
+    eta = np.nan_to_num(estimate['eta_min'], nan=np.inf)
+    if len(eta) > count:
+        candidates = np.argpartition(eta, count - 1)[:count]
+    else:
+        candidates = np.arange(len(eta))
+    return candidates[np.argsort(eta[candidates], kind='stable')]
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Railway Track Monitoring System - Canvas Map Projection
+Vectorized Web-Mercator projection of [lat, lon] route coordinates onto a
+canvas, fitted to the canvas size and cached until the view changes.
+"""
+
+import numpy as np
+
+MAX_LATITUDE = 85.05112878
+EARTH_RADIUS_KM = 6371.0
+
+
+def mercator(coords):
+    """Project (k, 2) [lat, lon] degrees to unit Web-Mercator [x, y] (y grows north)"""
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    lat = np.radians(np.clip(coords[:, 0], -MAX_LATITUDE, MAX_LATITUDE))
+    lon = np.radians(coords[:, 1])
+    return np.column_stack((lon, np.log(np.tan(np.pi / 4 + lat / 2))))
+
+
+def inverse_mercator(points):
+    """Inverse of :func:`mercator`, returning (k, 2) [lat, lon] degrees"""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    lat = np.degrees(2 * np.arctan(np.exp(points[:, 1])) - np.pi / 2)
+    return np.column_stack((lat, np.degrees(points[:, 0])))
+
+
+def segment_lengths_km(coords):
+    """Great-circle length of each edge between consecutive [lat, lon] vertices"""
+    lat = np.radians(coords[:, 0])
+    lon = np.radians(coords[:, 1])
+    a = (np.sin(np.diff(lat) / 2) ** 2 +
+         np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def track_lengths_km(coord_offsets, coords):
+    """Total length of every polyline laid out as ``coords[offsets[i]:offsets[i+1]]``"""
+    edges = np.concatenate(([0.0], segment_lengths_km(coords)))
+    # The edge ending at a track's first vertex belongs to the previous track
+    starts = coord_offsets[:-1][np.diff(coord_offsets) > 0]
+    edges[starts] = 0.0
+    cumulative = np.cumsum(edges)
+    ends = np.maximum(coord_offsets[1:] - 1, 0)
+    lengths = np.zeros(len(coord_offsets) - 1)
+    nonempty = np.diff(coord_offsets) > 0
+    lengths[nonempty] = cumulative[ends[nonempty]] - cumulative[coord_offsets[:-1][nonempty]]
+    return lengths
+
+
+class CanvasProjection:
+    """Maps geographic coordinates to canvas pixels for a given view.
+
+    ``fit`` chooses a scale so the given coordinates fill the canvas;
+    ``zoom`` and ``pan`` then adjust the view on top of that fit.  Projected
+    arrays are cached per view, so repeated draws at the same size and zoom
+    do no projection work at all.
+    """
+
+    def __init__(self, padding=40):
+        self.padding = padding
+        self.width = 1
+        self.height = 1
+        self.center = np.zeros(2)
+        self.base_scale = 1.0
+        self.zoom = 1.0
+        self.pan = np.zeros(2)
+        self._cache = {}
+
+    @property
+    def key(self):
+        """Hashable description of the current view"""
+        return (self.width, self.height, float(self.base_scale), float(self.zoom),
+                tuple(self.center), tuple(self.pan))
+
+    @property
+    def scale(self):
+        return self.base_scale * self.zoom
+
+    def fit(self, coords, width, height):
+        """Fit the projection so ``coords`` fill a ``width`` x ``height`` canvas"""
+        self.width, self.height = int(width), int(height)
+        points = mercator(coords)
+        if len(points) == 0:
+            return
+        low, high = points.min(axis=0), points.max(axis=0)
+        span = np.maximum(high - low, 1e-9)
+        usable = np.maximum([self.width - 2 * self.padding, self.height - 2 * self.padding], 1)
+        self.center = (low + high) / 2
+        self.base_scale = float(min(usable / span))
+
+    def resize(self, width, height):
+        """Keep the fitted scale but recentre on a new canvas size"""
+        self.width, self.height = int(width), int(height)
+
+    def set_zoom(self, zoom, anchor=None):
+        """Zoom around an (x, y) canvas anchor (the canvas centre by default)"""
+        zoom = float(zoom)
+        if anchor is not None:
+            anchor = np.asarray(anchor, dtype=np.float64)
+            half = np.array([self.width / 2, self.height / 2])
+            # Keep the geographic point under the anchor fixed on screen
+            self.pan = anchor - half - (anchor - half - self.pan) * (zoom / self.zoom)
+        self.zoom = zoom
+
+    def pan_by(self, dx, dy):
+        self.pan = self.pan + np.array([dx, dy], dtype=np.float64)
+
+    def mercator_to_canvas(self, points):
+        """Unit Web-Mercator points to canvas pixels for the current view"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        pixels = np.empty_like(points)
+        pixels[:, 0] = (points[:, 0] - self.center[0]) * self.scale + self.width / 2 + self.pan[0]
+        pixels[:, 1] = -(points[:, 1] - self.center[1]) * self.scale + self.height / 2 + self.pan[1]
+        return pixels
+
+    def canvas_to_mercator(self, pixels):
+        """Canvas pixels back to unit Web-Mercator points"""
+        pixels = np.asarray(pixels, dtype=np.float64).reshape(-1, 2)
+        points = np.empty_like(pixels)
+        points[:, 0] = (pixels[:, 0] - self.width / 2 - self.pan[0]) / self.scale + self.center[0]
+        points[:, 1] = -(pixels[:, 1] - self.height / 2 - self.pan[1]) / self.scale + self.center[1]
+        return points
+
+    def view_bounds(self, margin=0):
+        """Mercator (xmin, ymin, xmax, ymax) visible on the canvas, grown by ``margin`` pixels"""
+        corners = self.canvas_to_mercator([[-margin, self.height + margin],
+                                           [self.width + margin, -margin]])
+        return corners[0, 0], corners[0, 1], corners[1, 0], corners[1, 1]
+
+    def to_canvas(self, coords):
+        """Project (k, 2) [lat, lon] coordinates to (k, 2) canvas pixels"""
+        return self.mercator_to_canvas(mercator(coords))
+
+    def to_geo(self, pixels):
+        """Canvas pixels back to [lat, lon]"""
+        return inverse_mercator(self.canvas_to_mercator(pixels))
+
+    def mercator_cached(self, name, coords):
+        """Unit Web-Mercator form of ``coords``; independent of the view so computed once"""
+        key = ('mercator', id(coords), len(coords))
+        cached = self._cache.get(('mercator', name))
+        if cached is None or cached[0] != key:
+            cached = (key, mercator(coords))
+            self._cache[('mercator', name)] = cached
+        return cached[1]
+
+    def project_cached(self, name, coords):
+        """Project ``coords`` once per view; ``name`` identifies the array"""
+        key = (self.key, id(coords), len(coords))
+        cached = self._cache.get(name)
+        if cached is None or cached[0] != key:
+            cached = (key, self.mercator_to_canvas(self.mercator_cached(name, coords)))
+            self._cache[name] = cached
+        return cached[1]
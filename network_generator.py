@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Railway Track Monitoring System - Synthetic Network Generator
+Builds seeded, realistic-looking railway networks for load testing:
+stations clustered around real Indian cities, 1k to 1M multi-vertex tracks,
+and trains with schedules.  Output goes straight into a TrackStore using the
+column names of either application; ``operations_simulator`` simulates the
+timetables, telemetry and crew reports that run over it.
+
+Usage:
+    python network_generator.py 100000 --seed 42
+"""
+
+import sys
+import argparse
+import time
+
+import numpy as np
+
+from map_projection import track_lengths_km
+from track_store import CATEGORIES, TrackStore
+
+# Major railway cities: (name, latitude, longitude, relative weight)
+CITIES = [
+    ("Delhi", 28.7041, 77.1025, 10), ("Mumbai", 19.0760, 72.8777, 10),
+    ("Kolkata", 22.5726, 88.3639, 8), ("Chennai", 13.0827, 80.2707, 8),
+    ("Bangalore", 12.9716, 77.5946, 7), ("Hyderabad", 17.3850, 78.4867, 7),
+    ("Ahmedabad", 23.0225, 72.5714, 6), ("Pune", 18.5204, 73.8567, 6),
+    ("Jaipur", 26.9124, 75.7873, 5), ("Lucknow", 26.8467, 80.9462, 5),
+    ("Kanpur", 26.4499, 80.3319, 4), ("Nagpur", 21.1458, 79.0882, 5),
+    ("Indore", 22.7196, 75.8577, 4), ("Bhopal", 23.2599, 77.4126, 4),
+    ("Patna", 25.5941, 85.1376, 4), ("Vadodara", 22.3072, 73.1812, 3),
+    ("Surat", 21.1702, 72.8311, 4), ("Visakhapatnam", 17.6868, 83.2185, 3),
+    ("Vijayawada", 16.5062, 80.6480, 4), ("Bhubaneswar", 20.2961, 85.8245, 3),
+    ("Guwahati", 26.1445, 91.7362, 3), ("Coimbatore", 11.0168, 76.9558, 3),
+    ("Madurai", 9.9252, 78.1198, 2), ("Kochi", 9.9312, 76.2673, 3),
+    ("Thiruvananthapuram", 8.5241, 76.9366, 2), ("Mysore", 12.2958, 76.6394, 2),
+    ("Nashik", 19.9975, 73.7898, 2), ("Rajkot", 22.3039, 70.8022, 2),
+    ("Udaipur", 24.5854, 73.7125, 2), ("Jodhpur", 26.2389, 73.0243, 2),
+    ("Amritsar", 31.6340, 74.8723, 2), ("Ludhiana", 30.9010, 75.8573, 2),
+    ("Varanasi", 25.3176, 82.9739, 3), ("Prayagraj", 25.4358, 81.8463, 3),
+    ("Gorakhpur", 26.7606, 83.3732, 2), ("Raipur", 21.2514, 81.6296, 2),
+    ("Ranchi", 23.3441, 85.3096, 2), ("Jabalpur", 23.1815, 79.9864, 2),
+    ("Goa", 15.2993, 74.1240, 2), ("Hubli", 15.3647, 75.1240, 2),
+]
+
+TRAIN_KINDS = ["Rajdhani", "Shatabdi", "Duronto", "Garib Rath", "Jan Shatabdi",
+               "Intercity", "Superfast", "Mail", "Passenger", "Sampark Kranti"]
+
+# Share of tracks per category, in CATEGORIES order
+CATEGORY_SHARES = (0.40, 0.15, 0.05, 0.40)
+
+# Column names used by each application for the same fields
+SCHEMAS = {
+    'tkinter': {
+        'track_id': 'track_id', 'route': 'route', 'train': 'train', 'status': 'status',
+        'speed': 'speed', 'location': 'location', 'congestion_level': 'congestion_level',
+        'trains_count': 'trains_count', 'delay': 'delay', 'severity': 'severity',
+        'reason': 'reason', 'clearance': 'estimated_clearance', 'capacity': 'capacity',
+        'next_scheduled': 'next_scheduled', 'anomaly': 'anomaly',
+    },
+    'streamlit': {
+        'track_id': 'Track ID', 'route': 'Route', 'train': 'Train', 'status': 'Status',
+        'speed': 'Speed', 'location': 'Current Location', 'congestion_level': 'Congestion Level',
+        'trains_count': 'Trains Count', 'delay': 'Average Delay', 'severity': 'severity',
+        'reason': 'Blocking Reason', 'clearance': 'Estimated Clearance',
+        'capacity': 'Capacity Available', 'next_scheduled': 'Next Scheduled Train',
+        'anomaly': 'Anomaly',
+    },
+}
+
+# Display labels that differ between the applications
+LABELS = {
+    'tkinter': {
+        'running': 'Running', 'high': 'High', 'medium': 'Medium',
+        'reasons': ['Maintenance Work', 'Signal Failure', 'Track Repair'],
+        'anomalies': ['', 'Speed', 'Delay', 'Speed + Delay'],
+    },
+    'streamlit': {
+        'running': '🟢 Running', 'high': '🔴 High', 'medium': '🟡 Medium',
+        'reasons': ['🔧 Maintenance Work', '🚨 Signal Failure', '🛠️ Track Repair'],
+        'anomalies': ['', '⚠️ Speed', '⚠️ Delay', '⚠️ Speed + Delay'],
+    },
+}
+
+# Fields shown for each category (canonical names)
+CATEGORY_FIELDS = {
+    'live_tracks': ['track_id', 'route', 'train', 'status', 'speed', 'location', 'anomaly'],
+    'congested_tracks': ['track_id', 'route', 'congestion_level', 'trains_count', 'delay', 'severity', 'anomaly'],
+    'blocked_tracks': ['track_id', 'route', 'reason', 'clearance'],
+    'free_tracks': ['track_id', 'route', 'capacity', 'next_scheduled'],
+}
+
+
+def generate_stations(n_stations, rng):
+    """Stations scattered around the real city coordinates, weighted by city size"""
+    weights = np.array([city[3] for city in CITIES], dtype=np.float64)
+    city = np.sort(rng.choice(len(CITIES), size=n_stations, p=weights / weights.sum()))
+    centers = np.array([[lat, lon] for _, lat, lon, _ in CITIES])
+    spread = 0.15 + 0.05 * np.sqrt(weights[city])
+    coords = centers[city] + rng.normal(0.0, 1.0, (n_stations, 2)) * spread[:, None]
+
+    # Number stations within their city: "Delhi 1", "Delhi 2", ...
+    first = np.searchsorted(city, city, side='left')
+    local = np.arange(n_stations) - first + 1
+    names = np.array([f"{CITIES[c][0]} {i}" for c, i in zip(city.tolist(), local.tolist())], dtype=object)
+    return names, coords, city
+
+
+def nearest_cities(k=4):
+    """Indices of the k nearest other cities for every city"""
+    centers = np.array([[lat, lon] for _, lat, lon, _ in CITIES])
+    distance = np.linalg.norm(centers[:, None, :] - centers[None, :, :], axis=2)
+    np.fill_diagonal(distance, np.inf)
+    return np.argsort(distance, axis=1)[:, :k]
+
+
+def generate_network(n_tracks=10000, seed=42, schema='tkinter', n_stations=None):
+    """Generate a TrackStore with ``n_tracks`` tracks using an app's column names"""
+    rng = np.random.default_rng(seed)
+    names = SCHEMAS[schema]
+    labels = LABELS[schema]
+    n_stations = n_stations or max(len(CITIES) * 2, n_tracks // 4)
+
+    station_names, station_coords, station_city = generate_stations(n_stations, rng)
+    city_first = np.searchsorted(station_city, np.arange(len(CITIES)), side='left')
+    city_count = np.searchsorted(station_city, np.arange(len(CITIES)), side='right') - city_first
+    neighbours = nearest_cities()
+
+    # Track end points: mostly suburban (same city), sometimes to a neighbouring city
+    start = rng.integers(0, n_stations, n_tracks)
+    target_city = station_city[start].copy()
+    intercity = rng.random(n_tracks) < 0.35
+    target_city[intercity] = neighbours[target_city[intercity], rng.integers(0, neighbours.shape[1], intercity.sum())]
+    target_city[city_count[target_city] == 0] = station_city[start][city_count[target_city] == 0]
+    end = city_first[target_city] + (rng.random(n_tracks) * city_count[target_city]).astype(np.int64)
+    end = np.where(end == start, (end + 1) % n_stations, end)
+
+    # Polylines: end points plus 1-6 interior vertices with a lateral wobble
+    interior = rng.integers(1, 7, n_tracks)
+    lengths = interior + 2
+    offsets = np.zeros(n_tracks + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    track_of_vertex = np.repeat(np.arange(n_tracks), lengths)
+    position = (np.arange(offsets[-1]) - offsets[track_of_vertex]) / (lengths[track_of_vertex] - 1)
+    a, b = station_coords[start][track_of_vertex], station_coords[end][track_of_vertex]
+    direction = b - a
+    normal = np.column_stack((-direction[:, 1], direction[:, 0]))
+    wobble = rng.normal(0.0, 0.06, len(position)) * np.sin(np.pi * position)
+    coords = a + direction * position[:, None] + normal * wobble[:, None]
+
+    category = rng.choice(len(CATEGORIES), size=n_tracks, p=CATEGORY_SHARES).astype(np.int8)
+    track_ids = np.char.add('T', np.char.zfill(np.arange(1, n_tracks + 1).astype(str), 7)).astype(object)
+    routes = np.char.add(np.char.add(station_names[start].astype(str), '-'),
+                         station_names[end].astype(str)).astype(object)
+
+    columns = {names['route']: routes}
+
+    def column(mask, values):
+        array = np.full(n_tracks, '', dtype=object)
+        array[mask] = values
+        return array
+
+    live = category == CATEGORIES.index('live_tracks')
+    n_live = int(live.sum())
+    kinds = np.array(TRAIN_KINDS, dtype=object)[rng.integers(0, len(TRAIN_KINDS), n_live)]
+    cities = np.array([city[0] for city in CITIES], dtype=object)[station_city[start[live]]]
+    columns[names['train']] = column(live, cities + ' ' + kinds + ' Express')
+    columns[names['status']] = column(live, labels['running'])
+    columns[names['speed']] = column(live, np.char.add(rng.integers(60, 140, n_live).astype(str), ' km/h'))
+    km = (rng.random(n_live) * track_lengths_km(offsets, coords)[live]).astype(int)
+    columns[names['location']] = column(live, np.char.add('Kilometer ', km.astype(str)))
+
+    congested = category == CATEGORIES.index('congested_tracks')
+    n_congested = int(congested.sum())
+    high = rng.random(n_congested) < 0.5
+    columns[names['congestion_level']] = column(congested, np.where(high, labels['high'], labels['medium']))
+    trains_count = np.zeros(n_tracks, dtype=np.int64)
+    trains_count[congested] = np.where(high, rng.integers(6, 12, n_congested), rng.integers(3, 6, n_congested))
+    columns[names['trains_count']] = trains_count
+    delay = np.where(high, rng.integers(30, 90, n_congested), rng.integers(5, 30, n_congested))
+    columns[names['delay']] = column(congested, np.char.add(delay.astype(str), ' min'))
+    columns[names['severity']] = column(congested, np.where(high, 'high', 'medium'))
+
+    blocked = category == CATEGORIES.index('blocked_tracks')
+    n_blocked = int(blocked.sum())
+    reasons = np.array(labels['reasons'], dtype=object)
+    columns[names['reason']] = column(blocked, reasons[rng.integers(0, len(reasons), n_blocked)])
+    clearance = rng.integers(1, 17, n_blocked) * 15
+    columns[names['clearance']] = column(blocked, np.where(
+        clearance >= 60,
+        np.char.add((clearance // 60).astype(str), ' hours'),
+        np.char.add(clearance.astype(str), ' min')))
+
+    free = category == CATEGORIES.index('free_tracks')
+    n_free = int(free.sum())
+    columns[names['capacity']] = column(free, '100%')
+    slot = rng.integers(0, 24 * 4, n_free) * 15
+    columns[names['next_scheduled']] = column(free, np.char.add(
+        np.char.add(np.char.zfill((slot // 60).astype(str), 2), ':'), np.char.zfill((slot % 60).astype(str), 2)))
+
+    columns[names['track_id']] = track_ids
+    return TrackStore.from_columns(track_ids, category, columns, offsets, coords, id_column=names['track_id'])
+
+
+def record_fields(schema='tkinter'):
+    """Column names of each category's records in an app's ``tracks_data``"""
+    names = SCHEMAS[schema]
+    return {category: [names[field] for field in fields] for category, fields in CATEGORY_FIELDS.items()}
+
+
+def to_tracks_data(store, schema='tkinter'):
+    """Convert a store back into the ``tracks_data`` dictionaries used by the apps"""
+    tracks_data = {}
+    for category, fields in record_fields(schema).items():
+        fields = [field for field in fields if field in store.columns]
+        rows = store.rows(category)
+        records = [dict(zip(fields, values)) for values in store.values(rows, fields)]
+        for record, row in zip(records, rows.tolist()):
+            coords = store.route_coords(row).tolist()
+            record['route_coords'] = coords if schema == 'streamlit' else [tuple(coord) for coord in coords]
+        tracks_data[category] = records
+    return tracks_data
+
+
+def generate_trains(store, n_trains=None, seed=42):
+    """Trains assigned to tracks with a departure time and cruise speed.
+
+    Returns a dict of equal-length arrays: ``train_id``, ``name``, ``track_row``,
+    ``departure_min`` (minutes after midnight) and ``cruise_kmh``.
+    """
+    rng = np.random.default_rng(seed + 1)
+    candidates = np.concatenate((store.rows('live_tracks'), store.rows('congested_tracks')))
+    if len(candidates) == 0:
+        candidates = store.rows()
+    n_trains = n_trains or len(candidates)
+    track_row = rng.choice(candidates, size=n_trains)
+    numbers = rng.integers(10000, 99999, n_trains)
+    kinds = np.array(TRAIN_KINDS, dtype=object)[rng.integers(0, len(TRAIN_KINDS), n_trains)]
+    return {
+        'train_id': np.char.add('TR', numbers.astype(str)).astype(object),
+        'name': kinds + ' Express ' + numbers.astype(str).astype(object),
+        'track_row': track_row,
+        'departure_min': rng.integers(0, 24 * 60, n_trains),
+        'cruise_kmh': rng.uniform(70, 130, n_trains),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic railway network")
+    parser.add_argument("tracks", type=int, nargs="?", default=10000, help="number of tracks (1k-1M)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--schema", choices=sorted(SCHEMAS), default="tkinter")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    store = generate_network(args.tracks, seed=args.seed, schema=args.schema)
+    elapsed = time.perf_counter() - started
+
+    print(f"🚄 Generated {len(store):,} tracks with {len(store.coords):,} vertices in {elapsed:.2f}s "
+          f"({store.memory_bytes() / 1e6:.1f} MB)")
+    for category in CATEGORIES:
+        print(f"   {category:<18} {len(store.rows(category)):>10,}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,565 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Railway Track Monitoring System - Network Importers
+Streams real network data from local files into a TrackStore:
+
+- GTFS feeds (a directory with stops.txt, trips.txt, stop_times.txt and
+  optionally shapes.txt and routes.txt): every pair of consecutive stations
+  served by a trip becomes one track, drawn along the trip's shape.
+- OSM XML extracts (.osm): ways tagged ``railway=rail`` and similar.
+- GeoJSON railway lines (.geojson FeatureCollection, or .geojsonl/.geojsons
+  with one feature per line as written by ``osmium export -f geojsonseq``).
+
+Files are read in chunks of IMPORT_CHUNK_ROWS rows or features, so memory
+grows with the size of the network rather than the size of the timetable.
+Stops are merged into stations by parent station and by name within a
+small grid cell.  Shape slicing and the decoding of GeoJSON text
+sequences run in worker processes (IMPORT_WORKERS); OSM extracts and
+GeoJSON FeatureCollections are parsed in one process, so convert large
+ones to a GeoJSON sequence first (``osmium export -f geojsonseq`` or
+``ogr2ogr -f GeoJSONSeq``).
+
+Usage:
+    python network_import.py path/to/gtfs_feed --schema tkinter
+    python network_import.py india-railways.geojsonl --snapshot railway_state_tkinter.snap
+"""
+
+import os
+import sys
+import re
+import json
+import time
+import argparse
+import itertools
+import xml.etree.ElementTree as ElementTree
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+
+import config
+from startup import lazy_import
+from track_store import CATEGORIES, TrackStore
+from network_generator import SCHEMAS, LABELS
+
+pd = lazy_import("pandas")
+
+# Stops closer than this (degrees, roughly 500 m) with the same name are one station
+STATION_GRID = 0.005
+
+
+class ImportFormatError(ValueError):
+    """The file is not a GTFS feed, OSM extract or GeoJSON file this module can read"""
+
+
+# ----------------------------------------------------------------------
+# Chunked readers
+# ----------------------------------------------------------------------
+def read_csv_chunks(path, columns, chunk_rows=None):
+    """Yield DataFrames of ``columns`` as strings, ``chunk_rows`` rows at a time.
+
+    Columns missing from the file read as ''.
+    """
+    chunks = pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8-sig',
+                         skipinitialspace=True, usecols=lambda name: name.strip() in columns,
+                         chunksize=chunk_rows or config.IMPORT_CHUNK_ROWS)
+    for chunk in chunks:
+        chunk.columns = [name.strip() for name in chunk.columns]
+        for column in columns:
+            if column not in chunk:
+                chunk[column] = ''
+        yield chunk[list(columns)]
+
+
+def _workers():
+    return config.IMPORT_WORKERS or os.cpu_count() or 1
+
+
+def _parallel_map(function, tasks):
+    """Map over ``tasks`` in worker processes, or inline when that is not worth it"""
+    workers = min(_workers(), len(tasks))
+    if workers <= 1:
+        return [function(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(function, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+
+
+def _streaming_map(function, tasks):
+    """Yield ``function`` of each task in order, reading ``tasks`` lazily.
+
+    At most two tasks per worker are submitted or waiting to be yielded at
+    any time, so a large file is never held in memory as pending batches.
+    """
+    workers = _workers()
+    if workers <= 1:
+        for task in tasks:
+            yield function(task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = deque()
+        for task in tasks:
+            while len(futures) >= 2 * workers:
+                wait([future for future in futures if not future.done()], return_when=FIRST_COMPLETED)
+                while futures and futures[0].done():
+                    yield futures.popleft().result()
+            futures.append(pool.submit(function, task))
+        while futures:
+            yield futures.popleft().result()
+
+
+class StationIndex:
+    """Deduplicates stops into stations.
+
+    Stops with a parent station collapse into the parent; stops sharing a
+    name inside one STATION_GRID cell are the same station.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.coords = []
+        self._by_key = {}
+
+    def add(self, name, lat, lon):
+        key = (name.strip().lower(), round(lat / STATION_GRID), round(lon / STATION_GRID))
+        station = self._by_key.get(key)
+        if station is None:
+            station = self._by_key[key] = len(self.names)
+            self.names.append(name.strip() or f"Junction {station + 1}")
+            self.coords.append((lat, lon))
+        return station
+
+    def __len__(self):
+        return len(self.names)
+
+
+# ----------------------------------------------------------------------
+# Store assembly
+# ----------------------------------------------------------------------
+def build_store(schema, track_ids, category, polylines, values):
+    """TrackStore from per-track polylines and canonical ``{field: values}``.
+
+    Fields the source has no data for are left blank, so both apps can show
+    every category.
+    """
+    names = SCHEMAS[schema]
+    count = len(track_ids)
+    lengths = np.fromiter((len(polyline) for polyline in polylines), dtype=np.int64, count=count)
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    coords = np.concatenate(polylines).reshape(-1, 2) if count else np.empty((0, 2))
+
+    columns = {}
+    for field, column in names.items():
+        if field in values:
+            columns[column] = values[field]
+        elif field == 'trains_count':
+            columns[column] = np.zeros(count, dtype=np.int64)
+        else:
+            columns[column] = np.full(count, '', dtype=object)
+    track_ids = np.asarray(track_ids, dtype=object)
+    columns[names['track_id']] = track_ids
+    return TrackStore.from_columns(track_ids, np.asarray(category, dtype=np.int8), columns,
+                                   offsets, coords, id_column=names['track_id'])
+
+
+def _object_array(values):
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+# ----------------------------------------------------------------------
+# GTFS
+# ----------------------------------------------------------------------
+def read_gtfs_stations(path):
+    """Map stop ids to deduplicated stations; returns (stop -> station, StationIndex)"""
+    stops = []
+    parents = {}
+    for chunk in read_csv_chunks(os.path.join(path, 'stops.txt'),
+                                 ('stop_id', 'stop_name', 'stop_lat', 'stop_lon', 'parent_station')):
+        # Generic nodes and boarding areas have no position
+        chunk = chunk.assign(stop_lat=pd.to_numeric(chunk['stop_lat'], errors='coerce'),
+                             stop_lon=pd.to_numeric(chunk['stop_lon'], errors='coerce')).dropna()
+        stops.extend(zip(chunk['stop_id'], chunk['stop_name'], chunk['stop_lat'], chunk['stop_lon']))
+        children = chunk[chunk['parent_station'] != '']
+        parents.update(zip(children['stop_id'], children['parent_station']))
+
+    # Children take their parent's station (parents may be listed after them)
+    positions = {stop_id: (name, lat, lon) for stop_id, name, lat, lon in stops}
+    stations = StationIndex()
+    stop_station = {}
+    for stop_id, _, _, _ in stops:
+        root = stop_id
+        for _ in range(3):  # platform -> station, or entrance -> station
+            if parents.get(root) not in positions:
+                break
+            root = parents[root]
+        stop_station[stop_id] = stations.add(*positions[root])
+    return stop_station, stations
+
+
+def read_gtfs_trips(path):
+    """trip_id -> (route label, shape_id) with labels from routes.txt when present"""
+    route_names = {}
+    routes_path = os.path.join(path, 'routes.txt')
+    if os.path.exists(routes_path):
+        for chunk in read_csv_chunks(routes_path, ('route_id', 'route_short_name', 'route_long_name')):
+            for route_id, short_name, long_name in chunk.itertuples(index=False):
+                route_names[route_id] = long_name or short_name or route_id
+
+    trips = {}
+    for chunk in read_csv_chunks(os.path.join(path, 'trips.txt'), ('trip_id', 'route_id', 'shape_id')):
+        for trip_id, route_id, shape_id in chunk.itertuples(index=False):
+            # Interned, as national feeds repeat the same few thousand routes and shapes
+            trips[trip_id] = (sys.intern(route_names.get(route_id, route_id)), sys.intern(shape_id))
+    return trips
+
+
+def read_gtfs_segments(path, stop_station, n_stations):
+    """Stream stop_times.txt into ``{(station, station): [trips, first trip_id]}``.
+
+    Feeds list each trip's stop times together, so a chunk holds whole trips
+    except the last one, which is carried over into the next chunk.
+    """
+    segments = {}
+    stations = pd.Series(stop_station, dtype=np.float64)
+    carry = None
+
+    def add(chunk):
+        chunk = chunk.assign(station=chunk['stop_id'].map(stations),
+                             sequence=pd.to_numeric(chunk['stop_sequence'], errors='coerce'))
+        # Unknown stops are skipped, joining the stops either side of them
+        chunk = chunk.dropna(subset=['station']).sort_values(['trip_id', 'sequence'], kind='stable')
+        trip = pd.factorize(chunk['trip_id'])[0]
+        station = chunk['station'].to_numpy(dtype=np.int64)
+        a, b = station[:-1], station[1:]
+        consecutive = np.flatnonzero((trip[:-1] == trip[1:]) & (a != b))
+        keys = np.minimum(a, b)[consecutive] * n_stations + np.maximum(a, b)[consecutive]
+        unique, first, counts = np.unique(keys, return_index=True, return_counts=True)
+        trip_ids = chunk['trip_id'].to_numpy()[consecutive[first]]
+        for key, count, trip_id in zip(unique.tolist(), counts.tolist(), trip_ids):
+            segment = segments.get(key)
+            if segment is None:
+                segments[key] = [count, trip_id]
+            else:
+                segment[0] += count
+
+    for chunk in read_csv_chunks(os.path.join(path, 'stop_times.txt'), ('trip_id', 'stop_sequence', 'stop_id')):
+        if carry is not None:
+            chunk = pd.concat((carry, chunk), ignore_index=True)
+        last = chunk['trip_id'].iat[-1]
+        carry = chunk[chunk['trip_id'] == last]
+        add(chunk[chunk['trip_id'] != last])
+    if carry is not None:
+        add(carry)
+    return {divmod(key, n_stations): segment for key, segment in segments.items()}
+
+
+def read_gtfs_shapes(path, shape_ids):
+    """Points of the wanted shapes only, ordered by sequence: ``{shape_id: (N, 2) array}``"""
+    shapes_path = os.path.join(path, 'shapes.txt')
+    if not shape_ids or not os.path.exists(shapes_path):
+        return {}
+    parts = []
+    for chunk in read_csv_chunks(shapes_path, ('shape_id', 'shape_pt_sequence', 'shape_pt_lat', 'shape_pt_lon')):
+        parts.append(chunk[chunk['shape_id'].isin(shape_ids)])
+    points = pd.concat(parts, ignore_index=True)
+    for column in ('shape_pt_sequence', 'shape_pt_lat', 'shape_pt_lon'):
+        points[column] = pd.to_numeric(points[column], errors='coerce')
+    points = points.dropna().sort_values(['shape_id', 'shape_pt_sequence'], kind='stable')
+    ids = points['shape_id'].to_numpy()
+    if len(ids) == 0:
+        return {}
+    boundaries = np.flatnonzero(ids[1:] != ids[:-1]) + 1
+    coords = points[['shape_pt_lat', 'shape_pt_lon']].to_numpy(dtype=np.float64)
+    return dict(zip(ids[np.r_[0, boundaries]], np.split(coords, boundaries)))
+
+
+def cut_shape(task):
+    """Worker: slice one shape between the end stations of each segment on it.
+
+    ``task`` is ``(shape points, [(segment, a_lat, a_lon, b_lat, b_lon), ...])``;
+    returns ``[(segment, polyline), ...]`` with the stations as end points.
+    """
+    points, segments = task
+    results = []
+    for segment, a_lat, a_lon, b_lat, b_lon in segments:
+        ends = np.array(((a_lat, a_lon), (b_lat, b_lon)))
+        nearest = ((points[:, None, :] - ends[None, :, :]) ** 2).sum(axis=2).argmin(axis=0)
+        first, last = int(nearest[0]), int(nearest[1])
+        interior = points[first + 1:last] if first <= last else points[last + 1:first][::-1]
+        results.append((segment, np.vstack((ends[:1], interior, ends[1:]))))
+    return results
+
+
+def import_gtfs(path, schema='tkinter'):
+    """TrackStore of the station-to-station segments served by a GTFS feed"""
+    for name in ('stops.txt', 'trips.txt', 'stop_times.txt'):
+        if not os.path.exists(os.path.join(path, name)):
+            raise ImportFormatError(f"{path} is not a GTFS feed: {name} is missing")
+
+    stop_station, stations = read_gtfs_stations(path)
+    trips = read_gtfs_trips(path)
+    segments = read_gtfs_segments(path, stop_station, len(stations))
+    station_coords = np.array(stations.coords, dtype=np.float64).reshape(-1, 2)
+
+    keys = list(segments)
+    first_trips = [trips.get(segments[key][1], ('', '')) for key in keys]
+    polylines = [station_coords[list(key)] for key in keys]
+
+    # Segments grouped by the shape of their first trip; each group is one worker task
+    by_shape = {}
+    for index, (key, (_, shape_id)) in enumerate(zip(keys, first_trips)):
+        if shape_id:
+            a, b = station_coords[key[0]], station_coords[key[1]]
+            by_shape.setdefault(shape_id, []).append((index, a[0], a[1], b[0], b[1]))
+    shapes = read_gtfs_shapes(path, set(by_shape))
+    tasks = [(shapes[shape_id], group) for shape_id, group in by_shape.items() if shape_id in shapes]
+    for results in _parallel_map(cut_shape, tasks):
+        for index, polyline in results:
+            polylines[index] = polyline
+
+    labels = LABELS[schema]
+    names = stations.names
+    count = len(keys)
+    return build_store(
+        schema,
+        [f"G{index + 1:07d}" for index in range(count)],
+        np.full(count, CATEGORIES.index('live_tracks'), dtype=np.int8),
+        polylines,
+        {
+            'route': _object_array([f"{names[a]}-{names[b]}" for a, b in keys]),
+            'train': _object_array([route for route, _ in first_trips]),
+            'status': np.full(count, labels['running'], dtype=object),
+            'trains_count': np.fromiter((segments[key][0] for key in keys), dtype=np.int64, count=count),
+        })
+
+
+# ----------------------------------------------------------------------
+# OSM XML and GeoJSON railway lines
+# ----------------------------------------------------------------------
+def _is_railway(tags):
+    return tags.get('railway') in config.IMPORT_RAILWAY_TYPES
+
+
+def _iter_osm_elements(path):
+    """Yield the top-level nodes, ways and relations of an OSM file, then free them"""
+    root = None
+    for event, element in ElementTree.iterparse(path, events=('start', 'end')):
+        if root is None:
+            root = element
+        elif event == 'end' and element.tag in ('node', 'way', 'relation'):
+            yield element
+            root.clear()
+
+
+def import_osm(path, schema='tkinter'):
+    """TrackStore of the railway ways in an OSM XML extract.
+
+    Two streaming passes: the first keeps the node references of railway
+    ways, the second the positions of just those nodes.
+    """
+    ways = []
+    for element in _iter_osm_elements(path):
+        if element.tag == 'way':
+            tags = {tag.get('k'): tag.get('v') for tag in element.iter('tag')}
+            if _is_railway(tags):
+                refs = np.array([int(nd.get('ref')) for nd in element.iter('nd')], dtype=np.int64)
+                ways.append((element.get('id'), tags.get('name') or tags.get('ref') or '', refs))
+    if not ways:
+        return build_store(schema, [], [], [], {})
+
+    needed = np.unique(np.concatenate([refs for _, _, refs in ways]))
+    positions = np.full((len(needed), 2), np.nan)
+    wanted = set(needed.tolist())
+    for element in _iter_osm_elements(path):
+        if element.tag == 'node':
+            node_id = int(element.get('id'))
+            if node_id in wanted:
+                positions[np.searchsorted(needed, node_id)] = (float(element.get('lat')), float(element.get('lon')))
+
+    lines = []
+    for way_id, name, refs in ways:
+        polyline = positions[np.searchsorted(needed, refs)]
+        polyline = polyline[~np.isnan(polyline[:, 0])]
+        if len(polyline) >= 2:
+            lines.append((f"W{way_id}", name or f"Way {way_id}", polyline))
+    return _lines_store(lines, schema)
+
+
+def _feature_lines(feature):
+    """(track id, name, polyline) for each line of a railway GeoJSON feature"""
+    properties = feature.get('properties') or {}
+    if 'railway' in properties and not _is_railway(properties):
+        return []
+    geometry = feature.get('geometry') or {}
+    if geometry.get('type') == 'LineString':
+        parts = [geometry['coordinates']]
+    elif geometry.get('type') == 'MultiLineString':
+        parts = geometry['coordinates']
+    else:
+        return []
+
+    # 0 is a valid id
+    feature_id = next((str(value) for value in (feature.get('id'), properties.get('@id'), properties.get('id'))
+                       if value is not None and value != ''), '')
+    name = properties.get('name') or properties.get('ref') or ''
+    lines = []
+    for part, coordinates in enumerate(parts):
+        if len(coordinates) < 2:
+            continue
+        # GeoJSON positions are [lon, lat]; the store keeps [lat, lon]
+        polyline = np.array([position[:2] for position in coordinates], dtype=np.float64)[:, ::-1]
+        suffix = f"-{part + 1}" if len(parts) > 1 else ""
+        lines.append((feature_id + suffix, name, polyline))
+    return lines
+
+
+def decode_features(lines):
+    """Worker: decode a batch of GeoJSON text sequence lines into railway lines"""
+    tracks = []
+    for line in lines:
+        line = line.strip().lstrip('\x1e')
+        if line:
+            tracks.extend(_feature_lines(json.loads(line)))
+    return tracks
+
+
+def iter_feature_collection(path, block_size=1 << 20):
+    """Yield the features of a FeatureCollection without loading the whole file"""
+    decoder = json.JSONDecoder()
+    separators = re.compile(r'[\s,]*')
+    with open(path, encoding='utf-8') as handle:
+        buffer = handle.read(block_size)
+        start = buffer.find('"features"')
+        while start < 0:
+            more = handle.read(block_size)
+            if not more:
+                raise ImportFormatError(f"{path} has no features array")
+            buffer = buffer[-16:] + more
+            start = buffer.find('"features"')
+        position = buffer.find('[', start)
+        while position < 0:
+            # The array opens in the next block
+            more = handle.read(block_size)
+            if not more:
+                raise ImportFormatError(f"{path} has no features array")
+            buffer += more
+            position = buffer.find('[', start)
+        position += 1
+
+        while True:
+            position = separators.match(buffer, position).end()
+            if buffer.startswith(']', position):
+                return
+            try:
+                feature, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The feature continues in the next block
+                more = handle.read(block_size)
+                if not more:
+                    raise ImportFormatError(f"{path} ends inside a feature")
+                buffer, position = buffer[position:] + more, 0
+                continue
+            yield feature
+
+
+GEOJSON_SEQUENCE_EXTENSIONS = ('.geojsonl', '.geojsons', '.geojsonseq', '.jsonl')
+
+
+def import_geojson(path, schema='tkinter'):
+    """TrackStore of the railway lines in a GeoJSON file.
+
+    Text sequences are decoded in worker processes; a FeatureCollection is
+    parsed in this one, since handing parsed features to workers would
+    cost as much as converting them here.
+    """
+    lines = []
+    if not path.lower().endswith(GEOJSON_SEQUENCE_EXTENSIONS):
+        features = []
+        for feature in iter_feature_collection(path):
+            features.append(feature)
+            if len(features) >= config.IMPORT_CHUNK_ROWS:
+                lines.extend(line for feature in features for line in _feature_lines(feature))
+                features.clear()
+        lines.extend(line for feature in features for line in _feature_lines(feature))
+    else:
+        # One feature per line: batches of lines are decoded in worker processes
+        with open(path, encoding='utf-8') as handle:
+            batches = iter(lambda: list(itertools.islice(handle, config.IMPORT_CHUNK_ROWS)), [])
+            for tracks in _streaming_map(decode_features, batches):
+                lines.extend(tracks)
+    return _lines_store(lines, schema)
+
+
+def _lines_store(lines, schema):
+    """Store of free tracks named after their end stations (deduplicated by position)"""
+    stations = StationIndex()
+    routes = []
+    for _, name, polyline in lines:
+        start = stations.add("", polyline[0, 0], polyline[0, 1])
+        end = stations.add("", polyline[-1, 0], polyline[-1, 1])
+        routes.append(name or f"{stations.names[start]}-{stations.names[end]}")
+
+    count = len(lines)
+    seen = {}
+    track_ids = []
+    for index, (track_id, _, _) in enumerate(lines):
+        track_id = track_id or f"L{index + 1:07d}"
+        seen[track_id] = seen.get(track_id, 0) + 1
+        track_ids.append(track_id if seen[track_id] == 1 else f"{track_id}#{seen[track_id]}")
+
+    return build_store(
+        schema, track_ids,
+        np.full(count, CATEGORIES.index('free_tracks'), dtype=np.int8),
+        [polyline for _, _, polyline in lines],
+        {
+            'route': _object_array(routes),
+            'capacity': np.full(count, '100%', dtype=object),
+        })
+
+
+# ----------------------------------------------------------------------
+# Entry points
+# ----------------------------------------------------------------------
+def load_network(path, schema='tkinter'):
+    """Import a GTFS directory, .osm file or GeoJSON file by its type"""
+    if os.path.isdir(path):
+        return import_gtfs(path, schema)
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.osm', '.xml'):
+        return import_osm(path, schema)
+    if extension in ('.geojson', '.json') + GEOJSON_SEQUENCE_EXTENSIONS:
+        return import_geojson(path, schema)
+    raise ImportFormatError(f"Don't know how to import {path} (expected a GTFS directory, .osm or .geojson)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a real railway network into a track store")
+    parser.add_argument("path", help="GTFS feed directory, .osm extract or GeoJSON file")
+    parser.add_argument("--schema", choices=sorted(SCHEMAS), default="tkinter")
+    parser.add_argument("--snapshot", help="write the imported network to a snapshot file")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        store = load_network(args.path, args.schema)
+    except (OSError, ImportFormatError) as e:
+        print(f"❌ {e}")
+        return 1
+    elapsed = time.perf_counter() - started
+
+    print(f"🚄 Imported {len(store):,} tracks with {len(store.coords):,} vertices in {elapsed:.2f}s "
+          f"({store.memory_bytes() / 1e6:.1f} MB)")
+    for category in CATEGORIES:
+        print(f"   {category:<18} {len(store.rows(category)):>10,}")
+    if args.snapshot:
+        from snapshot import write_snapshot, network_source
+        size = write_snapshot(store, args.snapshot, source=network_source(args.path))
+        print(f"💾 Snapshot written to {args.snapshot} ({size / 1e6:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
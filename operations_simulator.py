@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Railway Track Monitoring System - Simulated Operations
+Seeded stand-ins for the live feeds of a railway: the daily timetable of
+planned services, train telemetry batches, and the progress reports of
+maintenance crews.  They run over any TrackStore, generated or imported.
+"""
+
+import time
+import threading
+
+import numpy as np
+
+from instrumentation import instrument
+from map_projection import track_lengths_km
+from track_store import parse_quantity, group_csr, column_numbers
+from network_generator import SCHEMAS, generate_trains
+from delay_propagation import station_ids
+
+
+def generate_timetable(store, n_services=None, max_legs=6, dwell_min=2.0, seed=42, train_column=None):
+    """Daily services that run from track to track through shared stations.
+
+    Every named train in ``train_column`` starts a service on its track and
+    ``generate_trains`` adds the rest.  Returns a dict with ``name`` per
+    service and the leg arrays ``leg_service``, ``leg_row``, ``leg_from``
+    and ``leg_to`` (station ids), ``leg_start`` and ``leg_end`` (minutes
+    after midnight, past 1440 for services running over midnight).
+    """
+    rng = np.random.default_rng(seed + 4)
+    stations = station_ids(store.coord_offsets, store.coords)
+    km = track_lengths_km(store.coord_offsets, store.coords)
+    placed = np.flatnonzero((stations >= 0).all(axis=1))
+    ends = stations[placed].ravel()
+    offsets, incident = group_csr(ends, int(ends.max()) + 1 if len(ends) else 0, np.repeat(placed, 2))
+
+    named = np.empty(0, dtype=np.int64)
+    if train_column in store.columns:
+        named = np.flatnonzero(np.array([str(value).strip() != '' for value in store.columns[train_column].tolist()]))
+    trains = generate_trains(store, n_trains=n_services, seed=seed)
+    names = np.concatenate([store.columns[train_column][named] if len(named) else np.empty(0, dtype=object),
+                            trains['name']])
+    current = np.concatenate([named, trains['track_row']])
+    clock = np.concatenate([rng.integers(0, 24 * 60, len(named)), trains['departure_min']]).astype(np.float64)
+    speed = np.concatenate([rng.uniform(70, 130, len(named)), trains['cruise_kmh']])
+
+    service = np.arange(len(current))
+    keep = (stations[current] >= 0).all(axis=1)
+    service, current, clock, speed = service[keep], current[keep], clock[keep], speed[keep]
+    forward = rng.random(len(service)) < 0.5
+    origin = np.where(forward, stations[current, 0], stations[current, 1])
+    previous = np.full(len(service), -1, dtype=np.int64)
+    legs = []
+    for _ in range(max_legs):
+        if not len(service):
+            break
+        destination = np.where(stations[current, 0] == origin, stations[current, 1], stations[current, 0])
+        arrival = clock + km[current] / speed * 60.0
+        legs.append((service, current, origin, destination, clock, arrival))
+
+        # Continue over a random other track at the destination; some services terminate there
+        counts = offsets[destination + 1] - offsets[destination]
+        following = incident[offsets[destination] + (rng.random(len(service)) * counts).astype(np.int64)]
+        going = (following != current) & (following != previous) & (rng.random(len(service)) >= 0.2)
+        service, previous, current, origin = service[going], current[going], following[going], destination[going]
+        clock, speed = arrival[going] + dwell_min, speed[going]
+
+    leg_arrays = [np.concatenate(column) for column in zip(*legs)] if legs else [np.empty(0)] * 6
+    order = np.argsort(leg_arrays[0], kind='stable')
+    keys = ('leg_service', 'leg_row', 'leg_from', 'leg_to', 'leg_start', 'leg_end')
+    timetable = {key: values[order] for key, values in zip(keys, leg_arrays)}
+    timetable['name'] = names
+    return timetable
+
+
+class TelemetryStream:
+    """Seeded stream of train telemetry batches for the apps, benchmarks and rule testing.
+
+    Every call to ``next_batch`` advances all trains by ``dt`` seconds and
+    returns a dict of arrays: ``train``, ``track_row``, ``timestamp``,
+    ``km``, ``speed_kmh`` and ``delay_min``.  A small share of samples carry
+    sudden speed drops so detectors have something to find.  Trains start
+    on time unless ``delay`` gives their minutes late.
+    """
+
+    def __init__(self, store, trains, seed=42, anomaly_rate=0.001, start_time=None, delay=None):
+        self.rng = np.random.default_rng(seed + 2)
+        self.trains = trains
+        self.track_row = trains['track_row']
+        self.route_km = np.maximum(track_lengths_km(store.coord_offsets, store.coords)[self.track_row], 1.0)
+        self.km = self.rng.random(len(self.track_row)) * self.route_km
+        self.direction = np.where(self.rng.random(len(self.track_row)) < 0.5, 1.0, -1.0)
+        self.speed = trains['cruise_kmh'].copy()
+        self.delay = np.zeros(len(self.track_row)) if delay is None else np.array(delay, dtype=np.float64)
+        self.anomaly_rate = anomaly_rate
+        self.timestamp = time.time() if start_time is None else start_time
+
+    def next_batch(self, dt=1.0):
+        count = len(self.track_row)
+        cruise = self.trains['cruise_kmh']
+        # Mean-reverting random walk around the cruise speed
+        self.speed += 0.2 * (cruise - self.speed) + self.rng.normal(0.0, 2.0, count)
+        drops = self.rng.random(count) < self.anomaly_rate
+        self.speed[drops] *= self.rng.uniform(0.2, 0.5, drops.sum())
+        np.clip(self.speed, 0.0, 160.0, out=self.speed)
+
+        self.km += self.direction * self.speed * dt / 3600.0
+        turned = (self.km < 0) | (self.km > self.route_km)
+        self.direction[turned] *= -1
+        np.clip(self.km, 0.0, self.route_km, out=self.km)
+
+        # Running below cruise speed accumulates delay, running above recovers it
+        self.delay = np.maximum(0.0, self.delay + (cruise - self.speed) / cruise * dt / 60.0)
+        self.timestamp += dt
+        return {
+            'train': np.arange(count),
+            'track_row': self.track_row,
+            'timestamp': np.full(count, self.timestamp),
+            'km': self.km.copy(),
+            'speed_kmh': self.speed.copy(),
+            'delay_min': self.delay.copy(),
+        }
+
+
+def store_trains(store, schema='tkinter', seed=42):
+    """One train per store row, cruising at the row's Speed where it shows one.
+
+    Returns the ``track_row`` and ``cruise_kmh`` arrays of ``generate_trains``;
+    train ``i`` runs on row ``i``, which is how the apps key their detectors.
+    """
+    rng = np.random.default_rng(seed + 5)
+    rows = store.rows()
+    column = SCHEMAS[schema]['speed']
+    speed = column_numbers(store, column, rows) if column in store.columns else np.zeros(len(rows))
+    return {
+        'track_row': rows,
+        'cruise_kmh': np.where(speed > 0, speed, rng.uniform(70, 130, len(rows))),
+    }
+
+
+class LiveTelemetry:
+    """Telemetry of the trains on a store's live and congested tracks, written to its columns.
+
+    Every ``tick`` takes one ``TelemetryStream`` batch (one train per row)
+    and writes the Speed, Delay and Location of the running tracks, so the
+    store's listeners (alert rules, anomaly detector, tables) see each batch
+    as a telemetry update.
+    """
+
+    RUNNING = ('live_tracks', 'congested_tracks')
+    MAX_STEP_S = 60.0  # A long pause (an idle session, a suspended laptop) runs the trains one minute on
+
+    def __init__(self, store, schema='tkinter', seed=42, now=None):
+        self.store = store
+        self.names = SCHEMAS[schema]
+        column = self.names['delay']
+        with store.lock:
+            delay = column_numbers(store, column, store.rows()) if column in store.columns else None
+            self.stream = TelemetryStream(store, store_trains(store, schema, seed), seed=seed,
+                                          start_time=now, delay=delay)
+        self.last = self.stream.timestamp
+        self._stop = threading.Event()
+
+    @instrument("operations_simulator.telemetry_tick")
+    def tick(self, now=None):
+        """Write a batch covering the time since the last one; returns the rows written"""
+        now = time.time() if now is None else now
+        batch = self.stream.next_batch(min(max(now - self.last, 0.0), self.MAX_STEP_S))
+        self.last = now
+        with self.store.lock:
+            rows = np.concatenate([self.store.rows(category) for category in self.RUNNING])
+            self.store.set_values(rows, {
+                self.names['speed']: np.char.add(np.rint(batch['speed_kmh'][rows]).astype(np.int64).astype(str),
+                                                 ' km/h').astype(object),
+                self.names['delay']: np.char.add(np.rint(batch['delay_min'][rows]).astype(np.int64).astype(str),
+                                                 ' min').astype(object),
+                self.names['location']: np.char.add('Kilometer ',
+                                                    batch['km'][rows].astype(np.int64).astype(str)).astype(object),
+            })
+        return rows
+
+    def run(self, interval):
+        """Tick every ``interval`` seconds until ``stop`` (the body of a background thread)"""
+        while not self._stop.wait(interval):
+            self.tick()
+
+    def stop(self):
+        self._stop.set()
+
+
+class WorkReports:
+    """Seeded progress reports (%) of the crews working on blocked tracks.
+
+    Each track gets a starting progress and a work rate that finishes the
+    job around its ``clearance`` estimate; ``report`` returns noisy,
+    clipped readings of that line at a given time.
+    """
+
+    def __init__(self, store, schema='tkinter', seed=42, start_time=None):
+        rng = np.random.default_rng(seed + 3)
+        self.rng = rng
+        self.start_time = time.time() if start_time is None else start_time
+        self.progress = rng.uniform(5.0, 90.0, len(store))
+        column = SCHEMAS[schema]['clearance']
+        remaining = np.full(len(store), 60.0)
+        if column in store.columns:
+            codes, labels = store.codes(column)
+            minutes = np.array([parse_quantity(label) or 0.0 for label in labels.tolist()])[codes]
+            remaining = np.where(minutes > 0, minutes, remaining)
+        # Percent per minute; crews run faster or slower than estimated
+        self.rate = (100.0 - self.progress) / (remaining * rng.lognormal(0.0, 0.3, len(store)))
+
+    def report(self, rows, now=None):
+        now = time.time() if now is None else now
+        elapsed = (now - self.start_time) / 60.0
+        noise = self.rng.normal(0.0, 1.5, len(rows))
+        return np.clip(self.progress[rows] + self.rate[rows] * elapsed + noise, 0.0, 100.0)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Railway Track Monitoring System - Encoded Polyline Codec
+Vectorized Google encoded polyline format for track geometry: [lat, lon]
+vertices rounded to 1e-5 degrees (about 1 m), delta-encoded per track,
+zigzagged and written as 5-bit ASCII chunks.  A vertex takes 4-8 bytes
+instead of 16 as float64 or 20-40 as JSON text, and the browser decodes it
+with a few lines of JavaScript (Leaflet plugins and most map APIs accept it).
+
+All tracks of a store are encoded as one stream; per-track strings are
+slices of it.
+"""
+
+import numpy as np
+
+PRECISION = 1e5
+_BLOCK = 1 << 20  # Values or chunks processed per vectorized step
+
+# Decoder used by the browser payload (same format, returns [[lat, lon], ...])
+DECODE_JS = """function decodePolyline(s) {
+  var points = [], index = 0, lat = 0, lon = 0;
+  while (index < s.length) {
+    var values = [0, 0];
+    for (var axis = 0; axis < 2; axis++) {
+      var b, shift = 0, result = 0;
+      do {
+        b = s.charCodeAt(index++) - 63;
+        result += (b & 0x1f) * Math.pow(2, shift);
+        shift += 5;
+      } while (b >= 0x20);
+      values[axis] = (result % 2) ? -(result + 1) / 2 : result / 2;
+    }
+    lat += values[0];
+    lon += values[1];
+    points.push([lat / 1e5, lon / 1e5]);
+  }
+  return points;
+}"""
+
+
+def _deltas(coord_offsets, coords):
+    """Integer [lat, lon] deltas, restarting from zero at every track"""
+    rounded = np.round(np.asarray(coords, dtype=np.float64).reshape(-1, 2) * PRECISION).astype(np.int64)
+    deltas = np.diff(rounded, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+    starts = np.asarray(coord_offsets[:-1], dtype=np.int64)
+    starts = starts[starts < len(rounded)]
+    deltas[starts] = rounded[starts]
+    return deltas.ravel()
+
+
+def _chunks(values):
+    """ASCII chunks of zigzagged values and the number of chunks per value"""
+    zigzag = np.where(values < 0, ~(values << 1), values << 1)
+    # Bit length from the float exponent (exact far beyond the 35 bits used)
+    count = np.maximum(1, (np.frexp(zigzag.astype(np.float64))[1] + 4) // 5)
+    owner = np.repeat(np.arange(len(values)), count)
+    position = np.arange(len(owner)) - (np.cumsum(count) - count)[owner]
+    characters = (zigzag[owner] >> (5 * position)) & 0x1f
+    characters |= np.where(position < count[owner] - 1, 0x20, 0)
+    return (characters + 63).astype(np.uint8), count
+
+
+def encode_stream(coord_offsets, coords):
+    """Every track in one byte string; returns ``(data, char_offsets)`` per track"""
+    coord_offsets = np.asarray(coord_offsets, dtype=np.int64)
+    if len(coords) == 0:
+        return b"", np.zeros(len(coord_offsets), dtype=np.int64)
+    values = _deltas(coord_offsets, coords)
+
+    # Blocks keep the per-chunk temporaries small for million-track networks
+    parts, counts = [], []
+    for start in range(0, len(values), _BLOCK):
+        characters, count = _chunks(values[start:start + _BLOCK])
+        parts.append(characters)
+        counts.append(count)
+    per_vertex = np.concatenate(counts).reshape(-1, 2).sum(axis=1)
+    vertex_chars = np.zeros(len(per_vertex) + 1, dtype=np.int64)
+    np.cumsum(per_vertex, out=vertex_chars[1:])
+    return np.concatenate(parts).tobytes(), vertex_chars[coord_offsets]
+
+
+def encode_tracks(coord_offsets, coords, rows=None):
+    """Encoded polyline string of each track (of ``rows`` when given)"""
+    coord_offsets = np.asarray(coord_offsets, dtype=np.int64)
+    if rows is not None:
+        # Gather the selected tracks into their own compact layout first
+        rows = np.asarray(rows, dtype=np.int64)
+        lengths = coord_offsets[rows + 1] - coord_offsets[rows]
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        indices = np.repeat(coord_offsets[rows] - offsets[:-1], lengths) + np.arange(offsets[-1])
+        coord_offsets, coords = offsets, np.asarray(coords).reshape(-1, 2)[indices]
+    data, char_offsets = encode_stream(coord_offsets, coords)
+    text = data.decode("ascii")
+    bounds = char_offsets.tolist()
+    return [text[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def encode(coords):
+    """Encoded polyline string of one track"""
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    return encode_tracks(np.array([0, len(coords)]), coords)[0]
+
+
+def _values(raw):
+    """Zigzag values of chunks ``raw`` (minus 63) that end on a complete value"""
+    ends = (raw & 0x20) == 0
+    value_of = np.cumsum(ends) - ends
+    starts = np.flatnonzero(np.concatenate(([True], ends[:-1])))
+    shifts = np.arange(len(raw)) - starts[value_of]
+    weights = (raw & 0x1f) * np.exp2(5 * shifts)
+    return np.bincount(value_of, weights=weights, minlength=int(ends.sum())).astype(np.int64)
+
+
+def decode_stream(data, coord_offsets):
+    """Inverse of :func:`encode_stream`: (V, 2) float64 [lat, lon] vertices"""
+    coord_offsets = np.asarray(coord_offsets, dtype=np.int64)
+    raw = np.frombuffer(data, dtype=np.uint8).astype(np.int16) - 63
+    if len(raw) == 0:
+        return np.empty((0, 2), dtype=np.float64)
+
+    # Blocks are cut after a chunk without the 0x20 flag, so no value spans two
+    value_ends = np.flatnonzero((raw & 0x20) == 0) + 1
+    cuts = value_ends[np.searchsorted(value_ends, np.arange(_BLOCK, len(raw), _BLOCK))]
+    bounds = [0, *np.unique(cuts).tolist(), len(raw)]
+    zigzag = np.concatenate([_values(raw[start:end]) for start, end in zip(bounds[:-1], bounds[1:]) if end > start])
+    deltas = np.where(zigzag & 1, ~(zigzag >> 1), zigzag >> 1).reshape(-1, 2)
+
+    # Per-track running sums: the global running sum minus its value before each track
+    totals = np.cumsum(deltas, axis=0)
+    first = np.repeat(coord_offsets[:-1], np.diff(coord_offsets))
+    return (totals - totals[first] + deltas[first]) / PRECISION
+
+
+def decode(text):
+    """Inverse of :func:`encode`: (k, 2) [lat, lon] array"""
+    data = text.encode("ascii")
+    vertices = int((((np.frombuffer(data, dtype=np.uint8) - 63) & 0x20) == 0).sum()) // 2
+    return decode_stream(data, np.array([0, vertices]))
@@ -1,16 +1,45 @@
 import streamlit as st
-import pandas as pd
 import random
 from datetime import datetime, timedelta
 import time
-
-# Try to import folium for maps
-try:
-    import folium
-    from streamlit_folium import st_folium
-    MAP_AVAILABLE = True
-except ImportError:
-    MAP_AVAILABLE = False
+import atexit
+import threading
+
+import config
+from startup import lazy_import, module_available, mark, print_startup_report
+from instrumentation import (instrument, span, cache_event, summary_rows, prometheus_text,
+                             ensure_metrics_server, enable_allocation_tracing)
+from rerun_profiler import (PROFILE_KEY, begin_rerun, end_rerun, record_dataframe,
+                            record_folium_html, show_profiler_panel)
+
+# Heavy libraries are imported on first use: the map stack only when the
+# map section is shown, pandas when the first table is built
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
+folium = lazy_import("folium", submodules=("plugins",))
+folium_layers = lazy_import("folium_layers")
+hotspots = lazy_import("hotspots")
+delay_propagation = lazy_import("delay_propagation")
+scenario_engine = lazy_import("scenario_engine")
+event_scheduler = lazy_import("event_scheduler")
+maintenance = lazy_import("maintenance")
+impact_index = lazy_import("impact_index")
+alert_rules = lazy_import("alert_rules")
+anomaly_detector = lazy_import("anomaly_detector")
+streamlit_folium = lazy_import("streamlit_folium")
+polyline_codec = lazy_import("polyline_codec")
+search_index = lazy_import("search_index")
+network_generator = lazy_import("network_generator")
+operations_simulator = lazy_import("operations_simulator")
+network_import = lazy_import("network_import")
+tile_cache = lazy_import("tile_cache")
+snapshot = lazy_import("snapshot")
+table_views = lazy_import("table_views")
+track_store = lazy_import("track_store")
+
+MAP_AVAILABLE = module_available("folium") and module_available("streamlit_folium")
+
+mark("streamlit script imports")
 
 class RailwayTrackMonitoringStreamlit:
     def __init__(self):
@@ -18,7 +47,7 @@ class RailwayTrackMonitoringStreamlit:
 
     def initialize_mock_data(self):
         """Initialize mock data for the railway system with route coordinates"""
-        self.tracks_data = {
+        sample_tracks = {
             'live_tracks': [
                 {
                     'Track ID': 'T001', 'Route': 'Delhi-Mumbai', 'Train': 'Rajdhani Express', 
@@ -111,6 +140,135 @@ class RailwayTrackMonitoringStreamlit:
             "Optimize train speeds during congested periods to improve overall efficiency"
         ]
 
+        # Sessions share one columnar store; tracks_data is a record view over it
+        self.track_store = shared_track_store(network_source(), sample_tracks)
+        self.tracks_data = track_store.TrackRecords(self.track_store, network_generator.record_fields('streamlit'))
+        self.table_views = shared_table_views(network_source(), self.track_store)
+        self.hotspots = shared_hotspots(network_source(), self.track_store)
+        self.scheduler = shared_event_scheduler(network_source(), self.track_store) if config.SCHEDULER_ENABLED else None
+        self.anomalies = shared_anomaly_detector(network_source(), self.track_store)
+        self.alerts = shared_alert_engine(network_source(), self.track_store)
+        self.telemetry = shared_telemetry(network_source(), self.track_store)
+
+        self.snapshot_writer = None
+        if config.SNAPSHOT_ENABLED:
+            self.snapshot_writer = shared_snapshot_writer(network_source(), self.track_store)
+
+
+def network_source():
+    """Settings that pick the network, so changing them loads a new shared store"""
+    return (config.SNAPSHOT_ENABLED, config.NETWORK_DATA_PATH,
+            config.SYNTHETIC_NETWORK_TRACKS, config.SYNTHETIC_NETWORK_SEED)
+
+
+@st.cache_resource(show_spinner="Loading railway network...")
+def shared_track_store(source, _sample_tracks):
+    """Track store built once per process and shared by every session"""
+    restored = snapshot.restore_store(snapshot.snapshot_path('streamlit')) if config.SNAPSHOT_ENABLED else None
+    if restored is not None:
+        # Warm restart from the last snapshot
+        return restored
+    if config.NETWORK_DATA_PATH:
+        # Real network from a GTFS feed, OSM extract or GeoJSON file
+        return network_import.load_network(config.NETWORK_DATA_PATH, schema='streamlit')
+    if config.SYNTHETIC_NETWORK_TRACKS:
+        # Load testing: replace the sample tracks with a generated national network
+        return network_generator.generate_network(config.SYNTHETIC_NETWORK_TRACKS,
+                                                  seed=config.SYNTHETIC_NETWORK_SEED, schema='streamlit')
+    return track_store.TrackStore.from_tracks_data(_sample_tracks)
+
+
+@st.cache_resource(show_spinner=False)
+def shared_table_views(source, _store):
+    """DataFrame views of the shared store, rebuilt only when its data changes"""
+    with _store.lock:
+        return table_views.TableViews(_store, schema='streamlit')
+
+
+@st.cache_resource(show_spinner=False)
+def shared_hotspots(source, _store):
+    """Congestion hotspot ranking of the shared store, kept current by its listener"""
+    with _store.lock:
+        return hotspots.HotspotRanking(_store, schema='streamlit')
+
+
+@st.cache_resource(show_spinner="Building the delay propagation network...")
+def shared_delay_propagation(source, _store):
+    """Knock-on delay model of the shared store, built on the first what-if"""
+    with _store.lock:
+        return delay_propagation.DelayPropagation(_store, schema='streamlit')
+
+
+@st.cache_resource(show_spinner="Indexing tracks for search...")
+def shared_search_index(source, _store):
+    """Typeahead index of the shared store, built on the first search and kept current by its listener"""
+    with _store.lock:
+        return search_index.SearchIndex(_store, train_column='Train', route_column='Route')
+
+
+@st.cache_resource(show_spinner=False)
+def shared_event_scheduler(source, _store):
+    """Clearance, departure and arrival events of the shared store, advanced on every rerun"""
+    with _store.lock:
+        return event_scheduler.EventScheduler(_store, schema='streamlit')
+
+
+@st.cache_resource(show_spinner=False)
+def shared_anomaly_detector(source, _store):
+    """Speed and delay anomaly flags of the shared store, updated by its telemetry"""
+    with _store.lock:
+        return anomaly_detector.AnomalyDetector(_store, schema='streamlit')
+
+
+@st.cache_resource(show_spinner=False)
+def shared_alert_engine(source, _store):
+    """Alert rules over the shared store, fed by its telemetry updates"""
+    with _store.lock:
+        return alert_rules.AlertEngine(_store, schema='streamlit')
+
+
+@st.cache_resource(show_spinner=False)
+def shared_telemetry(source, _store):
+    """Simulated telemetry of the shared store, written every TELEMETRY_INTERVAL_S seconds by a background thread"""
+    with _store.lock:
+        telemetry = operations_simulator.LiveTelemetry(_store, schema='streamlit')
+    if config.TELEMETRY_ENABLED:
+        threading.Thread(target=telemetry.run, args=(config.TELEMETRY_INTERVAL_S,), daemon=True).start()
+        atexit.register(telemetry.stop)
+    return telemetry
+
+
+@st.cache_resource(show_spinner=False)
+def shared_maintenance(source, _store):
+    """ETA tracker of the shared store and the simulated crew reports feeding it, seeded with recent reports"""
+    now = time.time()
+    with _store.lock:
+        tracker = maintenance.MaintenanceTracker(_store, schema='streamlit', now=now)
+        reports = operations_simulator.WorkReports(_store, schema='streamlit', start_time=now - 15 * 60)
+        rows = _store.rows('blocked_tracks')
+        for minutes_ago in (15, 10, 5, 0):
+            tracker.ingest(rows, reports.report(rows, now - minutes_ago * 60), now - minutes_ago * 60)
+    return tracker, reports
+
+
+@st.cache_resource(show_spinner="Indexing planned services...")
+def shared_impact_index(source, _store):
+    """Track-to-service index over the planned timetable of the shared store"""
+    with _store.lock:
+        timetable = operations_simulator.generate_timetable(
+            _store, n_services=max(50, int(len(_store) * config.TIMETABLE_EXTRA_SERVICES)),
+            max_legs=config.TIMETABLE_MAX_LEGS, train_column='Train')
+        return impact_index.ImpactIndex(_store, timetable, schema='streamlit')
+
+
+@st.cache_resource(show_spinner=False)
+def shared_snapshot_writer(source, _store):
+    """One background snapshot writer per shared store, flushed at exit"""
+    writer = snapshot.SnapshotWriter(lambda: _store, snapshot.snapshot_path('streamlit'))
+    atexit.register(writer.write)
+    return writer
+
+@instrument("streamlit.main")
 def main():
     # Page configuration
     st.set_page_config(
@@ -120,11 +278,20 @@ def main():
         initial_sidebar_state="expanded"
     )
 
+    # Hot-path metrics for the Performance panel and the /metrics endpoint
+    enable_allocation_tracing()
+    ensure_metrics_server()
+    profiling = begin_rerun()
+
     # Initialize the app
+    cache_event("session.app", 'app' in st.session_state)
     if 'app' not in st.session_state:
         st.session_state.app = RailwayTrackMonitoringStreamlit()
 
     app = st.session_state.app
+    if app.scheduler is not None:
+        announce_transitions(app, app.scheduler.advance())
+    app.alerts.tick()
 
     # Custom CSS for styling
     st.markdown("""
@@ -173,46 +340,11 @@ def main():
     # Main title
     st.markdown('<h1 class="main-header">🚄 Railway Track Monitoring System - Enhanced Track Visualization</h1>', unsafe_allow_html=True)
 
-    # Sidebar navigation
-    st.sidebar.title("🚉 Navigation Dashboard")
-    section = st.sidebar.radio(
-        "Select Section:",
-        ["🚄 Live Railway Tracks", "⚠️ Congested Tracks", "🗺️ Railway Map", "🚫 Blocked Tracks", "✅ Free Tracks"],
-        index=0
-    )
-
-    # Display current date and time
-    current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    st.sidebar.markdown(f"**📅 Current Time:** `{current_time}`")
-
-    # Track statistics in sidebar
-    st.sidebar.markdown("---")
-    st.sidebar.markdown("### 📊 System Overview")
-
-    col1, col2 = st.sidebar.columns(2)
-    with col1:
-        st.metric("🚄 Live", len(app.tracks_data['live_tracks']), "0")
-        st.metric("🚫 Blocked", len(app.tracks_data['blocked_tracks']), "+1")
-    with col2:
-        st.metric("⚠️ Congested", len(app.tracks_data['congested_tracks']), "+1")  
-        st.metric("✅ Free", len(app.tracks_data['free_tracks']), "-1")
-
-    # Enhanced system status
-    st.sidebar.markdown("### 🎯 System Status")
-    st.sidebar.success("🟢 Track Visualization Active")
-    st.sidebar.info("📡 Real-time Monitoring Active")
-    st.sidebar.warning("🗺️ Enhanced Maps Available")
-
-    # Track visualization settings
-    st.sidebar.markdown("---")
-    st.sidebar.markdown("### 🎨 Visualization Settings")
-    show_track_labels = st.sidebar.checkbox("🏷️ Show Track Labels", value=True)
-    highlight_congestion = st.sidebar.checkbox("🔍 Highlight Congestion", value=True)
-    show_animations = st.sidebar.checkbox("🎬 Animated Tracks", value=False)
+    section, show_track_labels, highlight_congestion, show_animations = render_sidebar(app)
 
     # Auto-refresh option
     st.sidebar.markdown("---")
-    auto_refresh = st.sidebar.checkbox("🔄 Auto-refresh (30s)", value=False)
+    auto_refresh = st.sidebar.checkbox("🔄 Auto-refresh (30s)", value=False, key="auto_refresh")
     if auto_refresh:
         time.sleep(30)
         st.experimental_rerun()
@@ -229,6 +361,141 @@ def main():
     elif section == "✅ Free Tracks":
         show_free_tracks(app)
 
+    show_performance_panel()
+
+    if app.snapshot_writer is not None:
+        app.snapshot_writer.maybe_write()
+
+    if profiling:
+        end_rerun(section)
+        show_profiler_panel()
+
+    mark("first rerun")
+    print_startup_report("Streamlit web app")
+
+# Toasts for transitions applied by the event scheduler
+TRANSITION_MESSAGES = {
+    'clearance': "✅ Clearance complete, now free: {tracks}",
+    'departure': "🚂 Scheduled train departed on {tracks}",
+    'arrival': "🏁 Train arrived, track free again: {tracks}",
+}
+
+def announce_transitions(app, applied):
+    """One toast per kind of scheduled transition, naming the first few tracks"""
+    batches = {}
+    for kind, rows in applied:
+        batches.setdefault(kind, []).append(rows)
+    for kind, batch in batches.items():
+        rows = np.concatenate(batch)
+        tracks = ", ".join(app.track_store.track_ids[rows[:3]].tolist())
+        if len(rows) > 3:
+            tracks += f" and {len(rows) - 3:,} more"
+        st.toast(TRANSITION_MESSAGES[kind].format(tracks=tracks))
+
+def show_performance_panel():
+    """Sidebar table of the instrumented hot paths (earlier reruns included)"""
+    with st.sidebar.expander("⏱️ Performance"):
+        rows = summary_rows()
+        if not rows:
+            st.caption("No timings recorded yet")
+            return
+        st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+        st.download_button("📥 Prometheus Metrics", prometheus_text(), file_name="railway_metrics.prom",
+                           mime="text/plain")
+
+@instrument("streamlit.sidebar")
+def render_sidebar(app):
+    """Sidebar navigation, overview metrics and visualization settings"""
+    # Sidebar navigation
+    with span("streamlit.sidebar.navigation"):
+        st.sidebar.title("🚉 Navigation Dashboard")
+        section = st.sidebar.radio(
+            "Select Section:",
+            ["🚄 Live Railway Tracks", "⚠️ Congested Tracks", "🗺️ Railway Map", "🚫 Blocked Tracks", "✅ Free Tracks"],
+            index=0,
+            key="section"
+        )
+
+    with span("streamlit.sidebar.search"):
+        query = st.sidebar.text_input("🔎 Search", key="search_query", placeholder="Track, train, station or route")
+        if query.strip():
+            hits = shared_search_index(network_source(), app.track_store).search(query)
+            for position, hit in enumerate(hits):
+                st.sidebar.button(search_index.hit_label(hit), key=f"search_hit_{position}",
+                                  on_click=focus_search_hit, args=(app, hit), use_container_width=True)
+            if not hits:
+                st.sidebar.caption("No matching tracks")
+
+    # Display current date and time
+    current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    st.sidebar.markdown(f"**📅 Current Time:** `{current_time}`")
+
+    # Track statistics in sidebar
+    with span("streamlit.sidebar.overview"):
+        st.sidebar.markdown("---")
+        st.sidebar.markdown("### 📊 System Overview")
+
+        col1, col2 = st.sidebar.columns(2)
+        with col1:
+            st.metric("🚄 Live", len(app.tracks_data['live_tracks']), "0")
+            st.metric("🚫 Blocked", len(app.tracks_data['blocked_tracks']), "+1")
+        with col2:
+            st.metric("⚠️ Congested", len(app.tracks_data['congested_tracks']), "+1")  
+            st.metric("✅ Free", len(app.tracks_data['free_tracks']), "-1")
+
+        with st.sidebar.expander("🔥 Top Hotspots"):
+            store = app.track_store
+            for row in app.hotspots.top(config.HOTSPOT_SIDEBAR_COUNT).tolist():
+                icon = "🔴" if store.value(row, 'severity') == 'high' else "🟡"
+                st.markdown(f"{icon} **{store.track_ids[row]}** - {store.value(row, 'Route')}  \n"
+                            f"🚄 {store.value(row, 'Trains Count')} trains | ⏰ {store.value(row, 'Average Delay')}")
+
+    # Enhanced system status
+    st.sidebar.markdown("### 🎯 System Status")
+    st.sidebar.success("🟢 Track Visualization Active")
+    st.sidebar.info("📡 Real-time Monitoring Active")
+    st.sidebar.warning("🗺️ Enhanced Maps Available")
+
+    # Track visualization settings
+    with span("streamlit.sidebar.settings"):
+        st.sidebar.markdown("---")
+        st.sidebar.markdown("### 🎨 Visualization Settings")
+        show_track_labels = st.sidebar.checkbox("🏷️ Show Track Labels", value=True, key="show_track_labels")
+        highlight_congestion = st.sidebar.checkbox("🔍 Highlight Congestion", value=True, key="highlight_congestion")
+        show_animations = st.sidebar.checkbox("🎬 Animated Tracks", value=False, key="show_animations")
+        st.sidebar.checkbox("🔬 Profile Reruns", value=False, key=PROFILE_KEY,
+                            help="Record a timeline of each rerun (also enabled with ?profile=1)")
+
+    return section, show_track_labels, highlight_congestion, show_animations
+
+# Section of each track category, for jumping to a search hit
+CATEGORY_SECTIONS = {
+    'live_tracks': "🚄 Live Railway Tracks",
+    'congested_tracks': "⚠️ Congested Tracks",
+    'blocked_tracks': "🚫 Blocked Tracks",
+    'free_tracks': "✅ Free Tracks",
+}
+
+def focus_search_hit(app, hit):
+    """Search hit callback: tracks and trains open their table, stations and routes the zoomed map"""
+    rows = hit['rows']
+    st.session_state.search_focus = {'text': hit['text'], 'rows': rows}
+    if hit['kind'] in ('track', 'train'):
+        category = track_store.CATEGORIES[app.track_store.category[rows[0]]]
+        st.session_state.section = CATEGORY_SECTIONS[category]
+    else:
+        st.session_state.section = "🗺️ Railway Map"
+
+def show_search_focus(rows):
+    """Banner of the current search focus with a button that clears it"""
+    focus = st.session_state.search_focus
+    col1, col2 = st.columns([5, 1])
+    with col1:
+        st.info(f"🔎 **{focus['text']}** - {len(rows):,} of {len(focus['rows']):,} tracks shown")
+    with col2:
+        st.button("✖ Show all", key="clear_search_focus", on_click=st.session_state.pop, args=("search_focus", None))
+
+@instrument("streamlit.show_railway_map")
 def show_railway_map(app, show_labels=True, highlight_congestion=True, show_animations=False):
     """Display railway map section with highlighted track visualization"""
     st.markdown('<h2 class="section-header">🗺️ Railway Network Map - Highlighted Track Visualization</h2>', unsafe_allow_html=True)
@@ -248,9 +515,17 @@ def show_railway_map(app, show_labels=True, highlight_congestion=True, show_anim
 
     st.markdown("---")
 
+    # Zoom to the tracks of a search hit
+    focus_bounds = None
+    if st.session_state.get('search_focus'):
+        focus_rows = st.session_state.search_focus['rows']
+        focus_bounds = shared_search_index(network_source(), app.track_store).bounds(focus_rows)
+        show_search_focus(focus_rows)
+
     if MAP_AVAILABLE:
         # Create interactive map with highlighted tracks
-        create_interactive_track_map(app, map_style, track_width, show_labels, highlight_congestion, show_animations)
+        create_interactive_track_map(app, map_style, track_width, show_labels, highlight_congestion, show_animations,
+                                     focus_bounds)
     else:
         # Show installation instructions and fallback
         create_fallback_track_map(app)
@@ -261,29 +536,64 @@ def show_railway_map(app, show_labels=True, highlight_congestion=True, show_anim
 
     col1, col2, col3 = st.columns(3)
 
+    # Each list shows at most MAX_TRACKS_DISPLAY tracks; hotspots are the highest-scoring ones
+    limit = config.MAX_TRACKS_DISPLAY
     with col1:
         st.markdown("#### 🔥 Congestion Hotspots")
-        high_congestion = [track for track in app.tracks_data['congested_tracks'] if track['severity'] == 'high']
-        medium_congestion = [track for track in app.tracks_data['congested_tracks'] if track['severity'] == 'medium']
-
-        for track in high_congestion:
-            st.error(f"**🔴 {track['Track ID']}** - {track['Route']}\n🚄 {track['Trains Count']} trains | ⏰ {track['Average Delay']} delay")
-
-        for track in medium_congestion:
-            st.warning(f"**🟡 {track['Track ID']}** - {track['Route']}\n🚄 {track['Trains Count']} trains | ⏰ {track['Average Delay']} delay")
+        top = app.hotspots.top()
+        fields = ['Route', 'Trains Count', 'Average Delay', 'severity']
+        for track_id, (route, trains, delay, severity) in zip(app.track_store.track_ids[top],
+                                                              app.track_store.values(top, fields)):
+            if severity == 'high':
+                st.error(f"**🔴 {track_id}** - {route}\n🚄 {trains} trains | ⏰ {delay} delay")
+            else:
+                st.warning(f"**🟡 {track_id}** - {route}\n🚄 {trains} trains | ⏰ {delay} delay")
+        if len(app.hotspots) > len(top):
+            st.caption(f"Top {len(top):,} of {len(app.hotspots):,} congested tracks")
 
     with col2:
         st.markdown("#### 🚫 Service Disruptions")
-        for track in app.tracks_data['blocked_tracks']:
+        blocked = app.tracks_data['blocked_tracks']
+        for track in blocked[:limit]:
             st.info(f"**{track['Track ID']}** - {track['Route']}\n{track['Blocking Reason']} | ⏳ {track['Estimated Clearance']}")
+        if len(blocked) > limit:
+            st.caption(f"{limit:,} of {len(blocked):,} blocked tracks")
 
     with col3:
         st.markdown("#### ✅ Available Capacity")
-        for track in app.tracks_data['free_tracks']:
+        free = app.tracks_data['free_tracks']
+        for track in free[:limit]:
             st.success(f"**{track['Track ID']}** - {track['Route']}\n{track['Capacity Available']} capacity | 🚄 Next: {track['Next Scheduled Train']}")
+        if len(free) > limit:
+            st.caption(f"{limit:,} of {len(free):,} free tracks")
 
-def create_interactive_track_map(app, map_style, track_width, show_labels, highlight_congestion, show_animations):
+@instrument("streamlit.create_interactive_track_map")
+def create_interactive_track_map(app, map_style, track_width, show_labels, highlight_congestion, show_animations,
+                                 focus_bounds=None):
     """Create interactive folium map with highlighted tracks"""
+    m = build_track_map(app, map_style, track_width, show_labels, highlight_congestion, show_animations,
+                        focus_bounds)
+    record_folium_html(m)
+
+    # Display the map
+    map_data = streamlit_folium.st_folium(m, width=1200, height=600, returned_objects=["last_clicked", "last_object_clicked"])
+
+    # Show clicked information
+    if map_data and map_data.get('last_object_clicked'):
+        clicked_info = map_data['last_object_clicked']
+        if clicked_info:
+            st.info(f"📍 **Track Clicked** - Displaying detailed information for selected railway track")
+
+    # Enhanced track legend
+    create_enhanced_track_legend()
+
+@instrument("streamlit.build_track_map")
+def build_track_map(app, map_style, track_width, show_labels, highlight_congestion, show_animations,
+                    focus_bounds=None):
+    """Build the folium map with highlighted tracks (no Streamlit calls, so it can be benchmarked).
+
+    ``focus_bounds`` (``[[south, west], [north, east]]``) zooms the map to a search hit.
+    """
 
     # Map tile selection
     tile_map = {
@@ -296,137 +606,130 @@ def create_interactive_track_map(app, map_style, track_width, show_labels, highl
     width_map = {"Thin": 4, "Medium": 6, "Thick": 8}
     base_width = width_map[track_width]
 
+    tiles = tile_map.get(map_style, "OpenStreetMap")
+    attribution = None
+
+    # Serve tiles from the local MBTiles cache in offline control rooms
+    if config.OFFLINE_TILES_ENABLED:
+        tile_server_url = tile_cache.ensure_local_tile_server()
+        if tile_server_url:
+            tiles, attribution = tile_server_url, "Local tile cache"
+        else:
+            st.warning(f"🗺️ No local tile server is reachable ({tile_cache.local_tile_server_error()}); "
+                       "showing online map tiles")
+
     # Create base map centered on India
     m = folium.Map(
         location=[20.5937, 78.9629],  # Center of India
         zoom_start=5,
-        tiles=tile_map.get(map_style, "OpenStreetMap")
+        tiles=tiles,
+        attr=attribution,
+        max_zoom=config.TILE_PREFETCH_ZOOMS[1] if attribution else 18
     )
 
-    # Add highlighted tracks using PolyLine (NO MARKERS)
-
-    # 1. Congested tracks with RED/ORANGE lines
-    for track in app.tracks_data['congested_tracks']:
-        if 'route_coords' in track and len(track['route_coords']) >= 2:
-            # Color based on severity
-            if track['severity'] == 'high':
-                color = "#dc3545"  # Red for high congestion
-                weight = base_width + 3
-                opacity = 0.9
-            else:
-                color = "#fd7e14"  # Orange for medium congestion
-                weight = base_width + 1
-                opacity = 0.8
-
-            # Create PolyLine for track
-            folium.PolyLine(
-                locations=track['route_coords'],
-                color=color,
-                weight=weight,
-                opacity=opacity,
-                popup=f"⚠️ CONGESTED: {track['Track ID']} - {track['Route']}\nLevel: {track['Congestion Level']}\nTrains: {track['Trains Count']} | Delay: {track['Average Delay']}",
-                tooltip=f"{track['Track ID']} - {track['Route']} (CONGESTED)" if show_labels else None
-            ).add_to(m)
-
-            # Add pulsating effect for high congestion if animations enabled
-            if show_animations and track['severity'] == 'high':
-                folium.plugins.AntPath(
-                    locations=track['route_coords'],
-                    color=color,
-                    weight=weight-2,
-                    opacity=0.6,
-                    delay=1000,
-                    dashArray="10,20"
-                ).add_to(m)
+    # Add highlighted tracks as encoded polylines (NO MARKERS), one layer per track type
+    store = app.track_store
+    lengths = np.diff(store.coord_offsets)
+
+    def add_tracks(category, name, styles, style_indices, popups, tooltips, rows):
+        """Layer of one category; ``rows`` are its tracks with at least two vertices"""
+        parent = folium.FeatureGroup(name=name).add_to(m) if highlight_congestion else m
+        folium_layers.EncodedPolylines(
+            polyline_codec.encode_tracks(store.coord_offsets, store.coords, rows),
+            style_indices, styles, popups, tooltips if show_labels else None
+        ).add_to(parent)
+        return parent
+
+    def drawn(category):
+        """Rows of a category that can be drawn, and their columns as lists"""
+        records = app.tracks_data[category]
+        keep = lengths[records.rows] >= 2
+        return records.rows[keep], {field: values[keep].tolist() for field, values in records.columns().items()}
+
+    # 1. Congested tracks with RED (high severity) / ORANGE (medium) lines
+    rows, track = drawn('congested_tracks')
+    high = [severity == 'high' for severity in track['severity']]
+    congested_styles = [
+        {'color': "#fd7e14", 'weight': base_width + 1, 'opacity': 0.8},  # Orange for medium congestion
+        {'color': "#dc3545", 'weight': base_width + 3, 'opacity': 0.9},  # Red for high congestion
+    ]
+    congested_layer = add_tracks(
+        'congested_tracks', "Congested Tracks", congested_styles, high,
+        [f"⚠️ CONGESTED: {track_id} - {route}\nLevel: {level}\nTrains: {trains} | Delay: {delay}"
+         for track_id, route, level, trains, delay in zip(track['Track ID'], track['Route'], track['Congestion Level'],
+                                                          track['Trains Count'], track['Average Delay'])],
+        [f"{track_id} - {route} (CONGESTED)" for track_id, route in zip(track['Track ID'], track['Route'])],
+        rows)
+
+    # Add pulsating effect to the top high-congestion hotspots if animations enabled
+    if show_animations:
+        pulsing = np.intersect1d(app.hotspots.top(), rows[np.asarray(high, dtype=bool)])
+        for row in pulsing.tolist():
+            folium.plugins.AntPath(
+                locations=store.route_coords(row),
+                color=congested_styles[1]['color'],
+                weight=congested_styles[1]['weight'] - 2,
+                opacity=0.6,
+                delay=1000,
+                dashArray="10,20"
+            ).add_to(congested_layer)
 
     # 2. Live tracks with GREEN lines
-    for track in app.tracks_data['live_tracks']:
-        if 'route_coords' in track and len(track['route_coords']) >= 2:
-            color = "#28a745"  # Green for live tracks
-            weight = base_width
-
-            folium.PolyLine(
-                locations=track['route_coords'],
-                color=color,
-                weight=weight,
-                opacity=0.8,
-                popup=f"🚄 LIVE: {track['Track ID']} - {track['Route']}\nTrain: {track['Train']}\nSpeed: {track['Speed']} | Status: {track['Status']}",
-                tooltip=f"{track['Track ID']} - {track['Train']}" if show_labels else None
-            ).add_to(m)
-
-            # Add moving effect for live trains if animations enabled
-            if show_animations:
-                folium.plugins.AntPath(
-                    locations=track['route_coords'],
-                    color=color,
-                    weight=weight-1,
-                    opacity=0.5,
-                    delay=2000,
-                    dashArray="5,10"
-                ).add_to(m)
+    rows, track = drawn('live_tracks')
+    live_style = {'color': "#28a745", 'weight': base_width, 'opacity': 0.8}  # Green for live tracks
+    live_layer = add_tracks(
+        'live_tracks', "Live Tracks", [live_style], [0] * len(rows),
+        [f"🚄 LIVE: {track_id} - {route}\nTrain: {train}\nSpeed: {speed} | Status: {status}"
+         for track_id, route, train, speed, status in zip(track['Track ID'], track['Route'], track['Train'],
+                                                          track['Speed'], track['Status'])],
+        [f"{track_id} - {train}" for track_id, train in zip(track['Track ID'], track['Train'])],
+        rows)
+
+    # Add moving effect for live trains if animations enabled
+    if show_animations:
+        for row in rows.tolist():
+            folium.plugins.AntPath(
+                locations=store.route_coords(row),
+                color=live_style['color'],
+                weight=live_style['weight'] - 1,
+                opacity=0.5,
+                delay=2000,
+                dashArray="5,10"
+            ).add_to(live_layer)
 
     # 3. Blocked tracks with GRAY dashed lines
-    for track in app.tracks_data['blocked_tracks']:
-        if 'route_coords' in track and len(track['route_coords']) >= 2:
-            color = "#6c757d"  # Gray for blocked tracks
-            weight = base_width + 2
-
-            folium.PolyLine(
-                locations=track['route_coords'],
-                color=color,
-                weight=weight,
-                opacity=0.7,
-                dashArray="15,10",  # Dashed line
-                popup=f"🚫 BLOCKED: {track['Track ID']} - {track['Route']}\nReason: {track['Blocking Reason']}\nClearance: {track['Estimated Clearance']}",
-                tooltip=f"{track['Track ID']} - BLOCKED" if show_labels else None
-            ).add_to(m)
+    rows, track = drawn('blocked_tracks')
+    add_tracks(
+        'blocked_tracks', "Blocked Tracks",
+        [{'color': "#6c757d", 'weight': base_width + 2, 'opacity': 0.7, 'dashArray': "15,10"}], [0] * len(rows),
+        [f"🚫 BLOCKED: {track_id} - {route}\nReason: {reason}\nClearance: {clearance}"
+         for track_id, route, reason, clearance in zip(track['Track ID'], track['Route'], track['Blocking Reason'],
+                                                       track['Estimated Clearance'])],
+        [f"{track_id} - BLOCKED" for track_id in track['Track ID']],
+        rows)
 
     # 4. Free tracks with BLUE semi-transparent lines
-    for track in app.tracks_data['free_tracks']:
-        if 'route_coords' in track and len(track['route_coords']) >= 2:
-            color = "#007bff"  # Blue for free tracks
-            weight = base_width - 1
-
-            folium.PolyLine(
-                locations=track['route_coords'],
-                color=color,
-                weight=weight,
-                opacity=0.6,
-                popup=f"✅ FREE: {track['Track ID']} - {track['Route']}\nCapacity: {track['Capacity Available']}\nNext Train: {track['Next Scheduled Train']}",
-                tooltip=f"{track['Track ID']} - Available" if show_labels else None
-            ).add_to(m)
-
-    # Add layer control for different track types
+    rows, track = drawn('free_tracks')
+    add_tracks(
+        'free_tracks', "Free Tracks",
+        [{'color': "#007bff", 'weight': base_width - 1, 'opacity': 0.6}], [0] * len(rows),
+        [f"✅ FREE: {track_id} - {route}\nCapacity: {capacity}\nNext Train: {next_train}"
+         for track_id, route, capacity, next_train in zip(track['Track ID'], track['Route'],
+                                                          track['Capacity Available'], track['Next Scheduled Train'])],
+        [f"{track_id} - Available" for track_id in track['Track ID']],
+        rows)
+
+    # Add layer control for the track type groups
     if highlight_congestion:
-        # Create feature groups for layer control
-        congested_group = folium.FeatureGroup(name="Congested Tracks")
-        live_group = folium.FeatureGroup(name="Live Tracks")
-        blocked_group = folium.FeatureGroup(name="Blocked Tracks")
-        free_group = folium.FeatureGroup(name="Free Tracks")
-
-        # Add groups to map
-        congested_group.add_to(m)
-        live_group.add_to(m)
-        blocked_group.add_to(m)
-        free_group.add_to(m)
-
-        # Add layer control
         folium.LayerControl(collapsed=False).add_to(m)
 
     # Add scale bar and measurement tools
     folium.plugins.MeasureControl().add_to(m)
 
-    # Display the map
-    map_data = st_folium(m, width=1200, height=600, returned_objects=["last_clicked", "last_object_clicked"])
-
-    # Show clicked information
-    if map_data and map_data.get('last_object_clicked'):
-        clicked_info = map_data['last_object_clicked']
-        if clicked_info:
-            st.info(f"📍 **Track Clicked** - Displaying detailed information for selected railway track")
+    if focus_bounds:
+        m.fit_bounds(focus_bounds)
 
-    # Enhanced track legend
-    create_enhanced_track_legend()
+    return m
 
 def create_fallback_track_map(app):
     """Create fallback track visualization when folium is not available"""
@@ -479,25 +782,17 @@ def create_fallback_track_map(app):
     with tab2:
         st.markdown("#### 🌡️ Real-Time Congestion Heat Analysis")
 
-        # Create congestion visualization
-        congestion_data = []
-        for track in app.tracks_data['congested_tracks']:
-            severity_emoji = "🔴" if track['severity'] == 'high' else "🟡"
-            congestion_data.append({
-                "Track": f"{severity_emoji} {track['Track ID']}",
-                "Route": track['Route'],
-                "Intensity": track['Congestion Level'],
-                "Active Trains": track['Trains Count'],
-                "Avg Delay": track['Average Delay'],
-                "Priority": "CRITICAL" if track['severity'] == 'high' else "MONITOR"
-            })
-
-        congestion_df = pd.DataFrame(congestion_data)
-        st.dataframe(congestion_df, use_container_width=True)
+        # Create congestion visualization (rebuilt only when the tracks change)
+        congestion_df = app.table_views.derived("fallback_congestion", 'congested_tracks', congestion_table)
+        record_dataframe("fallback_congestion", congestion_df)
+        st.dataframe(congestion_df, use_container_width=True, column_config=app.table_views.column_config(
+            'congested_tracks', renamed={"Intensity": "Congestion Level", "Active Trains": "Trains Count",
+                                         "Avg Delay": "Average Delay"}))
 
         # Congestion metrics
-        high_count = len([t for t in app.tracks_data['congested_tracks'] if t['severity'] == 'high'])
-        medium_count = len([t for t in app.tracks_data['congested_tracks'] if t['severity'] == 'medium'])
+        severity = app.table_views.frame('congested_tracks')['severity']
+        high_count = int((severity == 'high').sum())
+        medium_count = int((severity == 'medium').sum())
 
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -510,34 +805,54 @@ def create_fallback_track_map(app):
     with tab3:
         st.markdown("#### 🚫 Service Disruption Analysis")
 
-        blocked_data = []
-        for track in app.tracks_data['blocked_tracks']:
-            blocked_data.append({
-                "Track ID": f"🚫 {track['Track ID']}",
-                "Route": track['Route'],
-                "Issue": track['Blocking Reason'],
-                "ETA": track['Estimated Clearance'],
-                "Impact": "High" if "Maintenance" in track['Blocking Reason'] else "Medium"
-            })
-
-        blocked_df = pd.DataFrame(blocked_data)
-        st.dataframe(blocked_df, use_container_width=True)
+        blocked_df = app.table_views.derived("fallback_blocked", 'blocked_tracks', blocked_table)
+        record_dataframe("fallback_blocked", blocked_df)
+        st.dataframe(blocked_df, use_container_width=True, column_config=app.table_views.column_config(
+            'blocked_tracks', renamed={"Issue": "Blocking Reason", "ETA": "Estimated Clearance"}))
 
     with tab4:
         st.markdown("#### 📈 Track Capacity & Availability")
 
-        capacity_data = []
-        for track in app.tracks_data['free_tracks']:
-            capacity_data.append({
-                "Track ID": f"✅ {track['Track ID']}",
-                "Route": track['Route'],
-                "Available Capacity": track['Capacity Available'],
-                "Next Slot": track['Next Scheduled Train'],
-                "Utilization": f"{random.randint(15, 35)}%"
-            })
-
-        capacity_df = pd.DataFrame(capacity_data)
-        st.dataframe(capacity_df, use_container_width=True)
+        capacity_df = app.table_views.derived("fallback_capacity", 'free_tracks', capacity_table)
+        record_dataframe("fallback_capacity", capacity_df)
+        st.dataframe(capacity_df, use_container_width=True, column_config={
+            **app.table_views.column_config('free_tracks', renamed={"Available Capacity": "Capacity Available",
+                                                                    "Next Slot": "Next Scheduled Train"}),
+            "Utilization": st.column_config.NumberColumn("Utilization", format="%d%%"),
+        })
+
+def congestion_table(frame):
+    """Congestion heat table of the fallback map, built column-wise from the congested frame"""
+    high = (frame['severity'] == 'high').to_numpy()
+    return pd.DataFrame({
+        "Track": np.where(high, "🔴 ", "🟡 ").astype(object) + frame['Track ID'].to_numpy(dtype=object),
+        "Route": frame['Route'],
+        "Intensity": frame['Congestion Level'],
+        "Active Trains": frame['Trains Count'],
+        "Avg Delay": frame['Average Delay'],
+        "Priority": pd.Categorical(np.where(high, "CRITICAL", "MONITOR")),
+    })
+
+def blocked_table(frame):
+    """Service disruption table of the fallback map"""
+    maintenance = frame['Blocking Reason'].astype(str).str.contains("Maintenance").to_numpy()
+    return pd.DataFrame({
+        "Track ID": "🚫 " + frame['Track ID'].to_numpy(dtype=object),
+        "Route": frame['Route'],
+        "Issue": frame['Blocking Reason'],
+        "ETA": frame['Estimated Clearance'],
+        "Impact": pd.Categorical(np.where(maintenance, "High", "Medium")),
+    })
+
+def capacity_table(frame):
+    """Capacity planning table of the fallback map"""
+    return pd.DataFrame({
+        "Track ID": "✅ " + frame['Track ID'].to_numpy(dtype=object),
+        "Route": frame['Route'],
+        "Available Capacity": frame['Capacity Available'],
+        "Next Slot": frame['Next Scheduled Train'],
+        "Utilization": np.random.randint(15, 36, len(frame)),
+    })
 
 def create_enhanced_track_legend():
     """Create enhanced legend for track visualization"""
@@ -558,6 +873,56 @@ def create_enhanced_track_legend():
     """, unsafe_allow_html=True)
 
 # Include all other show functions (show_live_tracks, show_congested_tracks, etc.)
+def show_track_table(app, category, height, column_config):
+    """Table of one category; beyond a page of tracks only the visible page is sent.
+
+    Sorting and filtering run on the server against the track store, so the
+    rerun payload stays one page however many trains the network has.
+    """
+    views = app.table_views
+    frame = views.frame(category)
+
+    # Tracks of a search hit in this category replace the table until the focus is cleared
+    focus = st.session_state.get('search_focus')
+    if focus:
+        rows = np.intersect1d(focus['rows'], app.track_store.rows(category))
+        if len(rows):
+            show_search_focus(rows)
+            df_focus = views.page(category, rows, 0, config.TABLE_PAGE_SIZE)
+            record_dataframe(category, df_focus)
+            st.dataframe(df_focus, use_container_width=True, height=height, column_config=column_config)
+            return
+
+    if len(frame) <= config.TABLE_PAGE_SIZE:
+        record_dataframe(category, frame)
+        st.dataframe(frame, use_container_width=True, height=height, column_config=column_config)
+        return
+
+    fields = [name for name in frame.columns if column_config.get(name, True) is not None]
+    page_key = f"{category}_page"
+    # A new filter or order starts again from the first page
+    first_page = {'on_change': st.session_state.update, 'args': ({page_key: 1},)}
+    col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+    with col1:
+        text = st.text_input("🔍 Filter", key=f"{category}_filter", placeholder="Track, route, train...", **first_page)
+    with col2:
+        sort = st.selectbox("Sort by", ["—"] + fields, key=f"{category}_sort", **first_page)
+    with col3:
+        descending = st.toggle("Descending", key=f"{category}_descending", **first_page)
+
+    rows = views.view_rows(category, None if sort == "—" else sort, descending, text, fields)
+    pages = max(1, -(-len(rows) // config.TABLE_PAGE_SIZE))
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages  # The filter left fewer pages
+    with col4:
+        page = st.number_input("Page", min_value=1, max_value=pages, step=1, key=page_key)
+
+    df_page = views.page(category, rows, (page - 1) * config.TABLE_PAGE_SIZE, config.TABLE_PAGE_SIZE)
+    record_dataframe(category, df_page)
+    st.dataframe(df_page, use_container_width=True, height=height, column_config=column_config)
+    st.caption(f"{len(rows):,} of {len(frame):,} tracks · page {page:,} of {pages:,}")
+
+@instrument("streamlit.show_live_tracks")
 def show_live_tracks(app):
     st.markdown('<h2 class="section-header">🚄 Live Railway Tracks</h2>', unsafe_allow_html=True)
 
@@ -566,32 +931,31 @@ def show_live_tracks(app):
         st.info("🔴 Real-time monitoring of active railway tracks with live status updates")
     with col2:
         if st.button("🔄 Refresh Data", key="refresh_live", type="primary"):
-            for track in app.tracks_data['live_tracks']:
-                track['Speed'] = f"{random.randint(80, 130)} km/h"
-                track['Current Location'] = f"Kilometer {random.randint(100, 400)}"
+            # A telemetry batch written now to the shared store, which also invalidates the cached tables
+            app.telemetry.tick()
             st.success("✅ Live data refreshed!")
             st.experimental_rerun()
     with col3:
         st.button("📊 Analytics", key="analytics")
     with col4:
-        st.button("🚨 Alerts", key="alerts")
+        if st.button("🚨 Alerts", key="alerts"):
+            st.session_state.show_alerts = not st.session_state.get('show_alerts', False)
+
+    if st.session_state.get('show_alerts'):
+        show_active_alerts(app)
 
     st.markdown("---")
 
-    df_live = pd.DataFrame(app.tracks_data['live_tracks'])
-    st.dataframe(
-        df_live.drop(columns=['route_coords'], errors='ignore'),
-        use_container_width=True,
-        height=400,
-        column_config={
-            "Track ID": st.column_config.TextColumn("Track ID", width="small"),
-            "Route": st.column_config.TextColumn("Route", width="medium"),
-            "Train": st.column_config.TextColumn("Train", width="medium"),
-            "Status": st.column_config.TextColumn("Status", width="small"),
-            "Speed": st.column_config.TextColumn("Speed", width="small"),
-            "Current Location": st.column_config.TextColumn("Current Location", width="medium")
-        }
-    )
+    show_track_table(app, 'live_tracks', height=400, column_config=app.table_views.column_config(
+        'live_tracks', widths={
+            "Track ID": "small", "Route": "medium", "Train": "medium",
+            "Status": "small", "Speed": "small", "Current Location": "medium", "Anomaly": "small"
+        }))
+    flagged = app.anomalies.flagged(app.track_store.rows('live_tracks'))
+    if len(flagged):
+        st.warning(f"⚠️ {len(flagged):,} trains show abnormal speed or delay: "
+                   + ", ".join(app.track_store.track_ids[flagged[:5]].tolist())
+                   + (f" and {len(flagged) - 5:,} more" if len(flagged) > 5 else ""))
 
     st.markdown("### 📈 Live Performance Metrics")
     col1, col2, col3, col4, col5 = st.columns(5)
@@ -605,19 +969,38 @@ def show_live_tracks(app):
     with col4:
         st.metric("Efficiency", "97%", "+1%")
     with col5:
-        st.metric("Alerts", "2", "-1")
-
+        st.metric("Alerts", f"{len(app.alerts):,}")
+
+# Display labels of the alert severities
+ALERT_SEVERITY_LABELS = {'high': "🔴 High", 'medium': "🟡 Medium", 'low': "🟢 Low"}
+
+def show_active_alerts(app):
+    """Table of the alerts currently raised, most severe and most recent first"""
+    alerts = app.alerts.alerts(config.MAX_TRACKS_DISPLAY)
+    st.markdown(f"### 🚨 Active Alerts ({len(app.alerts):,})")
+    if not alerts:
+        st.success("✅ No alert rules are currently triggered")
+        return
+    store = app.track_store
+    rows = np.array([alert['row'] for alert in alerts])
+    st.dataframe(pd.DataFrame({
+        "Severity": [ALERT_SEVERITY_LABELS.get(alert['severity'], alert['severity']) for alert in alerts],
+        "Track ID": store.track_ids[rows],
+        "Route": store.columns['Route'][rows] if 'Route' in store.columns else "",
+        "Alert": [alert['rule'] for alert in alerts],
+        "Rule": [alert['expression'] for alert in alerts],
+        "Value": [round(alert['value'], 1) for alert in alerts],
+        "Since": [datetime.fromtimestamp(alert['since']).strftime("%H:%M:%S") for alert in alerts],
+    }), use_container_width=True, hide_index=True)
+
+@instrument("streamlit.show_congested_tracks")
 def show_congested_tracks(app):
     st.markdown('<h2 class="section-header">⚠️ Congested Railway Tracks</h2>', unsafe_allow_html=True)
 
     st.warning("⚠️ These tracks are experiencing high traffic volumes and potential delays")
 
-    df_congested = pd.DataFrame(app.tracks_data['congested_tracks'])
-    st.dataframe(
-        df_congested.drop(columns=['route_coords', 'severity'], errors='ignore'), 
-        use_container_width=True,
-        height=300
-    )
+    show_track_table(app, 'congested_tracks', height=300,
+                     column_config=app.table_views.column_config('congested_tracks', hidden=['severity']))
 
     st.markdown("### 📊 Congestion Analysis")
     col1, col2, col3, col4 = st.columns(4)
@@ -631,6 +1014,8 @@ def show_congested_tracks(app):
     with col4:
         st.metric("Efficiency Loss", "15%", "+3%")
 
+    show_delay_what_if(app)
+
     # AI Recommendations Subsection
     st.markdown("---")
     st.markdown('<h3 style="color: #8e44ad;">🤖 AI-Powered Recommendations to Reduce Congestion</h3>', unsafe_allow_html=True)
@@ -662,6 +1047,99 @@ def show_congested_tracks(app):
         </div>
         """, unsafe_allow_html=True)
 
+def show_delay_what_if(app):
+    """What-if panel: knock-on delays across the network of extra minutes lost on one track"""
+    st.markdown("### 🔁 Knock-On Delay What-If")
+    store = app.track_store
+    top = app.hotspots.top(1)
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        track_id = st.text_input("Track ID", value=str(store.track_ids[top[0]]) if len(top) else "", key="whatif_track")
+    with col2:
+        minutes = st.number_input("Extra delay (min)", min_value=1, max_value=600, value=20, step=5, key="whatif_minutes")
+    with col3:
+        run = st.button("▶️ Propagate", key="whatif_run", type="primary")
+    if not run:
+        return
+
+    row = store.row_of(track_id.strip())
+    if row is None:
+        st.error(f"Unknown track: {track_id}")
+        return
+    model = shared_delay_propagation(network_source(), store)
+    added = model.what_if({row: float(minutes)})
+    affected = np.flatnonzero(added >= 0.5)
+    worst = affected[np.argsort(-added[affected], kind='stable')][:config.MAX_TRACKS_DISPLAY]
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Tracks Affected", f"{len(affected):,}")
+    with col2:
+        st.metric("Added Delay", f"{added.sum():,.0f} min")
+    with col3:
+        st.metric("Worst Knock-On", f"{added[affected[affected != row]].max(initial=0):.0f} min")
+    st.dataframe(pd.DataFrame({
+        "Track ID": store.track_ids[worst],
+        "Route": store.columns['Route'][worst] if 'Route' in store.columns else "",
+        "Added Delay": added[worst],
+        "Total Delay": model.delay[worst] + added[worst],
+    }), use_container_width=True, hide_index=True, column_config={
+        "Added Delay": st.column_config.NumberColumn("Added Delay", format="%.0f min"),
+        "Total Delay": st.column_config.NumberColumn("Total Delay", format="%.0f min"),
+    })
+
+def show_emergency_scenario(app):
+    """Emergency panel: Monte Carlo outcome of a set of blockages across the network"""
+    st.warning("🚨 Emergency clear protocol initiated! Simulate the blockages to plan the response.")
+    store = app.track_store
+    blocked = store.rows('blocked_tracks')[:5]
+    col1, col2, col3 = st.columns([3, 1, 1])
+    with col1:
+        tracks = st.text_input("Blocked tracks", value=", ".join(store.track_ids[blocked].tolist()), key="scenario_tracks")
+    with col2:
+        runs = st.number_input("Simulations", min_value=100, max_value=20000, value=config.SCENARIO_RUNS,
+                               step=100, key="scenario_runs")
+    with col3:
+        run = st.button("▶️ Simulate", key="scenario_run", type="primary")
+    if not run:
+        return
+
+    track_ids = [track_id.strip() for track_id in tracks.split(",") if track_id.strip()]
+    rows = [store.row_of(track_id) for track_id in track_ids]
+    unknown = [track_id for track_id, row in zip(track_ids, rows) if row is None]
+    if unknown or not rows:
+        st.error(f"Unknown track: {', '.join(unknown)}" if unknown else "Enter at least one track ID")
+        return
+    model = shared_delay_propagation(network_source(), store)
+    with st.spinner(f"Running {runs:,} simulations..."):
+        result = scenario_engine.run_scenario(model, rows, schema='streamlit', runs=runs)
+    system = result['system_delay']
+    worst = scenario_engine.most_impacted(result)
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Mean System Delay", f"{system.mean():,.0f} min")
+    with col2:
+        st.metric("Median (P50)", f"{np.percentile(system, 50):,.0f} min")
+    with col3:
+        st.metric("Worst Case (P95)", f"{np.percentile(system, 95):,.0f} min")
+    with col4:
+        st.metric("Tracks at Risk", f"{int((result['affected_share'] >= 0.5).sum()):,}")
+
+    counts, edges = np.histogram(system, bins=30)
+    st.bar_chart(pd.DataFrame({"Simulations": counts}, index=np.round(edges[:-1]).astype(int)), height=200)
+    st.caption(f"System delay added across the network in {result['runs']:,} simulations (minutes)")
+    st.dataframe(pd.DataFrame({
+        "Track ID": store.track_ids[worst],
+        "Route": store.columns['Route'][worst] if 'Route' in store.columns else "",
+        "Mean Added Delay": result['mean_impact'][worst],
+        "P(affected)": result['affected_share'][worst],
+    }), use_container_width=True, hide_index=True, column_config={
+        "Mean Added Delay": st.column_config.NumberColumn("Mean Added Delay", format="%.0f min"),
+        "P(affected)": st.column_config.ProgressColumn("P(affected)", min_value=0.0, max_value=1.0, format="%.2f"),
+    })
+
+@instrument("streamlit.show_blocked_tracks")
 def show_blocked_tracks(app):
     st.markdown('<h2 class="section-header">🚫 Blocked Railway Tracks</h2>', unsafe_allow_html=True)
 
@@ -670,31 +1148,103 @@ def show_blocked_tracks(app):
         st.error("🚨 These tracks are currently unavailable due to maintenance, repairs, or technical issues")
     with col2:
         if st.button("🚨 Emergency Protocol", key="emergency_clear", type="secondary"):
-            st.warning("🚨 Emergency clear protocol initiated!")
-            st.balloons()
-
-    df_blocked = pd.DataFrame(app.tracks_data['blocked_tracks'])
-    st.dataframe(
-        df_blocked.drop(columns=['route_coords'], errors='ignore'), 
-        use_container_width=True,
-        height=300
-    )
-
-    st.markdown("### 🔧 Maintenance Progress Tracking")
-    maintenance_data = [
-        {"Track": "T008", "Work": "Track Replacement", "Progress": 60, "ETA": "1.2 hours"},
-        {"Track": "T015", "Work": "Signal Repair", "Progress": 85, "ETA": "25 min"},
-        {"Track": "T022", "Work": "Infrastructure Upgrade", "Progress": 25, "ETA": "3.2 hours"}
-    ]
-
-    for item in maintenance_data:
-        st.markdown(f"**🔧 {item['Track']} - {item['Work']}**")
+            st.session_state.emergency_protocol = True
+
+    if st.session_state.get('emergency_protocol'):
+        show_emergency_scenario(app)
+
+    show_track_table(app, 'blocked_tracks', height=300, column_config=app.table_views.column_config('blocked_tracks'))
+
+    show_affected_services(app)
+    show_maintenance_progress(app)
+
+def show_affected_services(app):
+    """Services planned over one blocked track and the connections they feed"""
+    st.markdown("### 🚆 Affected Services")
+    store = app.track_store
+    blocked = store.rows('blocked_tracks')
+    track_id = st.text_input("Blocked track", value=str(store.track_ids[blocked[0]]) if len(blocked) else "",
+                             key="impact_track")
+    row = store.row_of(track_id.strip())
+    if row is None:
+        if track_id.strip():
+            st.error(f"Unknown track: {track_id}")
+        return
+
+    index = shared_impact_index(network_source(), store)
+    services = index.affected([row])
+    connections = index.connections(services)
+    now = datetime.now()
+    start = now.hour * 60 + now.minute
+    clearance = track_store.parse_quantity(store.value(row, 'Estimated Clearance')) if 'Estimated Clearance' in store.columns else None
+    end = start + (clearance or 0)
+    during = impact_index.overlaps(services['start'], services['end'], start, end)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Services Over Track", f"{len(services['leg']):,}")
+    with col2:
+        st.metric("During Blockage", f"{int(during.sum()):,}")
+    with col3:
+        st.metric("Connections at Risk", f"{len(np.unique(connections['service'])):,}")
+    if not len(services['leg']):
+        st.caption(f"No services are planned over {track_id.strip()}")
+        return
+
+    legs = {key: np.concatenate([services[key], connections[key]]) for key in services}
+    impact = np.r_[np.full(len(services['leg']), "🛤️ Runs over track", dtype=object),
+                   np.full(len(connections['leg']), "🔁 Connection", dtype=object)]
+    st.dataframe(pd.DataFrame({
+        "Service": index.names[legs['service']],
+        "Impact": impact,
+        "Track ID": store.track_ids[legs['row']],
+        "Route": store.columns['Route'][legs['row']] if 'Route' in store.columns else "",
+        "Departs": [impact_index.clock(minutes) for minutes in legs['start'].tolist()],
+        "Arrives": [impact_index.clock(minutes) for minutes in legs['end'].tolist()],
+        "During Blockage": np.r_[during, impact_index.overlaps(connections['start'], connections['end'], start,
+                                                               end + config.IMPACT_CONNECTION_WINDOW_MIN)],
+    }).head(config.MAX_TRACKS_DISPLAY), use_container_width=True, hide_index=True)
+
+def ingest_crew_reports(app):
+    """Button callback: take a progress report from every blocked track before the page renders"""
+    tracker, reports = shared_maintenance(network_source(), app.track_store)
+    rows = app.track_store.rows('blocked_tracks')
+    tracker.ingest(rows, reports.report(rows))
+
+def show_maintenance_progress(app):
+    """Progress and ETA of the blocked tracks due back first, fitted from crew reports"""
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.markdown("### 🔧 Maintenance Progress Tracking")
+    tracker, reports = shared_maintenance(network_source(), app.track_store)
+    with col2:
+        st.button("🔄 Refresh Progress", key="maintenance_refresh", on_click=ingest_crew_reports, args=(app,))
+
+    estimate = tracker.estimates()
+    if not len(estimate['rows']):
+        st.info("No maintenance work in progress")
+        return
+    store = app.track_store
+    reason = 'Blocking Reason'
+    for index in maintenance.soonest(estimate).tolist():
+        row = estimate['rows'][index]
+        work = store.value(row, reason) if reason in store.columns else ""
+        st.markdown(f"**🔧 {store.track_ids[row]} - {work}**")
+        progress = estimate['progress'][index]
+        low, high = estimate['eta_low_min'][index], estimate['eta_high_min'][index]
+        band = "" if np.isnan(low) else (f" · ETA range {maintenance.format_minutes(low)} – "
+                                         + ("open" if np.isinf(high) else maintenance.format_minutes(high)))
         col1, col2 = st.columns([3, 1])
         with col1:
-            st.progress(item['Progress'] / 100, text=f"Progress: {item['Progress']}%")
+            if np.isnan(progress):
+                st.progress(0.0, text="Progress: awaiting crew report")
+            else:
+                st.progress(progress / 100, text=f"Progress: {progress:.0f}%{band}")
         with col2:
-            st.metric("ETA", item['ETA'])
+            st.metric("ETA", maintenance.format_minutes(estimate['eta_min'][index]))
+    st.caption(f"{int(estimate['fitted'].sum()):,} of {len(estimate['rows']):,} blocked tracks estimated from "
+               f"crew reports · {min(config.MAINTENANCE_DISPLAY_COUNT, len(estimate['rows']))} due back first shown")
 
+@instrument("streamlit.show_free_tracks")
 def show_free_tracks(app):
     st.markdown('<h2 class="section-header">✅ Free Railway Tracks</h2>', unsafe_allow_html=True)
 
@@ -705,12 +1255,7 @@ def show_free_tracks(app):
         if st.button("🚂 Schedule Train", key="schedule_train", type="primary"):
             st.info("🚂 Opening advanced train scheduling interface...")
 
-    df_free = pd.DataFrame(app.tracks_data['free_tracks'])
-    st.dataframe(
-        df_free.drop(columns=['route_coords'], errors='ignore'), 
-        use_container_width=True,
-        height=350
-    )
+    show_track_table(app, 'free_tracks', height=350, column_config=app.table_views.column_config('free_tracks'))
 
     st.markdown("### 📊 Capacity Utilization & Efficiency")
     col1, col2, col3, col4, col5 = st.columns(5)
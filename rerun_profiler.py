@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Railway Track Monitoring System - Streamlit Rerun Profiler
+Opt-in (``?profile=1`` or the sidebar toggle) timeline of every Streamlit
+rerun: section and widget spans, DataFrame serialization bytes, folium
+HTML size and cache hits.  The last PROFILER_MAX_RERUNS reruns are kept in
+a per-session ring buffer and shown as a flame-style table that can be
+downloaded as JSON for performance tickets.
+"""
+
+import json
+from collections import deque
+from datetime import datetime
+
+import streamlit as st
+
+import config
+from startup import lazy_import
+from instrumentation import span, annotate, start_timeline, stop_timeline, timeline_active
+
+PROFILE_KEY = "profile_reruns"
+_BUFFER_KEY = "_rerun_profiles"
+_WIDGETS_KEY = "_rerun_profiler_widgets"
+
+pd = lazy_import("pandas")
+
+
+def _query_flag():
+    params = getattr(st, "query_params", None)
+    if params is not None:
+        value = params.get("profile", "")
+    else:
+        value = (st.experimental_get_query_params().get("profile") or [""])[0]
+    return str(value).lower() in ("1", "true", "yes", "on")
+
+
+def profiling_enabled():
+    """Profiling is on when requested by query parameter or the sidebar toggle"""
+    return _query_flag() or bool(st.session_state.get(PROFILE_KEY, False))
+
+
+def _widget_values():
+    values = {}
+    for key, value in st.session_state.items():
+        if not str(key).startswith("_") and isinstance(value, (str, int, float, bool)):
+            values[str(key)] = value
+    return values
+
+
+def begin_rerun():
+    """Start recording this rerun's timeline; returns False when profiling is off"""
+    if not profiling_enabled():
+        return False
+    start_timeline()
+    return True
+
+
+def end_rerun(section=""):
+    """Close this rerun's timeline and append it to the session's ring buffer"""
+    timeline = stop_timeline()
+    if timeline is None:
+        return None
+
+    # Widgets with keys live in session_state, so a diff names the trigger
+    widgets = _widget_values()
+    previous = st.session_state.get(_WIDGETS_KEY, {})
+    trigger = [key for key, value in widgets.items() if previous.get(key, value) != value]
+    st.session_state[_WIDGETS_KEY] = widgets
+
+    buffer = st.session_state.get(_BUFFER_KEY)
+    if buffer is None or buffer.maxlen != config.PROFILER_MAX_RERUNS:
+        buffer = st.session_state[_BUFFER_KEY] = deque(buffer or (), maxlen=config.PROFILER_MAX_RERUNS)
+    record = {
+        'rerun': (buffer[-1]['rerun'] + 1) if buffer else 1,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'section': section,
+        'trigger': ", ".join(trigger) or "—",
+        'total_ms': round(timeline.duration_ms, 2),
+        'events': timeline.events,
+        'counters': timeline.counters,
+    }
+    buffer.append(record)
+    return record
+
+
+def record_dataframe(name, df):
+    """Annotate the current span with the Arrow size of a DataFrame about to be shown"""
+    if not timeline_active():
+        return
+    with span(f"profiler.arrow.{name}"):
+        try:
+            import pyarrow as pa
+            size = pa.Table.from_pandas(df, preserve_index=False).nbytes
+        except (ImportError, TypeError, ValueError):
+            size = int(df.memory_usage(deep=True).sum())
+    annotate(dataframe_bytes=size, dataframe_rows=len(df))
+
+
+def record_folium_html(folium_map):
+    """Annotate the current span with the folium HTML size (renders the map once more)"""
+    if not timeline_active():
+        return
+    with span("profiler.folium_html"):
+        size = len(folium_map.get_root().render().encode("utf-8"))
+    annotate(folium_html_bytes=size)
+
+
+_EVENT_FIELDS = ('name', 'depth', 'start_ms', 'duration_ms')
+
+
+def flame_rows(record):
+    """Spans of one rerun in start order, indented by depth, with self time and share"""
+    events = sorted(record['events'], key=lambda event: event['start_ms'])
+    total = record['total_ms'] or 1.0
+    children = [0.0] * len(events)
+    open_spans = []
+    for index, event in enumerate(events):
+        while open_spans and open_spans[-1][1] >= event['depth']:
+            open_spans.pop()
+        if open_spans:
+            children[open_spans[-1][0]] += event['duration_ms'] or 0.0
+        open_spans.append((index, event['depth']))
+
+    rows = []
+    for index, event in enumerate(events):
+        duration = event['duration_ms'] or 0.0
+        details = ", ".join(f"{key}={value:,}" for key, value in event.items() if key not in _EVENT_FIELDS)
+        rows.append({
+            'Span': "│ " * event['depth'] + event['name'],
+            'Start (ms)': round(event['start_ms'], 2),
+            'Duration (ms)': round(duration, 2),
+            'Self (ms)': round(max(0.0, duration - children[index]), 2),
+            'Share': min(1.0, duration / total),
+            'Details': details,
+        })
+    return rows
+
+
+def show_profiler_panel():
+    """Flame-style table of the buffered reruns with a JSON download"""
+    buffer = st.session_state.get(_BUFFER_KEY)
+    if not buffer:
+        return
+
+    with st.expander(f"🔬 Rerun Profiler — last {len(buffer)} reruns", expanded=True):
+        labels = {f"#{record['rerun']} · {record['timestamp']} · {record['total_ms']:.0f} ms · {record['section']}": record
+                  for record in reversed(buffer)}
+        record = labels[st.selectbox("Rerun", list(labels))]
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Rerun time", f"{record['total_ms']:.1f} ms")
+        col2.metric("Spans", len(record['events']))
+        col3.metric("Triggered by", record['trigger'])
+
+        st.dataframe(
+            pd.DataFrame(flame_rows(record)),
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "Share": st.column_config.ProgressColumn("Share", min_value=0.0, max_value=1.0, format="%.2f"),
+            }
+        )
+        if record['counters']:
+            st.caption("Cache and rerun counters: " +
+                       ", ".join(f"{key} {value}" for key, value in sorted(record['counters'].items())))
+
+        st.download_button("📥 Download profile (JSON)", json.dumps(list(buffer), indent=2),
+                           file_name="rerun_profile.json", mime="application/json")
@@ -10,16 +10,12 @@ import subprocess
 import os
 from pathlib import Path
 
+from startup import TIMING_ENV, module_available, mark, print_startup_report
+
 def check_dependencies():
-    """Check if required dependencies are installed"""
+    """Check if required dependencies are installed (probed without importing them)"""
     required = ['tkinter', 'pandas']
-    missing = []
-
-    for package in required:
-        try:
-            __import__(package)
-        except ImportError:
-            missing.append(package)
+    missing = [package for package in required if not module_available(package)]
 
     if missing:
         print(f"⚠️  Missing required packages: {', '.join(missing)}")
@@ -51,7 +47,20 @@ def run_streamlit_app():
     except Exception as e:
         print(f"❌ Error launching web app: {e}")
 
+def run_benchmarks(args):
+    """Run the headless benchmark suite (see benchmark.py for options)"""
+    from benchmark import main as benchmark_main
+    return benchmark_main(args)
+
 def main():
+    if "--bench" in sys.argv[1:]:
+        args = [arg for arg in sys.argv[1:] if arg != "--bench"]
+        sys.exit(run_benchmarks(args))
+
+    if "--timing" in sys.argv[1:]:
+        # Inherited by the launched app, which prints its own report
+        os.environ[TIMING_ENV] = "1"
+
     print("🚄 Railway Track Monitoring System - Enhanced Track Visualization")
     print("=" * 70)
     print("🗺️  New Feature: Highlighted railway tracks instead of point markers!")
@@ -75,6 +84,9 @@ def main():
     print("3. 🔧 Install Dependencies")
     print("4. ❌ Exit")
 
+    mark("launcher menu")
+    print_startup_report("Launcher")
+
     while True:
         try:
             choice = input("\n🎯 Enter your choice (1-4): ").strip()
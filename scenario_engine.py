@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Railway Track Monitoring System - Emergency Scenario Engine
+Monte Carlo what-if of a set of blockages.  Every run draws how long each
+blocked track stays closed (log-normal around its estimated clearance) and
+whether its trains are rerouted, over a parallel track of the same corridor
+or through a neighbouring track at one of its stations, or wait for the
+clearance.  The resulting primary delays are spread through the network
+with the knock-on delay model of ``delay_propagation``.
+
+Runs are split across a process pool (SCENARIO_WORKERS) started with
+forkserver or spawn, never fork: the apps run threads, and a forked child
+could inherit a lock one of them holds.  Per-run state is
+NumPy arrays: each run writes its delays into a worker's copy of the
+network state and then restores only the tracks it changed, so a run costs
+the neighbourhood of the blockages, not the size of the network.
+"""
+
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import config
+from instrumentation import instrument
+from network_generator import SCHEMAS
+from track_store import column_numbers, group_csr, gather_csr
+from delay_propagation import propagate
+
+DEFAULT_CLEARANCE_MIN = 60.0  # Blockages without a usable estimate
+CORRIDOR_DETOUR_MIN = (5.0, 15.0)  # Extra running time over a parallel track
+STATION_DETOUR_MIN = (20.0, 45.0)  # Extra running time through a neighbouring track
+REROUTE_LOAD_SHARE = 0.2  # Share of the closure passed to the alternative track as extra load
+MAX_ALTERNATIVES = 32  # Alternative tracks considered per blockage
+AFFECTED_MIN = 0.5  # Added minutes from which a track counts as affected
+
+
+def _workers():
+    return config.SCENARIO_WORKERS or os.cpu_count() or 1
+
+
+def _pool_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def _alternatives(grouping, row, blocked):
+    """Unblocked tracks sharing a group with ``row``"""
+    groups = grouping.membership[row]
+    members = gather_csr(grouping.offsets, grouping.members, groups[groups >= 0])
+    members = np.unique(members[~blocked[members]])
+    return members[:MAX_ALTERNATIVES]
+
+
+def _lists_csr(lists):
+    """CSR ``(offsets, members)`` of a list of member arrays"""
+    keys = np.repeat(np.arange(len(lists)), [len(items) for items in lists])
+    members = np.concatenate(lists).astype(np.int64) if lists else np.empty(0, dtype=np.int64)
+    return group_csr(keys, len(lists), members)
+
+
+def blockage_plan(model, rows, clearance):
+    """Arrays describing the blockages of ``rows`` for the simulation workers"""
+    rows = np.asarray(rows, dtype=np.int64)
+    blocked = np.zeros(len(model.primary), dtype=bool)
+    blocked[rows] = True
+    stations, corridors = model.groupings
+    return {
+        'rows': rows,
+        'clearance': np.where(clearance > 0, clearance, DEFAULT_CLEARANCE_MIN),
+        'corridor': _lists_csr([_alternatives(corridors, row, blocked) for row in rows.tolist()]),
+        'station': _lists_csr([_alternatives(stations, row, blocked) for row in rows.tolist()]),
+    }
+
+
+def _pick(alternatives, rng):
+    """One random alternative per blockage (-1 where there is none)"""
+    offsets, members = alternatives
+    counts = np.diff(offsets)
+    picked = np.full(len(counts), -1, dtype=np.int64)
+    some = counts > 0
+    picked[some] = members[offsets[:-1][some] + (rng.random(int(some.sum())) * counts[some]).astype(np.int64)]
+    return picked
+
+
+def sample_delays(plan, rng):
+    """``(rows, minutes)`` of primary delay added in one run"""
+    count = len(plan['rows'])
+    closure = plan['clearance'] * rng.lognormal(0.0, config.SCENARIO_CLEARANCE_SPREAD, count)
+    alternative = _pick(plan['corridor'], rng)
+    via_station = alternative < 0
+    alternative[via_station] = _pick(plan['station'], rng)[via_station]
+    detour = np.where(via_station, rng.uniform(*STATION_DETOUR_MIN, count), rng.uniform(*CORRIDOR_DETOUR_MIN, count))
+    rerouted = (rng.random(count) < config.SCENARIO_REROUTE_PROBABILITY) & (alternative >= 0)
+
+    # Rerouted trains lose the detour and load the alternative; the others wait out the closure
+    rows = np.concatenate([plan['rows'], alternative[rerouted]])
+    minutes = np.concatenate([np.where(rerouted, detour, closure), REROUTE_LOAD_SHARE * closure[rerouted]])
+    rows, inverse = np.unique(rows, return_inverse=True)
+    return rows, np.bincount(inverse, weights=minutes)
+
+
+def run_batch(task):
+    """Simulate ``runs`` scenarios; returns per-run system delay and per-track impact sums"""
+    (groupings, primary, delay, state), plan, seed, runs = task
+    rng = np.random.default_rng(seed)
+    base = delay.copy()
+    system = np.zeros(runs)
+    impact = np.zeros(len(delay))
+    affected = np.zeros(len(delay), dtype=np.int64)
+    for run in range(runs):
+        rows, minutes = sample_delays(plan, rng)
+        reported = primary[rows].copy()
+        primary[rows] += minutes
+        changed = propagate(groupings, primary, delay, state, rows)
+        added = delay[changed] - base[changed]
+        system[run] = added.sum()
+        impact[changed] += added
+        affected[changed] += added >= AFFECTED_MIN
+
+        # Undo the run: restore the changed delays and the maxima of their groups
+        primary[rows] = reported
+        delay[changed] = base[changed]
+        for grouping, group_state in zip(groupings, state):
+            grouping.update(group_state, delay, changed)
+    return system, impact, affected
+
+
+@instrument("scenario_engine.run_scenario")
+def run_scenario(model, rows, schema='streamlit', runs=None, workers=None, seed=None):
+    """Monte Carlo outcome of blocking ``rows``.
+
+    Returns a dictionary with ``system_delay`` (added minutes across the
+    network, one value per run), and per track ``mean_impact`` (mean added
+    minutes) and ``affected_share`` (share of runs adding at least
+    ``AFFECTED_MIN`` minutes).
+    """
+    runs = config.SCENARIO_RUNS if runs is None else int(runs)
+    workers = max(1, min(workers or _workers(), runs))
+    clearance_column = SCHEMAS[schema]['clearance']
+    rows = np.unique(np.asarray(rows, dtype=np.int64))
+    with model.store.lock:
+        # Runs modify the state they are given, so they work on a copy taken between store updates
+        clearance = (column_numbers(model.store, clearance_column, rows) if clearance_column in model.store.columns
+                     else np.zeros(len(rows)))
+        plan = blockage_plan(model, rows, clearance)
+        network = (model.groupings, model.primary.copy(), model.delay.copy(),
+                   [tuple(array.copy() for array in group_state) for group_state in model.state])
+
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    sizes = np.diff(np.linspace(0, runs, workers + 1).astype(np.int64))
+    if workers == 1:
+        results = [run_batch((network, plan, seeds[0], runs))]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as pool:
+            results = list(pool.map(run_batch, [(network, plan, batch_seed, int(size))
+                                                for batch_seed, size in zip(seeds, sizes)]))
+
+    system = np.concatenate([result[0] for result in results])
+    return {
+        'rows': rows,
+        'runs': runs,
+        'system_delay': system,
+        'mean_impact': sum(result[1] for result in results) / runs,
+        'affected_share': sum(result[2] for result in results) / runs,
+    }
+
+
+def most_impacted(result, count=None):
+    """Rows with the largest mean added delay, worst first"""
+    count = config.MAX_TRACKS_DISPLAY if count is None else count
+    impact = result['mean_impact']
+    candidates = np.flatnonzero(impact >= AFFECTED_MIN)
+    if len(candidates) > count:
+        candidates = candidates[np.argpartition(-impact[candidates], count - 1)[:count]]
+    return candidates[np.argsort(-impact[candidates], kind='stable')]
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Railway Track Monitoring System - Track Search Index
+Typeahead search over track ids, train names, stations and routes.
+
+Every searchable value is a document: one per track id and one per
+distinct train name, station and route.  Documents are found through their
+terms (lower-case words, and whole track ids).  The terms are kept in one
+sorted array, so a prefix is a binary-search range, which serves as a
+flattened prefix trie; CSR postings map each term to its documents (an
+inverted index).  Values written to the store later go to a small overlay
+that is searched together with the base index, and rows that moved to
+another value are filtered out when a document's rows are read.
+
+Prefix queries over a million tracks answer in well under a millisecond;
+a query term that matches nothing falls back to fuzzy matching (one or two
+edits) against the word vocabulary.
+"""
+
+import re
+import bisect
+from collections import defaultdict
+
+import numpy as np
+
+from instrumentation import instrument
+from track_store import group_csr, gather_csr, synchronized
+
+# Document kinds, in the order hits of equal quality are listed
+KINDS = ('track', 'train', 'station', 'route')
+KIND_ICONS = {'track': '🛤️', 'train': '🚆', 'station': '🚉', 'route': '🧭'}
+
+MAX_CANDIDATES = 200  # Documents ranked per query; typeahead only needs the best few
+FUZZY_MAX_WORDS = 64  # Vocabulary words a misspelled term may expand to
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+
+def tokens(text):
+    """Lower-case words and numbers of a value or query"""
+    return _TOKEN_RE.findall(str(text).lower())
+
+
+def _grown(values, size):
+    """``values`` with room for ``size`` entries, doubling its capacity when it is full"""
+    if size <= len(values):
+        return values
+    grown = np.empty(max(size, 2 * len(values)), dtype=values.dtype)
+    grown[:len(values)] = values
+    return grown
+
+
+def route_stations(route):
+    """End stations of a route label ('Delhi-Mumbai' -> ['Delhi', 'Mumbai'])"""
+    names = [name.strip() for name in str(route).split('-')]
+    return [names[0], names[-1]] if len(names) >= 2 and names[0] and names[-1] else []
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance of two short strings, or ``limit + 1`` once it exceeds ``limit``"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class SearchIndex:
+    """Inverted index with prefix lookup over one TrackStore.
+
+    ``train_column`` and ``route_column`` name the store columns holding
+    train names and routes; stations are the end points of the routes.
+    The index subscribes to the store and follows its updates.
+    """
+
+    def __init__(self, store, train_column='train', route_column='route'):
+        self.store = store
+        self.columns = {'train': train_column, 'route': route_column}
+        self._build()
+        store.subscribe(self.on_store_change)
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+    @instrument("search_index.build")
+    def _build(self):
+        store = self.store
+        kinds, refs, texts = [], [], []
+        term_lists, doc_lists = [], []
+        self._label_of = {}  # kind -> label id of every row (-1 when blank)
+        self._labels = {}  # kind -> label values (with spare capacity past ``_label_count``)
+        self._label_count = {}
+        self._label_ids = {}  # kind -> {value: label id}, built on the first update
+        self._label_docs = {}  # kind -> (label ids, their documents)
+        self._doc_by_label = {}  # kind -> document of every label id (-1 when none)
+
+        def add_docs(kind, ref, text):
+            first = sum(len(r) for r in refs)
+            kinds.append(np.full(len(ref), KINDS.index(kind), dtype=np.int8))
+            refs.append(np.asarray(ref, dtype=np.int64))
+            texts.append(np.asarray(text, dtype=object))
+            return first
+
+        # Track ids: the whole id is a term, so 'T01' finds 'T0187'
+        ids = store.track_ids.astype(str)
+        first = add_docs('track', np.arange(len(store)), store.track_ids)
+        term_lists.append(np.char.lower(ids))
+        doc_lists.append(np.arange(first, first + len(store)))
+
+        for kind in ('train', 'route'):
+            column = self.columns[kind]
+            if column not in store.columns:
+                self._labels[kind] = np.empty(0, dtype=object)
+                self._label_count[kind] = 0
+                self._label_of[kind] = np.full(len(store), -1, dtype=np.int64)
+                self._label_docs[kind] = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+                self._doc_by_label[kind] = np.empty(0, dtype=np.int64)
+                continue
+            codes, labels = store.codes(column)
+            present = np.array([bool(str(label).strip()) for label in labels.tolist()], dtype=bool)
+            self._labels[kind] = labels.copy()
+            self._label_count[kind] = len(labels)
+            self._label_of[kind] = np.where(present[codes], codes, -1).astype(np.int64)
+            label_ids = np.flatnonzero(present)
+            first = add_docs(kind, label_ids, labels[label_ids])
+            self._label_docs[kind] = (label_ids, np.arange(first, first + len(label_ids)))
+            self._doc_by_label[kind] = np.full(len(labels), -1, dtype=np.int64)
+            self._doc_by_label[kind][label_ids] = self._label_docs[kind][1]
+
+        # Rows of each train and route label
+        self._label_rows = {}
+        for kind, label_of in self._label_of.items():
+            valid = np.flatnonzero(label_of >= 0)
+            self._label_rows[kind] = group_csr(label_of[valid], len(self._labels[kind]), valid)
+        self._extra_rows = {kind: defaultdict(list) for kind in self._label_of}
+
+        # Stations from the route labels, with the routes that end at each
+        station_ids, station_names, pairs = {}, [], []
+        routes = self._labels['route']
+        for label in self._label_docs['route'][0].tolist():
+            for name in route_stations(routes[label]):
+                if name not in station_ids:
+                    station_ids[name] = len(station_names)
+                    station_names.append(name)
+                pairs.append((station_ids[name], label))
+        pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+        self._station_ids = station_ids
+        self._station_routes = group_csr(pairs[:, 0], len(station_names), pairs[:, 1])
+        self._extra_station_routes = defaultdict(list)
+        first = add_docs('station', np.arange(len(station_names)), station_names)
+
+        # Words of trains and stations; a route's words are those of its two stations
+        station_terms = [(term, station) for station, name in enumerate(station_names) for term in set(tokens(name))]
+        train_docs = self._label_docs['train']
+        train_terms = [(term, doc) for label, doc in zip(train_docs[0].tolist(), train_docs[1].tolist())
+                       for term in set(tokens(self._labels['train'][label]))]
+        # Postings are kept in kind order, so a truncated candidate list keeps the best kinds
+        if train_terms:
+            terms, docs = zip(*train_terms)
+            term_lists.append(np.array(terms, dtype=str))
+            doc_lists.append(np.array(docs, dtype=np.int64))
+        if station_terms:
+            terms, stations = zip(*station_terms)
+            terms, stations = np.array(terms, dtype=str), np.array(stations, dtype=np.int64)
+            term_lists.append(terms)
+            doc_lists.append(first + stations)
+            positions, route_docs = self._station_route_docs(stations)
+            term_lists.append(terms[positions])
+            doc_lists.append(route_docs)
+
+        # Documents added later go to the spare capacity past ``_doc_count``
+        self.doc_kind = np.concatenate(kinds)
+        self.doc_ref = np.concatenate(refs)
+        self.doc_text = np.concatenate(texts)
+        self._doc_count = len(self.doc_kind)
+        self._doc_words = {}  # doc -> ' '-prefixed words of its text, filled by queries
+
+        all_terms = np.concatenate([np.asarray(terms, dtype=str) for terms in term_lists])
+        all_docs = np.concatenate(doc_lists).astype(np.int64)
+        self.terms, term_ids = np.unique(all_terms, return_inverse=True)
+        self.term_offsets, self.term_docs = group_csr(term_ids.ravel(), len(self.terms), all_docs)
+        self._words = self.terms[np.char.isalpha(self.terms)].tolist()
+
+        # Overlay for values written after the build
+        self._extra_terms = []
+        self._extra_postings = defaultdict(list)
+
+    def _station_route_docs(self, stations):
+        """``(positions, route docs)`` pairing each entry of ``stations`` with its routes' documents"""
+        offsets, routes = self._station_routes
+        counts = offsets[stations + 1] - offsets[stations]
+        positions = np.repeat(np.arange(len(stations)), counts)
+        within = np.arange(len(positions)) - np.repeat(np.cumsum(counts) - counts, counts)
+        return positions, self._doc_by_label['route'][routes[np.repeat(offsets[stations], counts) + within]]
+
+    # ------------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------------
+    def on_store_change(self, rows, columns):
+        """Store listener: re-index rows whose train name or route changed"""
+        for kind, column in self.columns.items():
+            if column in columns and column in self.store.columns:
+                self._update_rows(kind, np.asarray(rows, dtype=np.int64), self.store.columns[column][rows])
+
+    def _label_id(self, kind, value):
+        """Label id of a value (-1 when blank), adding a document and its terms for new values"""
+        if not str(value).strip():
+            return -1
+        if kind not in self._label_ids:
+            labels = self._labels[kind][:self._label_count[kind]].tolist()
+            self._label_ids[kind] = {label: index for index, label in enumerate(labels)}
+        label = self._label_ids[kind].get(value)
+        if label is not None and self._doc_by_label[kind][label] >= 0:
+            return label
+        if label is None:
+            label = self._label_ids[kind][value] = self._label_count[kind]
+            self._label_count[kind] += 1
+            self._labels[kind] = _grown(self._labels[kind], label + 1)
+            self._labels[kind][label] = value
+            self._doc_by_label[kind] = _grown(self._doc_by_label[kind], label + 1)
+            self._doc_by_label[kind][label] = -1
+
+        doc = self._doc_by_label[kind][label] = self._add_doc(kind, label, value)
+        if kind == 'train':
+            self._add_terms(tokens(value), doc)
+        else:
+            for name in route_stations(value):
+                station = self._station_ids.get(name)
+                if station is None:
+                    station = self._station_ids[name] = len(self._station_ids)
+                    self._add_terms(tokens(name), self._add_doc('station', station, name))
+                self._extra_station_routes[station].append(label)
+                self._add_terms(tokens(name), doc)
+        return label
+
+    def _add_doc(self, kind, ref, text):
+        doc = self._doc_count
+        self.doc_kind = _grown(self.doc_kind, doc + 1)
+        self.doc_ref = _grown(self.doc_ref, doc + 1)
+        self.doc_text = _grown(self.doc_text, doc + 1)
+        self.doc_kind[doc], self.doc_ref[doc], self.doc_text[doc] = KINDS.index(kind), ref, text
+        self._doc_count += 1
+        return doc
+
+    def _add_terms(self, terms, doc):
+        for term in set(terms):
+            if term not in self._extra_postings:
+                bisect.insort(self._extra_terms, term)
+            self._extra_postings[term].append(doc)
+
+    def _update_rows(self, kind, rows, values):
+        labels = np.array([self._label_id(kind, value) for value in values.tolist()], dtype=np.int64)
+        moved = self._label_of[kind][rows] != labels
+        self._label_of[kind][rows] = labels
+        extra = self._extra_rows[kind]
+        for row, label in zip(rows[moved].tolist(), labels[moved].tolist()):
+            if label >= 0:
+                extra[label].append(row)
+
+        # Fold a grown overlay back into the base postings
+        if sum(len(extra_rows) for extra_rows in extra.values()) > max(1000, len(self.store) // 10):
+            label_of = self._label_of[kind]
+            valid = np.flatnonzero(label_of >= 0)
+            self._label_rows[kind] = group_csr(label_of[valid], self._label_count[kind], valid)
+            extra.clear()
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def _term_range(self, term):
+        """Postings of every term starting with ``term``: base slice plus overlay lists"""
+        low = int(np.searchsorted(self.terms, term, side='left'))
+        high = int(np.searchsorted(self.terms, term + '\uffff', side='left'))
+        extra = self._extra_terms[bisect.bisect_left(self._extra_terms, term):
+                                  bisect.bisect_left(self._extra_terms, term + '\uffff')]
+        return low, high, extra
+
+    def _range_docs(self, low, high, extra, limit):
+        """Up to ``limit`` base and ``limit`` overlay documents of a term range, in term order (exact match first)"""
+        start = self.term_offsets[low]
+        docs = self.term_docs[start:min(self.term_offsets[high], start + limit)]
+        if extra:
+            added = []
+            for term in extra:
+                added.extend(self._extra_postings[term][:limit - len(added)])
+                if len(added) >= limit:
+                    break
+            docs = np.concatenate([docs, np.asarray(added, dtype=np.int64)])
+        return docs
+
+    def _doc_words_of(self, doc):
+        """Words of a document's text, each preceded by a space (cached)"""
+        words = self._doc_words.get(doc)
+        if words is None:
+            words = self._doc_words[doc] = " " + " ".join(tokens(self.doc_text[doc]))
+        return words
+
+    def _fuzzy_docs(self, term):
+        """Documents of vocabulary words within one or two edits of a misspelled term"""
+        limit = 1 if len(term) <= 5 else 2
+        start = bisect.bisect_left(self._words, term[:1])
+        stop = bisect.bisect_left(self._words, term[:1] + '\uffff')
+        words = [word for word in self._words[start:stop]
+                 if min(edit_distance(term, word, limit), edit_distance(term, word[:len(term)], limit)) <= limit]
+        docs = [self._range_docs(*self._term_range(word), MAX_CANDIDATES) for word in words[:FUZZY_MAX_WORDS]]
+        return np.unique(np.concatenate(docs)) if docs else np.empty(0, dtype=np.int64)
+
+    @instrument("search_index.search")
+    @synchronized
+    def search(self, query, limit=8, fuzzy=True):
+        """Best documents for a typeahead query, as hit dictionaries.
+
+        Every query word must prefix-match a word of the document; hits are
+        ordered exact matches first, then by kind and by length.  Each hit
+        has ``kind``, ``text``, ``doc`` and ``rows`` (store rows, never empty).
+        """
+        words = tokens(query)
+        if not words:
+            return []
+
+        # The most selective word drives the candidates, the others filter them
+        ranges = [self._term_range(word) for word in words]
+        sizes = [self.term_offsets[high] - self.term_offsets[low] + len(extra) for low, high, extra in ranges]
+        driver = int(np.argmin(sizes))
+        candidates = self._range_docs(*ranges[driver], MAX_CANDIDATES)
+        if len(candidates) == 0 and fuzzy:
+            candidates = self._fuzzy_docs(words[driver])
+        others = [word for position, word in enumerate(words) if position != driver]
+
+        text = " " + " ".join(words)
+        others = [" " + word for word in others]
+        ranked = []
+        for doc in dict.fromkeys(candidates.tolist()):
+            doc_words = self._doc_words_of(doc)
+            # ' word' in ' a b c': the query word prefixes a word of the document
+            if not all(word in doc_words for word in others):
+                continue
+            value = str(self.doc_text[doc])
+            inexact = doc_words != text
+            ranked.append((inexact, int(self.doc_kind[doc]), len(value), value, doc))
+        ranked.sort()
+
+        # Rows are only read for the hits returned (and any without rows that are skipped)
+        hits = []
+        for _, kind, _, value, doc in ranked:
+            rows = self.rows(doc)
+            if len(rows):
+                hits.append({'kind': KINDS[kind], 'text': value, 'doc': doc, 'rows': rows})
+                if len(hits) >= limit:
+                    break
+        return hits
+
+    @synchronized
+    def rows(self, doc):
+        """Store rows of a document (tracks of a train, route or station)"""
+        kind = KINDS[self.doc_kind[doc]]
+        ref = int(self.doc_ref[doc])
+        if kind == 'track':
+            return np.array([ref], dtype=np.int64)
+        if kind == 'station':
+            offsets, routes = self._station_routes
+            labels = routes[offsets[ref]:offsets[ref + 1]] if ref + 1 < len(offsets) else routes[:0]
+            labels = np.union1d(labels, np.asarray(self._extra_station_routes.get(ref, []), dtype=np.int64))
+            return self._rows_of_labels('route', labels)
+        return self._rows_of_labels(kind, np.array([ref], dtype=np.int64))
+
+    def _rows_of_labels(self, kind, labels):
+        """Sorted rows holding any of ``labels`` (distinct label ids)"""
+        offsets, rows = self._label_rows[kind]
+        if len(labels) == 1:
+            label = int(labels[0])
+            base = rows[offsets[label]:offsets[label + 1]] if label + 1 < len(offsets) else rows[:0]
+        else:
+            # Labels added since the last fold have no postings yet, only overlay rows
+            base = np.sort(gather_csr(offsets, rows, labels[labels + 1 < len(offsets)]))
+        extra = [row for label in labels.tolist() for row in self._extra_rows[kind].get(label, ())]
+        if extra:
+            base = np.unique(np.concatenate([base, np.asarray(extra, dtype=np.int64)]))
+        # Rows whose value changed since the build (or the overlay entry) no longer belong here
+        label_of = self._label_of[kind][base]
+        return base[label_of == labels[0] if len(labels) == 1 else np.isin(label_of, labels)]
+
+    @synchronized
+    def bounds(self, rows):
+        """``[[south, west], [north, east]]`` around the tracks of ``rows``, or None"""
+        coords = [self.store.route_coords(row) for row in np.asarray(rows)[:2000].tolist()]
+        coords = np.concatenate(coords) if coords else np.empty((0, 2))
+        if len(coords) == 0:
+            return None
+        low, high = coords.min(axis=0), coords.max(axis=0)
+        return [[float(low[0]), float(low[1])], [float(high[0]), float(high[1])]]
+
+
+def hit_label(hit):
+    """One-line description of a hit for result lists"""
+    count = len(hit['rows'])
+    detail = "" if hit['kind'] == 'track' else f" · {count:,} track{'s' if count != 1 else ''}"
+    return f"{KIND_ICONS[hit['kind']]} {hit['text']} ({hit['kind']}{detail})"
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Railway Track Monitoring System - Track Store Snapshots
+Versioned binary snapshots of a TrackStore for warm restarts.  Numeric
+arrays (geometry, categories, numeric columns and string codes) are stored
+raw and 64-byte aligned, so restoring memory-maps them without copying;
+repeated strings are written once per column in a string table.  With
+SNAPSHOT_GEOMETRY = "polyline" the geometry is stored as an encoded polyline
+stream instead, trading the zero-copy restore for a much smaller file.
+
+File layout:
+    8 bytes   magic b"RTMSNAP\\0"
+    4 bytes   format version (little-endian uint32)
+    4 bytes   reserved
+    8 bytes   header length (little-endian uint64)
+    header    UTF-8 JSON: metadata plus name/dtype/shape/offset of each array
+    blocks    array data, each starting on a 64-byte boundary
+
+Usage:
+    python snapshot.py write railway_state.snap 1000000   # synthetic network
+    python snapshot.py info railway_state.snap
+"""
+
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+import threading
+from datetime import datetime
+
+import numpy as np
+
+import config
+import polyline_codec
+from track_store import TrackStore
+
+MAGIC = b"RTMSNAP\0"
+FORMAT_VERSION = 2
+_READABLE_VERSIONS = (1, 2)  # Version 1 files predate the geometry encodings
+GEOMETRY_ENCODINGS = ('float64', 'polyline')
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct("<8sIIQ")
+
+
+class SnapshotError(ValueError):
+    """The file is missing, truncated or written by an incompatible version"""
+
+
+def _intern(values):
+    """Codes into a table of the distinct values, in first-seen order"""
+    table = {}
+    codes = np.fromiter((table.setdefault(value, len(table)) for value in values.tolist()),
+                        dtype=np.int32, count=len(values))
+    return codes, list(table)
+
+
+def _encode_table(table):
+    """Bytes of a string table and their encoding.
+
+    Plain strings are joined with NUL, which decodes several times faster
+    than JSON; tables mixing in numbers or None fall back to JSON.
+    """
+    if all(isinstance(value, str) and "\0" not in value for value in table):
+        return np.frombuffer("\0".join(table).encode("utf-8"), dtype=np.uint8), 'text'
+    return np.frombuffer(json.dumps(table, ensure_ascii=False).encode("utf-8"), dtype=np.uint8), 'json'
+
+
+def _decode_table(data, encoding, size):
+    text = data.tobytes().decode("utf-8")
+    table = (text.split("\0") if size else []) if encoding == 'text' else json.loads(text)
+    values = np.empty(len(table), dtype=object)
+    values[:] = table
+    return values
+
+
+def snapshot_arrays(store, geometry='float64'):
+    """Split a store into raw arrays plus the header entries describing its columns"""
+    arrays = {'coord_offsets': np.ascontiguousarray(store.coord_offsets, dtype=np.int64)}
+    if geometry == 'polyline':
+        data, _ = polyline_codec.encode_stream(store.coord_offsets, store.coords)
+        arrays['coords.polyline'] = np.frombuffer(data, dtype=np.uint8)
+    else:
+        arrays['coords'] = np.ascontiguousarray(store.coords, dtype=np.float64)
+    columns = [{'name': 'track_ids', 'kind': 'table'}]
+    ids, table = _intern(store.track_ids)
+    arrays['track_ids.codes'] = ids
+    arrays['track_ids.table'], columns[0]['encoding'] = _encode_table(table)
+    columns[0]['size'] = len(table)
+
+    # Geometry and ids never change; categories and cells are copied under the lock so
+    # the snapshot is one consistent state while other threads keep updating the store
+    with store.lock:
+        arrays['category'] = np.array(store.category, dtype=np.int8)
+        tables = {}
+        for name, values in store.columns.items():
+            if values is store.track_ids or (name == store.id_column and np.array_equal(values, store.track_ids)):
+                # The id column repeats the track ids, so it shares their table
+                columns.append({'name': name, 'kind': 'ids'})
+            elif values.dtype == object:
+                arrays[f'column.{name}.codes'], tables[name] = store.codes(name)
+                columns.append({'name': name, 'kind': 'table'})
+            else:
+                arrays[f'column.{name}'] = np.array(values, order='C')
+                columns.append({'name': name, 'kind': 'array'})
+
+    for column in columns[1:]:
+        if column['kind'] == 'table':
+            table = tables[column['name']]
+            arrays[f"column.{column['name']}.table"], column['encoding'] = _encode_table(table.tolist())
+            column['size'] = len(table)
+    return arrays, columns
+
+
+def _file_stamp(path):
+    """Modification time and size of a data file, or of the files of a directory (GTFS feeds)"""
+    try:
+        if os.path.isdir(path):
+            stats = [entry.stat() for entry in os.scandir(path) if entry.is_file()]
+        else:
+            stats = [os.stat(path)]
+    except OSError:
+        return {'mtime_ns': None, 'size': None}
+    return {'mtime_ns': max((stat.st_mtime_ns for stat in stats), default=0),
+            'size': sum(stat.st_size for stat in stats)}
+
+
+def network_source(data_path=None, tracks=None, seed=None):
+    """Settings (and data file) a network is loaded from, by default the ones in ``config``.
+
+    Snapshots record it and are only restored for the same source, so
+    changing ``NETWORK_DATA_PATH`` or the synthetic network, or editing the
+    data file, loads the new network instead of the old snapshot.
+    """
+    data_path = config.NETWORK_DATA_PATH if data_path is None else data_path
+    if data_path:
+        # The data file takes precedence over the synthetic network
+        return {'data_path': os.path.realpath(data_path), **_file_stamp(data_path)}
+    tracks = int(config.SYNTHETIC_NETWORK_TRACKS if tracks is None else tracks)
+    seed = config.SYNTHETIC_NETWORK_SEED if seed is None else seed
+    return {'synthetic_tracks': tracks, 'synthetic_seed': int(seed) if tracks else None}
+
+
+def write_snapshot(store, path, metadata=None, geometry=None, source=None):
+    """Write ``store`` to ``path`` atomically; returns the number of bytes written.
+
+    ``source`` is the ``network_source`` the store was loaded from (the
+    current settings by default).
+    """
+    geometry = geometry or config.SNAPSHOT_GEOMETRY
+    if geometry not in GEOMETRY_ENCODINGS:
+        raise ValueError(f"unknown snapshot geometry {geometry!r} (expected one of {GEOMETRY_ENCODINGS})")
+    arrays, columns = snapshot_arrays(store, geometry)
+    header = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'rows': len(store),
+        'id_column': store.id_column,
+        'geometry': geometry,
+        'store_version': store.version,
+        'columns': columns,
+        'metadata': {'source': network_source() if source is None else source, **(metadata or {})},
+        'arrays': {},
+    }
+
+    # Offsets depend on the header length, so lay out the blocks relative to the data start
+    position = 0
+    for name, array in arrays.items():
+        header['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': position}
+        position += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    encoded = json.dumps(header).encode("utf-8")
+    data_start = -(-(_PREAMBLE.size + len(encoded)) // ALIGNMENT) * ALIGNMENT
+
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as handle:
+        handle.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, 0, len(encoded)))
+        handle.write(encoded)
+        handle.write(b"\0" * (data_start - _PREAMBLE.size - len(encoded)))
+        for name, array in arrays.items():
+            handle.write(array.tobytes())
+            handle.write(b"\0" * (-array.nbytes % ALIGNMENT))
+        size = handle.tell()
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temporary, path)
+    return size
+
+
+def read_header(buffer):
+    """Parse the preamble and JSON header; returns (header, data start offset)"""
+    if len(buffer) < _PREAMBLE.size:
+        raise SnapshotError("file is too short to be a snapshot")
+    magic, version, _, header_length = _PREAMBLE.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise SnapshotError("not a track store snapshot")
+    if version not in _READABLE_VERSIONS:
+        raise SnapshotError(f"snapshot format {version} is not supported (expected {FORMAT_VERSION})")
+    header_end = _PREAMBLE.size + header_length
+    if len(buffer) < header_end:
+        raise SnapshotError("snapshot header is truncated")
+    try:
+        header = json.loads(bytes(buffer[_PREAMBLE.size:header_end]).decode("utf-8"))
+    except ValueError as e:
+        raise SnapshotError(f"snapshot header is corrupt: {e}") from e
+    return header, -(-header_end // ALIGNMENT) * ALIGNMENT
+
+
+def read_snapshot(path, source=None):
+    """Restore a TrackStore, memory-mapping its arrays instead of copying them.
+
+    The mapping is copy-on-write: live updates change the restored arrays in
+    memory but never the file.  Only the string tables (and polyline
+    geometry, when the snapshot was written with it) are decoded.  With a
+    ``source``, a snapshot of any other network source is refused.
+    """
+    try:
+        with open(path, "rb") as handle:
+            buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_COPY)
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"cannot open snapshot {path}: {e}") from e
+
+    header, data_start = read_header(buffer)
+    if source is not None and header['metadata'].get('source') != source:
+        raise SnapshotError("written for a different network source")
+
+    def array(name):
+        spec = header['arrays'][name]
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        offset = data_start + spec['offset']
+        if offset + count * dtype.itemsize > len(buffer):
+            raise SnapshotError(f"array {name} is truncated")
+        return np.frombuffer(buffer, dtype=dtype, count=count, offset=offset).reshape(spec['shape'])
+
+    def strings(prefix, column):
+        table = _decode_table(array(f'{prefix}.table'), column['encoding'], column['size'])
+        return table[array(f'{prefix}.codes')]
+
+    track_ids = strings('track_ids', header['columns'][0])
+    columns = {}
+    for column in header['columns'][1:]:
+        name = column['name']
+        if column['kind'] == 'ids':
+            columns[name] = track_ids.copy()  # kept separate so cell edits never touch the ids
+        elif column['kind'] == 'table':
+            columns[name] = strings(f'column.{name}', column)
+        else:
+            columns[name] = array(f'column.{name}')
+
+    coord_offsets = array('coord_offsets')
+    if header.get('geometry', 'float64') == 'polyline':
+        try:
+            coords = polyline_codec.decode_stream(array('coords.polyline'), coord_offsets)
+        except (IndexError, ValueError) as e:
+            raise SnapshotError(f"polyline geometry is corrupt: {e}") from e
+        if len(coords) != coord_offsets[-1]:
+            raise SnapshotError("polyline geometry does not match the track offsets")
+    else:
+        coords = array('coords')
+
+    store = TrackStore.from_columns(track_ids, array('category'), columns,
+                                    coord_offsets, coords, id_column=header['id_column'],
+                                    intern=False)  # decoded through the string tables, so already shared
+    store.snapshot_metadata = header['metadata']
+    store.snapshot_geometry = header.get('geometry', 'float64')
+    return store
+
+
+def restore_store(path):
+    """Restored store, or None when there is no usable snapshot of the configured network (cold start)"""
+    if not os.path.exists(path):
+        return None
+    try:
+        return read_snapshot(path, network_source())
+    except SnapshotError as e:
+        print(f"⚠️  Ignoring snapshot {path}: {e}")
+        return None
+
+
+class SnapshotWriter:
+    """Writes snapshots of a store in the background, at most one at a time.
+
+    ``store_source`` returns the store to write, so apps that keep their
+    tracks as dictionaries can build the store only when a snapshot is due.
+    """
+
+    def __init__(self, store_source, path, interval=None):
+        self.store_source = store_source
+        self.path = path
+        self.interval = config.SNAPSHOT_INTERVAL_S if interval is None else interval
+        self.last_written = time.monotonic()
+        self._lock = threading.Lock()
+
+    def due(self):
+        return self.interval > 0 and time.monotonic() - self.last_written >= self.interval
+
+    def write(self):
+        """Write a snapshot now (blocking); skipped if another write is running"""
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            write_snapshot(self.store_source(), self.path)
+            self.last_written = time.monotonic()
+            return True
+        except OSError as e:
+            print(f"⚠️  Snapshot not written to {self.path}: {e}")
+            return False
+        finally:
+            self._lock.release()
+
+    def write_in_background(self):
+        threading.Thread(target=self.write, daemon=True).start()
+
+    def maybe_write(self):
+        """Start a background write when the interval has passed"""
+        if self.due():
+            self.last_written = time.monotonic()
+            self.write_in_background()
+
+
+def snapshot_path(schema):
+    """Snapshot file of one application (the apps use different column names)"""
+    root, extension = os.path.splitext(config.SNAPSHOT_PATH)
+    return f"{root}_{schema}{extension}"
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "info"
+    path = sys.argv[2] if len(sys.argv) > 2 else snapshot_path('tkinter')
+
+    if command == "write":
+        from network_generator import generate_network
+        tracks = int(sys.argv[3]) if len(sys.argv) > 3 else 100000
+        store = generate_network(tracks, seed=config.SYNTHETIC_NETWORK_SEED)
+        started = time.perf_counter()
+        size = write_snapshot(store, path, source=network_source('', tracks))
+        print(f"💾 Wrote {len(store):,} tracks ({size / 1e6:.1f} MB) to {path} "
+              f"in {time.perf_counter() - started:.2f}s")
+    elif command == "info":
+        started = time.perf_counter()
+        store = read_snapshot(path)
+        elapsed = time.perf_counter() - started
+        print(f"📂 {path}: {len(store):,} tracks, {len(store.coords):,} vertices "
+              f"({store.snapshot_geometry}), "
+              f"{len(store.columns)} columns, restored in {elapsed * 1000:.0f} ms")
+    else:
+        print("Usage: python snapshot.py [write|info] [path] [tracks]")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Railway Track Monitoring System - Fast Start Helpers
+Dependency probes that do not import anything, modules that are imported
+on first use, and a startup timing report for the entry points.
+
+Set ``RAILWAY_STARTUP_TIMING=1`` (or run ``run_application.py --timing``)
+to print the report.
+"""
+
+import os
+import sys
+import time
+import importlib
+import importlib.util
+
+STARTED = time.perf_counter()
+TIMING_ENV = "RAILWAY_STARTUP_TIMING"
+
+_marks = []
+_imports = []
+
+
+def module_available(name):
+    """True when ``name`` can be imported, without importing it"""
+    if name in sys.modules:
+        return True
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        # find_spec imports parent packages, which may themselves be missing
+        return False
+
+
+def timed_import(name):
+    """Import a module, recording how long it took for the startup report"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    started = time.perf_counter()
+    # Imported here so probing and timing stay free of the metrics module
+    from instrumentation import span
+    with span(f"import.{name}"):
+        module = importlib.import_module(name)
+    _imports.append((name, (time.perf_counter() - started) * 1000))
+    return module
+
+
+class LazyModule:
+    """Stand-in for a module that imports it on first attribute access.
+
+    ``submodules`` are imported along with the module, for code that uses
+    e.g. ``folium.plugins`` without importing it explicitly.
+    """
+
+    def __init__(self, name, submodules=()):
+        self.__dict__['_name'] = name
+        self.__dict__['_submodules'] = tuple(submodules)
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            module = timed_import(self._name)
+            for submodule in self._submodules:
+                timed_import(f"{self._name}.{submodule}")
+            self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__['_module'] is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name, submodules=()):
+    """Module ``name`` if already imported, otherwise a :class:`LazyModule`"""
+    if name in sys.modules and not submodules:
+        return sys.modules[name]
+    return LazyModule(name, submodules)
+
+
+def mark(phase):
+    """Record the first time a startup phase finished (later calls are ignored)"""
+    if all(name != phase for name, _ in _marks):
+        _marks.append((phase, (time.perf_counter() - STARTED) * 1000))
+
+
+def timing_enabled():
+    return os.environ.get(TIMING_ENV, "") not in ("", "0")
+
+
+def startup_report(title="Startup"):
+    """Timing report of the phases and first-use imports so far"""
+    lines = [f"⏱️  {title} timing"]
+    previous = 0.0
+    for phase, elapsed in _marks:
+        lines.append(f"   {phase:<28} {elapsed:>9.1f} ms  (+{elapsed - previous:.1f} ms)")
+        previous = elapsed
+    for name, elapsed in _imports:
+        lines.append(f"   import {name:<21} {elapsed:>9.1f} ms")
+    return "\n".join(lines)
+
+
+_reported = set()
+
+
+def print_startup_report(title="Startup"):
+    """Print the report once per process when startup timing is enabled"""
+    if timing_enabled() and title not in _reported:
+        _reported.add(title)
+        print(startup_report(title), flush=True)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Railway Track Monitoring System - Streamlit Table Views
+DataFrames of each track category built straight from the columnar store
+and cached until the store's data version changes.  Repeated text becomes
+pandas categoricals built from the store's interned codes, and display
+strings with a unit ('110 km/h', '45 min') become numbers that Streamlit
+formats through ``column_config``, so a rerun runs no per-row Python.
+
+Large categories are shown a page at a time: sorting goes through the
+store's cached argsort of each column and filtering through boolean masks
+over its interned codes, and only the visible page becomes a DataFrame.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+import streamlit as st
+
+from startup import lazy_import
+from instrumentation import cache_event
+from track_store import parse_quantity, synchronized
+from network_generator import SCHEMAS, record_fields
+
+pd = lazy_import("pandas")
+
+# Canonical fields shown as numbers, with their display format (text such as
+# '110 km/h' is parsed once per distinct value)
+NUMBER_FORMATS = {
+    'speed': "%d km/h",
+    'location': "Kilometer %d",
+    'trains_count': "%d",
+    'delay': "%d min",
+    'capacity': "%d%%",
+}
+
+VIEW_CACHE_SIZE = 32  # Sorted/filtered row orders kept across reruns and sessions
+
+
+class TableViews:
+    """Cached per-category DataFrames and column configs of one store"""
+
+    def __init__(self, store, schema='streamlit'):
+        self.store = store
+        self.fields = record_fields(schema)
+        names = SCHEMAS[schema]
+        self.number_formats = {names[field]: number_format for field, number_format in NUMBER_FORMATS.items()}
+        self._frames = {}  # category -> (version, frame, column config)
+        self._derived = {}  # name -> (version, frame)
+        self._views = OrderedDict()  # (version, category, sort, descending, filter) -> rows
+
+    def _column(self, name, rows):
+        """One display column: numbers, a categorical, or plain values"""
+        values = self.store.columns[name]
+        if values.dtype != object:
+            return values[rows], 'number'
+        codes, labels = self.store.codes(name)
+        used, local = np.unique(codes[rows], return_inverse=True)
+        shown = labels[used]
+
+        # Each distinct value is parsed once; a column is numeric only if all of them are
+        if name in self.number_formats:
+            numbers = [parse_quantity(label) for label in shown.tolist()]
+            if all(number is not None for number in numbers):
+                return np.array(numbers, dtype=np.float64)[local], 'number'
+
+        # Categoricals pay off for repeated text, not for ids and other unique values
+        if 2 * len(used) <= len(rows) and not pd.isna(shown).any():
+            return pd.Categorical.from_codes(local, categories=pd.Index(shown, dtype=object)), 'text'
+        return values[rows], 'text'
+
+    def _build(self, category):
+        rows = self.store.rows(category)
+        data, config = {}, {}
+        for name in self.fields[category]:
+            if name not in self.store.columns:
+                continue
+            data[name], kind = self._column(name, rows)
+            if kind == 'number':
+                config[name] = st.column_config.NumberColumn(name, format=self.number_formats.get(name, "%d"))
+            else:
+                config[name] = st.column_config.TextColumn(name)
+        return pd.DataFrame(data, copy=False), config
+
+    def _entry(self, category):
+        entry = self._frames.get(category)
+        cache_event("table_views.frame", entry is not None and entry[0] == self.store.version)
+        if entry is None or entry[0] != self.store.version:
+            entry = (self.store.version, *self._build(category))
+            self._frames[category] = entry
+        return entry
+
+    @synchronized
+    def frame(self, category):
+        """DataFrame of a category's tracks; treat it as read-only, it is shared"""
+        return self._entry(category)[1]
+
+    @synchronized
+    def column_config(self, category, hidden=(), widths=None, renamed=None):
+        """``st.dataframe`` column config of a category's frame.
+
+        ``hidden`` columns are left out of the table, ``widths`` maps column
+        names to Streamlit widths and ``renamed`` maps the column names of a
+        derived table to the frame columns whose formatting they share.
+        """
+        base = self._entry(category)[2]
+        config = dict(base)
+        for name, width in (widths or {}).items():
+            if name in config:
+                config[name] = {**config[name], 'width': width}
+        for name, source in (renamed or {}).items():
+            if source in base:
+                config[name] = {**base[source], 'label': name}
+        config.update({name: None for name in hidden if name in config})
+        return config
+
+    @synchronized
+    def derived(self, name, category, build):
+        """``build(frame)`` of a category, cached under ``name`` for the same data version"""
+        entry = self._derived.get(name)
+        cache_event("table_views.derived", entry is not None and entry[0] == self.store.version)
+        if entry is None or entry[0] != self.store.version:
+            entry = (self.store.version, build(self.frame(category)))
+            self._derived[name] = entry
+        return entry[1]
+
+    @synchronized
+    def view_rows(self, category, sort=None, descending=False, text="", fields=None):
+        """Store rows of a category in display order, filtered by ``text`` in ``fields``.
+
+        Recent views are cached, so paging through one costs a slice per rerun.
+        """
+        text = text.strip()
+        key = (self.store.version, category, sort, descending, text, tuple(fields or ()))
+        rows = self._views.get(key)
+        cache_event("table_views.view_rows", rows is not None)
+        if rows is None:
+            rows = self.store.rows(category)
+            if sort:
+                rows = self.store.sorted_rows(rows, sort, descending)
+            if text:
+                rows = rows[self.store.match(rows, text, fields or self.fields[category])]
+            self._views[key] = rows
+            while len(self._views) > VIEW_CACHE_SIZE:
+                self._views.popitem(last=False)
+        return rows
+
+    @synchronized
+    def page(self, category, rows, start, size):
+        """DataFrame of ``rows[start:start + size]``, indexed by position in the view"""
+        selected = rows[start:start + size]
+        positions = np.searchsorted(self.store.rows(category), selected)
+        frame = self.frame(category).iloc[positions]
+        frame.index = np.arange(start, start + len(selected))
+        return frame
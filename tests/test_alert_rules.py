@@ -0,0 +1,133 @@
+import numpy as np
+import pytest
+
+import config
+from network_generator import generate_network
+from alert_rules import AlertEngine, Family, compile_rule
+
+T0 = 1_000_000.0
+
+
+@pytest.fixture
+def store():
+    return generate_network(60, seed=2, schema='tkinter')
+
+
+def free_row(store):
+    """A track without speed or delay readings, so only the samples of a test count"""
+    return int(store.rows('free_tracks')[0])
+
+
+def raised(engine, notifications):
+    return sorted(engine.rules[rule]['name'] for rule in notifications['rule'].tolist())
+
+
+def feed(engine, row, field, values, start, step=60.0):
+    """Ingest one sample per value, ``step`` seconds apart; returns the names raised by each"""
+    return [raised(engine, engine.ingest([row], {field: [value]}, start + step * index))
+            for index, value in enumerate(values)]
+
+
+def test_sustained_delay_is_raised_once_and_resolved(store):
+    engine = AlertEngine(store, schema='tkinter', now=T0)
+    row = free_row(store)
+
+    assert feed(engine, row, 'delay', [40, 40, 40, 40], T0 + 60) == [
+        [], ["Rising delay"], ["Sustained delay"], []]
+    assert {alert['rule'] for alert in engine.alerts() if alert['row'] == row} == {"Rising delay", "Sustained delay"}
+
+    assert feed(engine, row, 'delay', [10], T0 + 600) == [[]]
+    assert not [alert for alert in engine.alerts() if alert['row'] == row]
+    resolved = [entry for entry in engine.log if entry['row'] == row and entry['resolved']]
+    assert sorted(entry['rule'] for entry in resolved) == ["Rising delay", "Sustained delay"]
+    assert all(entry['value'] == 10 for entry in resolved)
+
+
+def test_suppressed_rules_stay_quiet_but_stricter_ones_notify(store):
+    rules = [("Late", "delay > 15 min for 2 samples", "medium"),
+             ("Very late", "delay > 30 min for 2 samples", "high")]
+    engine = AlertEngine(store, schema='tkinter', rules=rules, now=T0)
+    assert len(engine.families) == 1
+    row = free_row(store)
+
+    assert feed(engine, row, 'delay', [20, 20, 0], T0 + 60) == [[], ["Late"], []]
+    # Crossing "Late" again within the suppression window is not notified...
+    assert feed(engine, row, 'delay', [20, 20], T0 + 300) == [[], []]
+    assert len(engine) == 1
+    # ...while the stricter rule of the family is
+    assert feed(engine, row, 'delay', [40, 40], T0 + 420) == [[], ["Very late"]]
+
+    # Once the window has passed, crossing again notifies
+    later = T0 + 420 + config.ALERT_SUPPRESS_S + 60
+    assert feed(engine, row, 'delay', [0, 20, 20], later) == [[], [], ["Late"]]
+
+
+def test_sudden_slowdown(store):
+    engine = AlertEngine(store, schema='tkinter', now=T0)
+    row = free_row(store)
+    assert feed(engine, row, 'speed', [100, 98, 50], T0 + 60) == [[], [], ["Sudden slowdown"]]
+    # A drop spread over more than the window is no sudden slowdown
+    other = int(store.rows('free_tracks')[1])
+    assert feed(engine, other, 'speed', [100, 50], T0 + 60, step=6 * 60) == [[], []]
+
+
+def test_tick_raises_both_overdue_rules(store):
+    row = int(store.rows('blocked_tracks')[0])
+    store.set_values([row], {'estimated_clearance': ['30 min']})
+    engine = AlertEngine(store, schema='tkinter', now=T0)
+
+    def overdue(now):
+        notified = engine.tick(now)
+        mine = notified['row'] == row
+        return raised(engine, {'rule': notified['rule'][mine]}), notified['value'][mine]
+
+    assert overdue(T0 + 29 * 60)[0] == []
+    assert overdue(T0 + 31 * 60)[0] == ["Blocked past ETA"]
+    names, values = overdue(T0 + 61 * 60)
+    assert names == ["Clearance overrun"] and values[0] == pytest.approx(31.0)
+    # Both rules are met; the track is listed once, under the more severe
+    assert [alert['rule'] for alert in engine.alerts() if alert['row'] == row] == ["Clearance overrun"]
+
+    # Clearing the track resolves both
+    store.set_category([row], 'free_tracks')
+    assert not [alert for alert in engine.alerts() if alert['row'] == row]
+    assert sorted(entry['rule'] for entry in engine.log if entry['row'] == row and entry['resolved']) == [
+        "Blocked past ETA", "Clearance overrun"]
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_family_counts_and_notifications_match_each_rule_evaluated_alone(seed):
+    rng = np.random.default_rng(seed)
+    size, count = 200, 2000
+    thresholds = np.round(rng.uniform(0, 100, count), 1)
+    rules = [(rule_id, float(threshold), bool(rng.random() < 0.5))
+             for rule_id, threshold in enumerate(thresholds)]
+    family = Family(('min', 'delay', 1), rules, size, np.zeros(count, dtype=np.int64))
+    met = np.zeros((size, count), dtype=bool)
+
+    for step in range(6):
+        rows = np.unique(rng.integers(0, size, 120))
+        statistic = np.round(rng.uniform(-10, 110, len(rows)), 1)
+        statistic[rng.random(len(rows)) < 0.1] = np.nan
+        (notified_rows, notified_rules), (resolved_rows, resolved_rules) = family.update(
+            rows, statistic, T0 + step, suppress=0)
+
+        now_met = np.array([[value > threshold or (inclusive and value == threshold)
+                             for _, threshold, inclusive in rules] for value in statistic])
+        now_met[np.isnan(statistic)] = False
+        newly = {(row, rule) for row, flags in zip(rows.tolist(), now_met & ~met[rows])
+                 for rule in np.flatnonzero(flags).tolist()}
+        gone = {(row, rule) for row, flags in zip(rows.tolist(), met[rows] & ~now_met)
+                for rule in np.flatnonzero(flags).tolist()}
+        met[rows] = now_met
+
+        assert set(zip(notified_rows.tolist(), notified_rules.tolist())) == newly
+        assert len(notified_rows) == len(newly)
+        assert set(zip(resolved_rows.tolist(), resolved_rules.tolist())) == gone
+        np.testing.assert_array_equal(family.satisfied[rows], now_met.sum(axis=1))
+
+
+def test_compile_rule_rejects_unknown_expressions():
+    assert compile_rule("speed < 40 km/h for 3 samples") == (('max', 'speed', 3), -40.0, False)
+    with pytest.raises(ValueError):
+        compile_rule("delay is bad")
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+import config
+from network_generator import generate_network
+from operations_simulator import TelemetryStream, store_trains
+from anomaly_detector import AnomalyDetector
+
+SPEED = 1  # Flag bit of the speed field
+
+
+@pytest.fixture
+def store():
+    return generate_network(1000, seed=4, schema='tkinter')
+
+
+def ingest(detector, batch):
+    return detector.ingest(batch['train'], {'speed': batch['speed_kmh'], 'delay': batch['delay_min']},
+                           rows=batch['track_row'])
+
+
+def test_injected_drops_are_flagged_and_steady_trains_are_not(store):
+    detector = AnomalyDetector(store, schema='tkinter')
+    stream = TelemetryStream(store, store_trains(store), seed=4, anomaly_rate=0.002)
+    previous = stream.speed.copy()
+    ever_dropped = np.zeros(len(store), dtype=bool)
+    caught = drops = false_flags = steady = 0
+
+    for step in range(200):
+        batch = stream.next_batch(5.0)
+        # The stream cuts speeds to 20-50%; its own noise never comes close
+        dropped = batch['speed_kmh'] < 0.6 * previous
+        flags = ingest(detector, batch)
+        if step >= config.ANOMALY_WARMUP_SAMPLES:
+            caught += np.count_nonzero(flags[dropped] & SPEED)
+            drops += np.count_nonzero(dropped)
+        ever_dropped |= dropped
+        previous = batch['speed_kmh']
+        if step >= 2 * config.ANOMALY_WARMUP_SAMPLES:
+            false_flags += np.count_nonzero(flags[~ever_dropped])
+            steady += np.count_nonzero(~ever_dropped)
+
+    assert drops > 100
+    assert caught >= 0.99 * drops
+    assert false_flags <= 0.001 * steady
+
+
+def test_flags_clear_on_a_normal_sample(store):
+    detector = AnomalyDetector(store, schema='tkinter')
+    train = int(store.rows('live_tracks')[0])
+    for speed in [100, 101, 99, 100, 102, 98, 100]:
+        detector.ingest([train], {'speed': [speed]})
+    assert detector.ingest([train], {'speed': [30]})[0] == SPEED
+    assert store.columns['anomaly'][train] == 'Speed'
+    assert train in detector.flagged().tolist()
+
+    assert detector.ingest([train], {'speed': [100]})[0] == 0
+    assert store.columns['anomaly'][train] == ''
+    # A sample of another field leaves the speed flag alone
+    detector.ingest([train], {'speed': [30]})
+    assert detector.ingest([train], {'delay': [0]})[0] == SPEED
+
+
+@pytest.mark.parametrize('change', ['category', 'train'])
+def test_a_new_train_on_a_track_starts_over(store, change):
+    detector = AnomalyDetector(store, schema='tkinter')
+    row = int(store.rows('live_tracks')[0])
+    for speed in [100, 101, 99, 100, 102, 98, 100, 30]:
+        store.set_values([row], {'speed': [f"{speed} km/h"]})
+    assert detector.flags[row] == SPEED and detector.samples[0, row] > 0
+
+    if change == 'category':
+        store.set_category([row], 'congested_tracks')
+    else:
+        store.set_values([row], {'train': ['Another Express']})
+
+    assert detector.flags[row] == 0 and store.columns['anomaly'][row] == ''
+    assert (detector.samples[:, row] == 0).all() and (detector.mean[:, row] == 0).all()
+    # Speeds of the previous train do not judge the next one
+    assert detector.ingest([row], {'speed': [30]})[0] == 0
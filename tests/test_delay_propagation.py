@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+import config
+from network_generator import generate_network
+from delay_propagation import DelayPropagation, Grouping, propagate
+
+
+def naive_fixed_point(groupings, primary):
+    """Delays settled by sweeping every track until nothing moves"""
+    delay = primary.copy()
+    members = [[np.flatnonzero((grouping.membership == group).any(axis=1)) for group in range(grouping.size)]
+               for grouping in groupings]
+    for _ in range(1000):
+        inherited = np.zeros(len(delay))
+        for grouping, groups in zip(groupings, members):
+            for group in groups:
+                for row in group.tolist():
+                    others = delay[group[group != row]]
+                    if len(others):
+                        inherited[row] = max(inherited[row], grouping.share * others.max())
+        settled = np.maximum(primary, inherited - config.DELAY_RECOVERY_MIN)
+        if np.abs(settled - delay).max() < 1e-9:
+            return settled
+        delay = settled
+    raise AssertionError("no fixed point")
+
+
+def random_groupings(rng, tracks):
+    stations = Grouping(rng.integers(-1, 12, (tracks, 2)), config.DELAY_CONNECTION_SHARE)
+    corridors = Grouping(rng.integers(-1, 20, (tracks, 1)), config.DELAY_CORRIDOR_SHARE)
+    return [stations, corridors]
+
+
+# Every hop stops below TOLERANCE_MIN, which can add up over a chain of hops
+ATOL = 0.1
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_propagate_matches_the_naive_fixed_point(seed):
+    rng = np.random.default_rng(seed)
+    groupings = random_groupings(rng, 60)
+    primary = np.where(rng.random(60) < 0.3, rng.uniform(0, 90, 60), 0.0)
+    delay = primary.copy()
+    state = [grouping.maxima(delay) for grouping in groupings]
+
+    propagate(groupings, primary, delay, state, np.arange(60))
+    np.testing.assert_allclose(delay, naive_fixed_point(groupings, primary), atol=ATOL)
+
+    # Raise some delays, then clear others: the incremental update settles in both directions
+    for rows, values in ((rng.choice(60, 5, replace=False), rng.uniform(30, 120, 5)),
+                         (np.flatnonzero(primary > 0)[:6], 0.0)):
+        primary[rows] = values
+        changed = propagate(groupings, primary, delay, state, rows)
+        expected = naive_fixed_point(groupings, primary)
+        np.testing.assert_allclose(delay, expected, atol=ATOL)
+        for grouping, group_state in zip(groupings, state):
+            np.testing.assert_allclose(group_state[0], grouping.maxima(delay)[0])
+        assert set(changed.tolist()) <= set(range(60))
+
+
+def test_store_model_and_what_if_match_the_naive_fixed_point():
+    store = generate_network(300, seed=3, schema='tkinter')
+    model = DelayPropagation(store, schema='tkinter')
+    np.testing.assert_allclose(model.delay, naive_fixed_point(model.groupings, model.primary), atol=ATOL)
+
+    row = int(np.argmax(model.primary))
+    extra = model.what_if({row: 45.0})
+    primary = model.primary.copy()
+    primary[row] += 45.0
+    np.testing.assert_allclose(extra, naive_fixed_point(model.groupings, primary) - model.delay, atol=ATOL)
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from event_scheduler import TimingWheel
+
+
+def fire_times(wheel, until, step=1):
+    """Advance ``wheel`` to ``until`` in steps; returns {row: tick of the advance that fired it}"""
+    fired = {}
+    for tick in range(wheel.tick + step, until + step, step):
+        _, rows, _, _ = wheel.advance(min(tick, until))
+        for row in rows.tolist():
+            assert row not in fired, f"row {row} fired twice"
+            fired[row] = min(tick, until)
+    return fired
+
+
+@pytest.mark.parametrize('step', [1, 7, 64])
+def test_events_cascade_down_the_levels_and_fire_on_time(step):
+    wheel = TimingWheel(0, slot_bits=3, levels=3)
+    rng = np.random.default_rng(1)
+    due = np.concatenate([[1, 7, 8, 9, 63, 64, 65, 511], rng.integers(1, 512, 300)])
+    wheel.schedule(due, 0, np.arange(len(due)), np.zeros(len(due), dtype=np.int64))
+
+    fired = fire_times(wheel, 520, step)
+
+    assert len(fired) == len(due) and len(wheel) == 0
+    for row, at in fired.items():
+        # Fired by the first advance reaching its due tick
+        assert due[row] <= at < due[row] + step
+
+
+def test_events_beyond_the_top_level_wait_in_the_overflow():
+    wheel = TimingWheel(5, slot_bits=2, levels=2)  # The levels cover the current turn of 16 ticks
+    due = np.array([6, 21, 100, 1000])
+    wheel.schedule(due, 1, np.arange(4), np.arange(4) * 10)
+    assert sum(map(len, wheel._overflow)) == 3
+
+    fired = fire_times(wheel, 1000)
+    assert fired == {0: 6, 1: 21, 2: 100, 3: 1000}
+
+
+def test_advance_returns_events_in_due_order_with_their_fields():
+    wheel = TimingWheel(0)
+    wheel.schedule(np.array([30, 10, 20]), 2, np.array([3, 1, 2]), np.array([33, 11, 22]))
+    kind, rows, stamps, due = wheel.advance(100)
+    assert rows.tolist() == [1, 2, 3]
+    assert stamps.tolist() == [11, 22, 33]
+    assert due.tolist() == [10, 20, 30]
+    assert kind.tolist() == [2, 2, 2]
+
+
+def test_overdue_events_fire_on_the_next_advance():
+    wheel = TimingWheel(50)
+    wheel.schedule(np.array([10, 50]), 0, np.array([1, 2]), np.zeros(2, dtype=np.int64))
+    _, rows, _, _ = wheel.advance(50)
+    assert sorted(rows.tolist()) == [1, 2]
+
+
+def test_fired_event_ids_are_reused():
+    wheel = TimingWheel(0, slot_bits=4, levels=2)
+    wheel.schedule(np.arange(1, 101), 0, np.arange(100), np.zeros(100, dtype=np.int64))
+    wheel.advance(100)
+    used = wheel._used
+
+    for round_ in range(1, 4):
+        start = 100 * round_
+        wheel.schedule(np.arange(start + 1, start + 101), round_, np.arange(100) + 1000 * round_,
+                       np.full(100, round_))
+        kind, rows, stamps, due = wheel.advance(start + 100)
+        # The recycled ids carry the new events, not the fired ones
+        assert rows.tolist() == (np.arange(100) + 1000 * round_).tolist()
+        assert set(kind.tolist()) == {round_} and set(stamps.tolist()) == {round_}
+        assert due.tolist() == list(range(start + 1, start + 101))
+    assert wheel._used == used
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from network_generator import generate_network
+from operations_simulator import generate_timetable
+from impact_index import ImpactIndex
+from delay_propagation import station_ids
+
+
+@pytest.fixture
+def index():
+    store = generate_network(400, seed=7, schema='tkinter')
+    timetable = generate_timetable(store, n_services=150, max_legs=4, train_column='train')
+    return ImpactIndex(store, timetable, schema='tkinter')
+
+
+def naive_affected(index, rows):
+    """Live leg ids over ``rows``, by scanning every leg"""
+    legs = np.arange(index._size)
+    return set(legs[index._alive[legs] & np.isin(index._legs['row'][legs], rows)].tolist())
+
+
+def busiest_service(index):
+    return int(np.bincount(index._legs['service'][:index._size]).argmax())
+
+
+def test_set_path_replaces_the_legs_of_a_service(index):
+    service = busiest_service(index)
+    old_rows = index._legs['row'][index.legs_of(service)].copy()
+    new_row = int(np.setdiff1d(np.arange(len(index.store)), old_rows)[0])
+    planned = len(index)
+
+    index.set_path(service, [new_row], [3, 4], [600.0], [630.0])
+
+    assert set(index.affected(old_rows)['leg'].tolist()) == naive_affected(index, old_rows)
+    hit = index.affected([new_row])
+    assert service in hit['service'].tolist()
+    leg = hit['leg'][hit['service'] == service][0]
+    assert (index._legs['from'][leg], index._legs['to'][leg]) == (3, 4)
+    assert (index._legs['start'][leg], index._legs['end'][leg]) == (600.0, 630.0)
+    assert index.legs_of(service).tolist() == [leg]
+    assert len(index) == planned - len(old_rows) + 1
+    # Legs of the tail are only found when they run in the window asked for
+    assert service in index.affected([new_row], 610, 620)['service'].tolist()
+    assert service not in index.affected([new_row], 700, 720)['service'].tolist()
+
+
+def test_tail_is_searched_and_folded_into_the_postings(index):
+    rows = np.arange(len(index.store))
+    services = np.unique(index._legs['service'][:index._size])
+    built_tail = index._tail
+
+    rebuilt = False
+    for _ in range(20):
+        for service in services.tolist():
+            index.retime(service, 1)
+            if index._tail != built_tail:
+                rebuilt = True
+                break
+        assert set(index.affected(rows)['leg'].tolist()) == naive_affected(index, rows)
+        if rebuilt:
+            break
+
+    assert rebuilt
+    assert index._tail == index._size  # The rebuild took in every leg
+    assert set(index.affected(rows)['leg'].tolist()) == naive_affected(index, rows)
+    for row in rows[:50].tolist():
+        assert set(index.affected([row])['leg'].tolist()) == naive_affected(index, [row])
+
+
+def test_departures_run_services_until_the_track_is_freed(index):
+    store = index.store
+    free = store.rows('free_tracks')
+    row = int(free[(station_ids(store.coord_offsets, store.coords)[free] >= 0).all(axis=1)][0])
+    store.set_values([row], {'train': ['Test Departure']})
+    store.set_category([row], 'live_tracks')
+
+    hit = index.affected([row])
+    assert 'Test Departure' in index.names[hit['service']].tolist()
+
+    store.set_category([row], 'free_tracks')
+    assert 'Test Departure' not in index.names[index.affected([row])['service']].tolist()
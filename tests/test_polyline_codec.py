@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+import polyline_codec
+from polyline_codec import encode, decode, encode_tracks, encode_stream, decode_stream, PRECISION
+
+
+def random_tracks(rng, lengths):
+    """``(coord_offsets, coords)`` of tracks with ``lengths`` vertices, on both sides of the equator and meridian"""
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    coords = np.column_stack([rng.uniform(-85, 85, offsets[-1]), rng.uniform(-180, 180, offsets[-1])])
+    # Tracks wander in small steps, as real geometry does, with a few long jumps
+    coords[1:] = np.where(rng.random((offsets[-1] - 1, 1)) < 0.9,
+                          coords[:-1] + rng.normal(0, 0.01, (offsets[-1] - 1, 2)), coords[1:])
+    return offsets, coords
+
+
+def rounded(coords):
+    return np.round(np.asarray(coords) * PRECISION) / PRECISION
+
+
+def test_encode_matches_the_google_reference():
+    points = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+    assert encode(points) == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+    np.testing.assert_allclose(decode("_p~iF~ps|U_ulLnnqC_mqNvxq`@"), points)
+
+
+@pytest.mark.parametrize('block', [None, 7, 64])
+def test_stream_round_trip_with_single_vertex_and_empty_tracks(monkeypatch, block):
+    if block:
+        # Tiny blocks put a cut inside almost every track
+        monkeypatch.setattr(polyline_codec, '_BLOCK', block)
+    rng = np.random.default_rng(block or 0)
+    lengths = rng.integers(0, 12, 300)
+    lengths[:4] = [1, 0, 1, 0]
+    lengths[-1] = 0
+    offsets, coords = random_tracks(rng, lengths)
+
+    data, char_offsets = encode_stream(offsets, coords)
+    assert len(char_offsets) == len(offsets) and char_offsets[-1] == len(data)
+    np.testing.assert_allclose(decode_stream(data, offsets), rounded(coords), rtol=0, atol=1e-9)
+
+    strings = encode_tracks(offsets, coords)
+    assert strings[1] == "" and strings[-1] == ""
+    for row in (0, 2, 5, 150):
+        track = coords[offsets[row]:offsets[row + 1]]
+        assert strings[row] == encode(track)
+        np.testing.assert_allclose(decode(strings[row]).reshape(-1, 2), rounded(track), rtol=0, atol=1e-9)
+    rows = np.array([150, 0, 1, 5])
+    assert encode_tracks(offsets, coords, rows) == [strings[row] for row in rows.tolist()]
+
+
+def test_stream_longer_than_a_block_round_trips():
+    rng = np.random.default_rng(1)
+    offsets, coords = random_tracks(rng, rng.integers(1, 40, 30_000))
+    assert 2 * len(coords) > polyline_codec._BLOCK
+
+    data, _ = encode_stream(offsets, coords)
+    assert len(data) > polyline_codec._BLOCK
+    np.testing.assert_allclose(decode_stream(data, offsets), rounded(coords), rtol=0, atol=1e-9)
+
+
+def test_empty_stream():
+    assert encode_stream(np.zeros(3, dtype=np.int64), np.empty((0, 2)))[0] == b""
+    assert decode_stream(b"", np.zeros(3, dtype=np.int64)).shape == (0, 2)
+    assert encode([]) == ""
@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+
+from network_generator import generate_network
+from search_index import SearchIndex, edit_distance
+from track_store import TrackStore
+
+TRACKS = {
+    'live_tracks': [
+        {'track_id': 'T001', 'route': 'Delhi-Mumbai', 'train': 'Rajdhani Express'},
+        {'track_id': 'T002', 'route': 'Chennai-Kolkata', 'train': 'Coromandel Express'},
+        {'track_id': 'T003', 'route': 'Bangalore-Delhi', 'train': 'Karnataka Express'},
+        {'track_id': 'T0010', 'route': 'Pune-Nashik', 'train': 'Pune Express'},
+    ],
+    'congested_tracks': [
+        {'track_id': 'T004', 'route': 'Mumbai-Pune', 'train': ''},
+    ],
+    'blocked_tracks': [
+        {'track_id': 'T008', 'route': 'Hyderabad-Vijayawada', 'train': ''},
+    ],
+    'free_tracks': [
+        {'track_id': 'T020', 'route': 'Lucknow-Kanpur', 'train': ''},
+    ],
+}
+
+
+@pytest.fixture
+def store():
+    return TrackStore.from_tracks_data(TRACKS)
+
+
+@pytest.fixture
+def index(store):
+    return SearchIndex(store)
+
+
+def row_of(store, track_id):
+    return store.track_ids.tolist().index(track_id)
+
+
+def found(hits):
+    return [(hit['kind'], hit['text']) for hit in hits]
+
+
+def test_prefixes_of_any_word_match(store, index):
+    assert found(index.search("raj")) == [('train', 'Rajdhani Express')]
+    assert index.search("raj")[0]['rows'].tolist() == [row_of(store, 'T001')]
+    assert found(index.search("expr kar")) == [('train', 'Karnataka Express')]
+
+    # Stations before the routes through them; a station holds the rows of its routes
+    hits = index.search("del")
+    assert found(hits) == [('station', 'Delhi'), ('route', 'Delhi-Mumbai'), ('route', 'Bangalore-Delhi')]
+    assert hits[0]['rows'].tolist() == sorted([row_of(store, 'T001'), row_of(store, 'T003')])
+
+    # Track ids are whole terms
+    assert found(index.search("t00")) == [
+        ('track', track_id) for track_id in ['T001', 'T002', 'T003', 'T004', 'T008', 'T0010']]
+    assert index.search("nowhere") == []
+    assert index.search("  -- ") == []
+
+
+def test_exact_matches_rank_before_prefix_matches(index):
+    # "Pune" is exactly a station, while the track, train and routes only start with it
+    assert found(index.search("pune")) == [
+        ('station', 'Pune'), ('train', 'Pune Express'), ('route', 'Mumbai-Pune'), ('route', 'Pune-Nashik')]
+    # An exact track id beats the longer ids it prefixes
+    assert found(index.search("T001"))[:2] == [('track', 'T001'), ('track', 'T0010')]
+    assert found(index.search("mumbai pune"))[0] == ('route', 'Mumbai-Pune')
+
+
+@pytest.mark.parametrize('query, expected', [
+    ("rajdani", ('train', 'Rajdhani Express')),  # one deletion
+    ("mumbia", ('station', 'Mumbai')),  # a transposition is two edits, allowed past five letters
+    ("hyderbd", ('station', 'Hyderabad')),  # two deletions
+    ("pume", ('train', 'Pune Express')),  # one edit in a short word; corrected hits are never exact
+])
+def test_misspelled_words_fall_back_to_fuzzy_matches(index, query, expected):
+    assert found(index.search(query))[0] == expected
+    assert index.search(query, fuzzy=False) == []
+
+
+def test_fuzzy_limits_depend_on_the_word_length(index):
+    assert edit_distance("pnue", "pune", 1) > 1
+    assert index.search("pnue") == []  # two edits in a short word
+    assert index.search("hyderbaad")[0]['text'] == 'Hyderabad'
+    assert index.search("hydrbd") == []  # three edits
+    assert index.search("koromandel") == []  # the first letter is never corrected
+
+
+def test_set_values_makes_new_routes_and_trains_findable(store, index):
+    row = row_of(store, 'T020')
+    store.set_values([row], {'route': ['Lucknow-Varanasi']})
+
+    assert found(index.search("varanasi")) == [('station', 'Varanasi'), ('route', 'Lucknow-Varanasi')]
+    assert all(hit['rows'].tolist() == [row] for hit in index.search("varanasi"))
+    # The old route has no tracks left and is no longer offered
+    assert index.search("kanpur") == []
+    assert found(index.search("lucknow")) == [('station', 'Lucknow'), ('route', 'Lucknow-Varanasi')]
+
+    # A row moving onto a known route joins its rows
+    other = row_of(store, 'T002')
+    store.set_values([other], {'route': ['Delhi-Mumbai'], 'train': ['Deccan Queen']})
+    assert index.search("delhi mumbai")[0]['rows'].tolist() == sorted([row_of(store, 'T001'), other])
+    assert index.search("deccan")[0]['rows'].tolist() == [other]
+    assert index.search("coromandel") == []
+    assert index.search("chennai") == []
+
+
+def test_updates_past_the_overlay_limit_are_folded():
+    store = generate_network(3000, seed=3, schema='tkinter')
+    index = SearchIndex(store)
+    rng = np.random.default_rng(3)
+    names = ["Alpha Mail", "Beta Mail", "Gamma Mail"]
+    for _ in range(3):
+        rows = np.unique(rng.integers(0, len(store), 500))
+        store.set_values(rows, {'train': [names[value] for value in rng.integers(0, 3, len(rows)).tolist()]})
+
+    trains = store.columns['train'].tolist()
+    for name in names:
+        hits = [hit for hit in index.search(name) if hit['text'] == name]
+        expected = [row for row, train in enumerate(trains) if train == name]
+        assert hits and hits[0]['rows'].tolist() == expected
@@ -0,0 +1,113 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import config
+import snapshot
+from network_generator import generate_network
+from snapshot import SnapshotError, network_source, read_snapshot, restore_store, write_snapshot
+
+
+@pytest.fixture
+def store():
+    return generate_network(500, seed=5, schema='tkinter')
+
+
+def assert_same_tracks(restored, store, atol=0.0):
+    assert len(restored) == len(store)
+    assert restored.track_ids.tolist() == store.track_ids.tolist()
+    np.testing.assert_array_equal(restored.category, store.category)
+    np.testing.assert_array_equal(restored.coord_offsets, store.coord_offsets)
+    np.testing.assert_allclose(restored.coords, store.coords, rtol=0, atol=atol)
+    assert sorted(restored.columns) == sorted(store.columns)
+    for name, values in store.columns.items():
+        assert restored.columns[name].tolist() == values.tolist(), name
+
+
+@pytest.mark.parametrize('geometry', snapshot.GEOMETRY_ENCODINGS)
+def test_round_trip(tmp_path, store, geometry):
+    path = str(tmp_path / "state.snap")
+    store.set_values([0, 1], {'trains_count': [7, 8], 'delay': ['', '12 min']})
+    write_snapshot(store, path, metadata={'note': 'test'}, geometry=geometry)
+
+    restored = read_snapshot(path)
+    # Polylines keep 1e-5 degrees
+    assert_same_tracks(restored, store, atol=0.5e-5 if geometry == 'polyline' else 0.0)
+    assert restored.snapshot_geometry == geometry
+    assert restored.snapshot_metadata['note'] == 'test'
+
+    # Restored arrays are copy-on-write: edits never reach the file
+    restored.set_values([0], {'delay': ['99 min']})
+    restored.set_category([0], 'blocked_tracks')
+    assert_same_tracks(read_snapshot(path), store, atol=0.5e-5 if geometry == 'polyline' else 0.0)
+
+
+def write_version_1(store, path):
+    """A snapshot as the first format wrote it: float64 geometry, no geometry key or source"""
+    arrays, columns = snapshot.snapshot_arrays(store, 'float64')
+    header = {'created': '2024-01-01T00:00:00', 'rows': len(store), 'id_column': store.id_column,
+              'store_version': store.version, 'columns': columns, 'metadata': {}, 'arrays': {}}
+    position = 0
+    for name, array in arrays.items():
+        header['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': position}
+        position += -(-array.nbytes // snapshot.ALIGNMENT) * snapshot.ALIGNMENT
+    encoded = json.dumps(header).encode("utf-8")
+    data_start = -(-(snapshot._PREAMBLE.size + len(encoded)) // snapshot.ALIGNMENT) * snapshot.ALIGNMENT
+    with open(path, "wb") as handle:
+        handle.write(snapshot._PREAMBLE.pack(snapshot.MAGIC, 1, 0, len(encoded)))
+        handle.write(encoded)
+        handle.write(b"\0" * (data_start - snapshot._PREAMBLE.size - len(encoded)))
+        for array in arrays.values():
+            handle.write(array.tobytes())
+            handle.write(b"\0" * (-array.nbytes % snapshot.ALIGNMENT))
+
+
+def test_version_1_files_are_restored(tmp_path, store):
+    path = str(tmp_path / "old.snap")
+    write_version_1(store, path)
+    restored = read_snapshot(path)
+    assert_same_tracks(restored, store)
+    assert restored.snapshot_geometry == 'float64'
+
+
+def test_unknown_versions_are_refused(tmp_path, store):
+    path = str(tmp_path / "new.snap")
+    write_snapshot(store, path, geometry='float64')
+    with open(path, "r+b") as handle:
+        handle.write(snapshot._PREAMBLE.pack(snapshot.MAGIC, snapshot.FORMAT_VERSION + 1, 0, 0)[:12])
+    with pytest.raises(SnapshotError, match="not supported"):
+        read_snapshot(path)
+
+
+def test_snapshots_of_another_network_source_are_refused(tmp_path, store, monkeypatch):
+    path = str(tmp_path / "state.snap")
+    source = network_source(data_path='', tracks=500, seed=5)
+    write_snapshot(store, path, source=source)
+
+    assert len(read_snapshot(path, source)) == len(store)
+    for other in (network_source(data_path='', tracks=1000, seed=5), network_source(data_path='', tracks=500, seed=6)):
+        with pytest.raises(SnapshotError, match="different network source"):
+            read_snapshot(path, other)
+
+    # restore_store compares with the configured network and falls back to a cold start
+    monkeypatch.setattr(config, 'NETWORK_DATA_PATH', None)
+    monkeypatch.setattr(config, 'SYNTHETIC_NETWORK_SEED', 5)
+    monkeypatch.setattr(config, 'SYNTHETIC_NETWORK_TRACKS', 500)
+    assert restore_store(path) is not None
+    monkeypatch.setattr(config, 'SYNTHETIC_NETWORK_TRACKS', 1000)
+    assert restore_store(path) is None
+
+
+def test_editing_the_data_file_invalidates_its_snapshots(tmp_path, store):
+    data = tmp_path / "network.geojson"
+    data.write_text('{"type": "FeatureCollection", "features": []}')
+    path = str(tmp_path / "state.snap")
+    write_snapshot(store, path, source=network_source(data_path=str(data)))
+    assert read_snapshot(path, network_source(data_path=str(data))) is not None
+
+    data.write_text('{"type": "FeatureCollection", "features": [ ]}')
+    os.utime(data, ns=(0, 10 ** 18))
+    with pytest.raises(SnapshotError, match="different network source"):
+        read_snapshot(path, network_source(data_path=str(data)))
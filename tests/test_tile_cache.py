@@ -0,0 +1,84 @@
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from tile_cache import (MBTilesStore, LRUTileCache, TileProvider, generate_tile_set, solid_png,
+                        start_tile_server, tile_url, tile_server_answers, tiles_in_bounds)
+
+BOUNDS = [[20.0, 75.0], [24.0, 80.0]]
+
+
+@pytest.fixture
+def server(tmp_path):
+    store = MBTilesStore(str(tmp_path / "tiles.mbtiles"))
+    generate_tile_set(store, BOUNDS, zooms=(4, 5))
+    server = start_tile_server(TileProvider(store, LRUTileCache()), host="127.0.0.1", port=0)
+    yield server
+    server.shutdown()
+    server.server_close()
+    store.close()
+
+
+def fetch(server, z, x, y):
+    with urllib.request.urlopen(tile_url(server).format(z=z, x=x, y=y), timeout=5) as response:
+        return response.headers.get_content_type(), response.read()
+
+
+def test_served_tiles_are_the_stored_bytes(server):
+    store = server.provider.store
+    z, x, y = next(tiles_in_bounds(BOUNDS, 5))
+    content_type, data = fetch(server, z, x, y)
+    assert content_type == "image/png"
+    assert data == store.get(z, x, y) and data.startswith(b"\x89PNG")
+    # The second request is served from memory
+    hits = server.provider.memory.hits
+    assert fetch(server, z, x, y)[1] == data
+    assert server.provider.memory.hits == hits + 1
+
+
+def test_missing_tiles_are_404(server):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        fetch(server, 12, 0, 0)
+    assert error.value.code == 404
+    assert tile_server_answers(tile_url(server))
+
+
+class Forbidden(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_error(403, "Forbidden")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_other_http_services_are_not_tile_servers():
+    other = ThreadingHTTPServer(("127.0.0.1", 0), Forbidden)
+    threading.Thread(target=other.serve_forever, daemon=True).start()
+    try:
+        host, port = other.server_address[:2]
+        assert not tile_server_answers(f"http://{host}:{port}/tiles/{{z}}/{{x}}/{{y}}.png")
+    finally:
+        other.shutdown()
+        other.server_close()
+    # Nothing listening at all
+    assert not tile_server_answers(f"http://127.0.0.1:{port}/tiles/{{z}}/{{x}}/{{y}}.png")
+
+
+def test_lru_cache_evicts_the_least_recently_used_tiles():
+    tile = solid_png((1, 2, 3))
+    cache = LRUTileCache(max_bytes=3 * len(tile))
+    for key in ("a", "b", "c"):
+        cache.put(key, tile)
+    assert cache.get("a") == tile  # "b" is now the least recently used
+
+    cache.put("d", tile)
+    assert len(cache) == 3 and cache.size == 3 * len(tile)
+    assert cache.get("b") is None
+    assert all(cache.get(key) == tile for key in ("a", "c", "d"))
+
+    # Replacing a tile does not count it twice
+    cache.put("d", tile)
+    assert cache.size == 3 * len(tile)
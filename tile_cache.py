@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Railway Track Monitoring System - Offline Map Tiles
+MBTiles (SQLite) tile store with an in-memory LRU layer, a prefetch job for
+the India bounding box and a local HTTP tile endpoint that both the Tkinter
+and the Streamlit maps can use instead of public tile servers.
+
+Usage:
+    python tile_cache.py generate   # build a synthetic tile set (for testing)
+    python tile_cache.py prefetch   # download tiles for config.TILE_PREFETCH_BOUNDS
+    python tile_cache.py serve      # serve the cache on config.TILE_SERVER_PORT
+"""
+
+import sys
+import math
+import sqlite3
+import struct
+import threading
+import zlib
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import config
+
+
+class MBTilesStore:
+    """Tile storage in the MBTiles layout (SQLite, TMS row numbering)"""
+
+    def __init__(self, path, name="railway-basemap"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tiles (zoom_level INTEGER, tile_column INTEGER, "
+            "tile_row INTEGER, tile_data BLOB, PRIMARY KEY (zoom_level, tile_column, tile_row))"
+        )
+        self._conn.execute("INSERT OR IGNORE INTO metadata VALUES ('name', ?)", (name,))
+        self._conn.execute("INSERT OR IGNORE INTO metadata VALUES ('format', 'png')")
+        self._conn.commit()
+
+    @staticmethod
+    def _tms_row(z, y):
+        return (1 << z) - 1 - y
+
+    def get(self, z, x, y):
+        """Tile bytes for XYZ coordinates, or None when missing"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+                (z, x, self._tms_row(z, y))
+            ).fetchone()
+        return row[0] if row else None
+
+    def has(self, z, x, y):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+                (z, x, self._tms_row(z, y))
+            ).fetchone()
+        return row is not None
+
+    def put(self, z, x, y, data):
+        self.put_many([(z, x, y, data)])
+
+    def put_many(self, tiles):
+        """Insert (z, x, y, data) tuples in a single transaction"""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)",
+                [(z, x, self._tms_row(z, y), sqlite3.Binary(data)) for z, x, y, data in tiles]
+            )
+            self._conn.commit()
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tiles").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class LRUTileCache:
+    """Thread-safe in-memory LRU cache bounded by total bytes"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._tiles.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._tiles.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        with self._lock:
+            if key in self._tiles:
+                self.size -= len(self._tiles.pop(key))
+            self._tiles[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes and self._tiles:
+                _, evicted = self._tiles.popitem(last=False)
+                self.size -= len(evicted)
+
+    def __len__(self):
+        return len(self._tiles)
+
+
+class TileProvider:
+    """Memory cache -> MBTiles store -> (optional) upstream tile server"""
+
+    def __init__(self, store, memory=None, upstream_url=None, timeout=10):
+        self.store = store
+        self.memory = memory if memory is not None else LRUTileCache()
+        self.upstream_url = upstream_url
+        self.timeout = timeout
+
+    def get_tile(self, z, x, y):
+        key = (z, x, y)
+        data = self.memory.get(key)
+        if data is not None:
+            return data
+
+        data = self.store.get(z, x, y)
+        if data is None and self.upstream_url:
+            data = self.fetch_upstream(z, x, y)
+            if data is not None:
+                self.store.put(z, x, y, data)
+
+        if data is not None:
+            self.memory.put(key, data)
+        return data
+
+    def fetch_upstream(self, z, x, y):
+        """Download one tile, returning None when the network is unavailable"""
+        url = self.upstream_url.format(z=z, x=x, y=y)
+        request = urllib.request.Request(url, headers={"User-Agent": config.TILE_USER_AGENT})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.read()
+        except Exception as e:
+            print(f"⚠️  Tile download failed for {z}/{x}/{y}: {e}")
+            return None
+
+
+# ----------------------------------------------------------------------
+# Tile math and prefetching
+# ----------------------------------------------------------------------
+def lat_lon_to_tile(lat, lon, zoom):
+    """Web-Mercator XYZ tile containing a coordinate"""
+    lat = max(min(lat, 85.0511), -85.0511)
+    n = 1 << zoom
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_in_bounds(bounds, zoom):
+    """Yield (z, x, y) for every tile covering [[south, west], [north, east]]"""
+    (south, west), (north, east) = bounds
+    x_min, y_min = lat_lon_to_tile(north, west, zoom)
+    x_max, y_max = lat_lon_to_tile(south, east, zoom)
+    for x in range(x_min, x_max + 1):
+        for y in range(y_min, y_max + 1):
+            yield zoom, x, y
+
+
+def prefetch(provider, bounds=None, zooms=None, batch_size=256, progress=None):
+    """Download every missing tile in ``bounds`` for the given zoom range.
+
+    Already cached tiles are skipped, so the job can be resumed after an
+    interruption.  Returns the number of tiles that were fetched.
+    """
+    bounds = bounds or config.TILE_PREFETCH_BOUNDS
+    zoom_min, zoom_max = zooms or config.TILE_PREFETCH_ZOOMS
+    fetched = 0
+    batch = []
+    for zoom in range(zoom_min, zoom_max + 1):
+        for z, x, y in tiles_in_bounds(bounds, zoom):
+            if provider.store.has(z, x, y):
+                continue
+            data = provider.fetch_upstream(z, x, y)
+            if data is None:
+                continue
+            batch.append((z, x, y, data))
+            fetched += 1
+            if len(batch) >= batch_size:
+                provider.store.put_many(batch)
+                batch = []
+                if progress:
+                    progress(fetched)
+    if batch:
+        provider.store.put_many(batch)
+    return fetched
+
+
+def solid_png(rgb, size=256):
+    """Encode a single-colour PNG tile without any imaging library"""
+    raw = (b"\x00" + bytes(rgb) * size) * size
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+    header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 9)) + chunk(b"IEND", b"")
+
+
+def generate_tile_set(store, bounds=None, zooms=(4, 6)):
+    """Fill a store with locally generated checkerboard tiles (no network needed)"""
+    bounds = bounds or config.TILE_PREFETCH_BOUNDS
+    light, dark = solid_png((236, 240, 241)), solid_png((214, 219, 223))
+    tiles = []
+    for zoom in range(zooms[0], zooms[1] + 1):
+        for z, x, y in tiles_in_bounds(bounds, zoom):
+            tiles.append((z, x, y, light if (x + y) % 2 else dark))
+    store.put_many(tiles)
+    return len(tiles)
+
+
+# ----------------------------------------------------------------------
+# Local HTTP tile endpoint
+# ----------------------------------------------------------------------
+# 404 messages of the endpoint, which also tell it apart from other HTTP services
+NOT_CACHED = "Tile not cached"
+UNKNOWN_PATH = "Unknown tile path"
+
+
+class TileRequestHandler(BaseHTTPRequestHandler):
+    """Serves /tiles/{z}/{x}/{y}.png from the server's TileProvider"""
+
+    def do_GET(self):
+        parts = self.path.split("?")[0].strip("/").split("/")
+        try:
+            if len(parts) != 4 or parts[0] != "tiles":
+                raise ValueError(self.path)
+            z, x, y = int(parts[1]), int(parts[2]), int(parts[3].split(".")[0])
+        except ValueError:
+            self.send_error(404, UNKNOWN_PATH)
+            return
+
+        data = self.server.provider.get_tile(z, x, y)
+        if data is None:
+            self.send_error(404, NOT_CACHED)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Cache-Control", "public, max-age=86400")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_tile_server(provider, host=None, port=None):
+    """Start the tile endpoint on a daemon thread and return the server"""
+    server = ThreadingHTTPServer((host or config.TILE_SERVER_HOST,
+                                  config.TILE_SERVER_PORT if port is None else port),
+                                 TileRequestHandler)
+    server.daemon_threads = True
+    server.provider = provider
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def tile_url(server):
+    """XYZ URL template for a running tile server"""
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/tiles/{{z}}/{{x}}/{{y}}.png"
+
+
+def tile_server_answers(url, timeout=0.5):
+    """True when a tile endpoint answers at the XYZ template ``url``.
+
+    A PNG tile counts, and so does this module's own 404 for a tile it has
+    not cached; any other HTTP service on the port does not.
+    """
+    try:
+        with urllib.request.urlopen(url.format(z=0, x=0, y=0), timeout=timeout) as response:
+            return response.status == 200 and response.headers.get_content_type() == "image/png"
+    except urllib.error.HTTPError as error:
+        body = error.read(4096).decode("utf-8", "replace")
+        return error.code == 404 and (NOT_CACHED in body or UNKNOWN_PATH in body)
+    except (OSError, ValueError):
+        return False
+
+
+_shared_url = None
+_shared_server = None
+_shared_error = None
+_shared_lock = threading.Lock()
+
+
+def ensure_local_tile_server():
+    """URL of a local tile server, starting one (once per process) if none answers.
+
+    A server already answering on the configured port, such as
+    ``python tile_cache.py serve`` or another app, is reused.  When that
+    port is taken by something else the server binds a free port.  Returns
+    None when no server can be started; the failure is remembered, so
+    callers fall back to their default online tiles without retrying, and
+    ``local_tile_server_error`` tells them why.
+    """
+    global _shared_url, _shared_server, _shared_error
+    with _shared_lock:
+        if _shared_url is None and _shared_error is None:
+            configured = f"http://{config.TILE_SERVER_HOST}:{config.TILE_SERVER_PORT}/tiles/{{z}}/{{x}}/{{y}}.png"
+            if tile_server_answers(configured):
+                _shared_url = configured
+                return _shared_url
+            try:
+                upstream = None if config.TILE_OFFLINE_ONLY else config.TILE_UPSTREAM_URL
+                provider = TileProvider(MBTilesStore(config.TILE_CACHE_PATH),
+                                        LRUTileCache(config.TILE_MEMORY_CACHE_MB * 1024 * 1024),
+                                        upstream_url=upstream)
+                try:
+                    _shared_server = start_tile_server(provider)
+                except OSError:
+                    # The configured port is taken by something that is not a tile server
+                    _shared_server = start_tile_server(provider, port=0)
+                _shared_url = tile_url(_shared_server)
+            except (OSError, sqlite3.Error) as e:
+                _shared_error = str(e)
+                print(f"⚠️  Local tile server unavailable: {e}")
+        return _shared_url
+
+
+def local_tile_server_error():
+    """Why no local tile server is reachable, or None"""
+    return _shared_error
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "serve"
+    store = MBTilesStore(config.TILE_CACHE_PATH)
+
+    if command == "generate":
+        count = generate_tile_set(store)
+        print(f"✅ Generated {count} synthetic tiles in {config.TILE_CACHE_PATH}")
+    elif command == "prefetch":
+        provider = TileProvider(store, upstream_url=config.TILE_UPSTREAM_URL)
+        print(f"📦 Prefetching zooms {config.TILE_PREFETCH_ZOOMS} for {config.TILE_PREFETCH_BOUNDS}...")
+        count = prefetch(provider, progress=lambda n: print(f"   {n} tiles downloaded"))
+        print(f"✅ Prefetch complete: {count} new tiles ({store.count()} cached)")
+    elif command == "serve":
+        upstream = None if config.TILE_OFFLINE_ONLY else config.TILE_UPSTREAM_URL
+        server = start_tile_server(TileProvider(store, upstream_url=upstream))
+        print(f"🗺️  Serving {store.count()} tiles at {tile_url(server)} (Ctrl+C to stop)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+    else:
+        print(__doc__)
+
+
+if __name__ == "__main__":
+    main()
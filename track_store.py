@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Railway Track Monitoring System - Columnar Track Store
+Keeps every track as a row across NumPy column arrays so that views can
+sort, filter and read rows without walking lists of dictionaries.  Track
+geometry is one float64 vertex table with per-track index ranges, and
+repeated strings (statuses, routes, reasons) are interned so every row
+holding the same text points at one object.
+
+A store can be shared between threads (Streamlit sessions share one).  Its
+``lock`` is held by every update, including the listener calls it makes,
+and by every cache fill; objects that listen to a store hold the same lock
+in their queries (``synchronized``), so a reader never sees a half-applied
+update.
+"""
+
+import re
+import sys
+import functools
+import threading
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+from instrumentation import cache_event
+
+# Track categories in the order used by both applications
+CATEGORIES = ('live_tracks', 'congested_tracks', 'blocked_tracks', 'free_tracks')
+
+# First number in a display string, with an optional ":MM" part or a time unit
+_QUANTITY_RE = re.compile(r'(\d+(?:\.\d+)?)(?::(\d{2}))?\s*(hours?|hrs?|h\b|min)?', re.IGNORECASE)
+
+
+def parse_quantity(value):
+    """Turn display values such as '110 km/h', '2 hours' or '14:30' into a number.
+
+    Durations are returned in minutes and clock times in minutes after midnight.
+    Returns None when the value holds no number.
+    """
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return float(value)
+    match = _QUANTITY_RE.search(str(value))
+    if not match:
+        return None
+    number = float(match.group(1))
+    if match.group(2):
+        return number * 60 + int(match.group(2))
+    unit = (match.group(3) or '').lower()
+    if unit.startswith('h'):
+        return number * 60
+    return number
+
+
+def _number(value):
+    number = parse_quantity(value)
+    return 0.0 if number is None or number != number else number
+
+
+def column_numbers(store, column, rows, parse=None):
+    """Numeric values of ``column`` at ``rows`` (0 where a cell holds no number).
+
+    Each distinct display value goes through ``parse`` (``parse_quantity``
+    by default) once.
+    """
+    parse = parse or _number
+    values = store.columns[column]
+    if values.dtype != object:
+        return np.nan_to_num(values[rows].astype(np.float64))
+    if 4 * len(rows) >= len(store):
+        # Large batches go through the store's cached codes
+        codes, labels = store.codes(column)
+        return np.array([parse(label) for label in labels.tolist()], dtype=np.float64)[codes[rows]]
+    parsed = {}
+    return np.array([parsed[value] if value in parsed else parsed.setdefault(value, parse(value))
+                     for value in values[rows].tolist()], dtype=np.float64)
+
+
+def _sample(value):
+    return np.nan if str(value).strip() == '' else _number(value)
+
+
+def column_samples(store, column, rows):
+    """Like ``column_numbers``, with NaN for blank cells (no sample)"""
+    return column_numbers(store, column, rows, parse=_sample)
+
+
+def group_csr(keys, size, values=None):
+    """``(offsets, values)`` grouping ``values`` (the positions of ``keys`` by default) by integer ``keys`` in ``range(size)``"""
+    keys = np.asarray(keys, dtype=np.int64)
+    order = np.argsort(keys, kind='stable')
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=size), out=offsets[1:])
+    return offsets, order if values is None else np.asarray(values)[order]
+
+
+def gather_csr(offsets, values, groups):
+    """Values of every group in ``groups`` of CSR ``(offsets, values)``, concatenated"""
+    groups = np.asarray(groups, dtype=np.int64)
+    counts = offsets[groups + 1] - offsets[groups]
+    starts = np.repeat(offsets[groups] - np.cumsum(counts) + counts, counts)
+    return values[starts + np.arange(counts.sum())]
+
+
+def synchronized(method):
+    """Run a method of a store, or of an object with a ``store`` attribute, under the store's lock"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with getattr(self, 'store', self).lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class TrackStore:
+    """Columnar storage for railway tracks with cached sort keys and search text"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = 0
+        self.id_column = 'track_id'
+        self.track_ids = np.empty(0, dtype=object)
+        self.category = np.empty(0, dtype=np.int8)
+        self.columns = {}
+        self.coord_offsets = np.zeros(1, dtype=np.int64)
+        self.coords = np.empty((0, 2), dtype=np.float64)
+
+        self._row_index = {}
+        self._category_rows = {}
+        self._codes = {}
+        self._sort_keys = {}
+        self._sort_orders = {}
+        self._search_text = {}
+        self._listeners = []
+
+    @classmethod
+    def from_tracks_data(cls, tracks_data, id_column=None):
+        """Build a store from the ``tracks_data`` dictionary used by the apps"""
+        records = []
+        codes = []
+        for code, category in enumerate(CATEGORIES):
+            for track in tracks_data.get(category, []):
+                records.append(track)
+                codes.append(code)
+
+        # Both apps name the id column differently ('track_id' / 'Track ID')
+        if id_column is None:
+            id_column = 'track_id' if records and 'track_id' in records[0] else 'Track ID'
+
+        names = []
+        for record in records:
+            for name in record:
+                if name != 'route_coords' and name not in names:
+                    names.append(name)
+
+        lengths = [len(record.get('route_coords') or ()) for record in records]
+        offsets = np.zeros(len(records) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        flat = [coord for record in records for coord in (record.get('route_coords') or ())]
+
+        return cls.from_columns(
+            [record.get(id_column, '') for record in records], codes,
+            {name: _column_array([record.get(name, '') for record in records]) for name in names},
+            offsets, np.array(flat, dtype=np.float64).reshape(-1, 2), id_column=id_column)
+
+    @classmethod
+    def from_columns(cls, track_ids, category, columns, coord_offsets, coords, id_column='track_id', intern=True):
+        """Build a store directly from column arrays (used by generators and importers).
+
+        Strings in object columns are interned unless ``intern`` is False
+        (for callers whose columns already share their repeated values).
+        """
+        store = cls()
+        store.id_column = id_column
+        store.track_ids = np.asarray(track_ids, dtype=object)
+        store.category = np.asarray(category, dtype=np.int8)
+        store.columns = {}
+        for name, values in columns.items():
+            values = np.asarray(values)
+            store.columns[name] = intern_values(values) if intern and values.dtype == object else values
+        store.coord_offsets = np.asarray(coord_offsets, dtype=np.int64)
+        store.coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        store._rebuild_row_index()
+        return store
+
+    def __len__(self):
+        return len(self.track_ids)
+
+    def _rebuild_row_index(self):
+        # Built on first lookup, so restoring a large store does not pay for it
+        self._row_index = None
+        self._category_rows = {}
+
+    @synchronized
+    def _index(self):
+        if self._row_index is None:
+            self._row_index = {track_id: row for row, track_id in enumerate(self.track_ids.tolist())}
+        return self._row_index
+
+    # ------------------------------------------------------------------
+    # Row access
+    # ------------------------------------------------------------------
+    @synchronized
+    def rows(self, category=None):
+        """Row numbers of one category (or of every track when category is None)"""
+        if category is None:
+            return np.arange(len(self), dtype=np.int64)
+        if category not in self._category_rows:
+            code = CATEGORIES.index(category)
+            self._category_rows[category] = np.flatnonzero(self.category == code)
+        return self._category_rows[category]
+
+    def row_of(self, track_id):
+        """Row number of a track id, or None when it is unknown"""
+        return self._index().get(track_id)
+
+    def value(self, row, column):
+        """Single cell value"""
+        return self.columns[column][row]
+
+    @synchronized
+    def values(self, rows, columns):
+        """Materialize the given rows as tuples of the given columns"""
+        arrays = [self.columns[column][rows] for column in columns]
+        return list(zip(*[array.tolist() for array in arrays]))
+
+    def route_coords(self, row):
+        """(k, 2) array of [lat, lon] vertices for one track"""
+        return self.coords[self.coord_offsets[row]:self.coord_offsets[row + 1]]
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+    def update(self, track_id, **changes):
+        """Update cells of one track and notify listeners"""
+        row = self._index()[track_id]
+        self.set_values(np.array([row]), {column: [value] for column, value in changes.items()})
+        return row
+
+    @synchronized
+    def set_values(self, rows, changes):
+        """Write ``{column: values}`` for many rows at once and notify listeners"""
+        rows = np.asarray(rows, dtype=np.int64)
+        for column, values in changes.items():
+            if column not in self.columns:
+                self.columns[column] = np.full(len(self), '', dtype=object)
+            target = self.columns[column]
+            if target.dtype != object and not np.issubdtype(np.asarray(values).dtype, np.number):
+                self.columns[column] = target = target.astype(object)
+            target[rows] = intern_values(values) if target.dtype == object else values
+            self._invalidate(column)
+
+        self.version += 1
+        for listener in list(self._listeners):
+            listener(rows, tuple(changes))
+
+    @synchronized
+    def set_category(self, rows, category):
+        """Move ``rows`` to another category and notify listeners with the column ``'category'``"""
+        rows = np.asarray(rows, dtype=np.int64)
+        self.category[rows] = CATEGORIES.index(category)
+        self._category_rows = {}
+        self.version += 1
+        for listener in list(self._listeners):
+            listener(rows, ('category',))
+
+    def _invalidate(self, column):
+        self._codes.pop(column, None)
+        self._sort_keys.pop(column, None)
+        self._sort_orders.pop(column, None)
+        self._search_text.pop(column, None)
+
+    @synchronized
+    def subscribe(self, listener):
+        """Register ``listener(rows, columns)`` to be called after every update"""
+        self._listeners.append(listener)
+
+    @synchronized
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    # ------------------------------------------------------------------
+    # Categorical codes
+    # ------------------------------------------------------------------
+    @synchronized
+    def codes(self, column):
+        """``(codes, labels)`` of a column: int32 codes into its distinct values.
+
+        Labels are in first-seen order; cached until the column changes.
+        """
+        cache_event("track_store.codes", column in self._codes)
+        if column not in self._codes:
+            values = self.columns[column].tolist()
+            table = {value: code for code, value in enumerate(dict.fromkeys(values))}
+            codes = np.fromiter(map(table.__getitem__, values), dtype=np.int32, count=len(values))
+            labels = np.empty(len(table), dtype=object)
+            labels[:] = list(table)
+            self._codes[column] = (codes, labels)
+        return self._codes[column]
+
+    @synchronized
+    def memory_bytes(self):
+        """Approximate memory of the store, counting each shared string once"""
+        arrays = [self.track_ids, self.category, self.coord_offsets, self.coords, *self.columns.values()]
+        objects = {}
+        for array in arrays:
+            if array.dtype == object:
+                objects.update((id(value), value) for value in array.tolist())
+        return sum(array.nbytes for array in arrays) + sum(sys.getsizeof(value) for value in objects.values())
+
+    # ------------------------------------------------------------------
+    # Sorting and filtering
+    # ------------------------------------------------------------------
+    @synchronized
+    def sort_key(self, column):
+        """Precomputed sort key for a column (numeric where the values allow it)"""
+        cache_event("track_store.sort_key", column in self._sort_keys)
+        if column not in self._sort_keys:
+            values = self.columns[column]
+            if values.dtype != object:
+                key = values.astype(np.float64)
+            else:
+                # Parsed once per distinct value; blank cells belong to other categories and sort last
+                codes, labels = self.codes(column)
+                numbers = [np.nan if label in ('', None) else parse_quantity(label) for label in labels.tolist()]
+                if all(number is not None for number in numbers):
+                    key = np.array(numbers, dtype=np.float64)[codes]
+                else:
+                    # Rank the strings so later comparisons are integer only
+                    ranks = np.empty(len(labels), dtype=np.int64)
+                    ranks[np.argsort(np.asarray(labels, dtype=str), kind='stable')] = np.arange(len(labels))
+                    key = ranks[codes]
+            self._sort_keys[column] = key
+        return self._sort_keys[column]
+
+    @synchronized
+    def sort_order(self, column):
+        """Stable argsort of the whole column, cached until the column changes"""
+        cache_event("track_store.sort_order", column in self._sort_orders)
+        if column not in self._sort_orders:
+            self._sort_orders[column] = np.argsort(self.sort_key(column), kind='stable')
+        return self._sort_orders[column]
+
+    @synchronized
+    def sorted_rows(self, rows, column, descending=False):
+        """Return ``rows`` ordered by ``column`` using the cached global order"""
+        order = self.sort_order(column)
+        selected = np.zeros(len(self), dtype=bool)
+        selected[rows] = True
+        result = order[selected[order]]
+        return result[::-1] if descending else result
+
+    @synchronized
+    def search_text(self, column):
+        """Lower-case form of a column's distinct values, cached for substring filters"""
+        cache_event("track_store.search_text", column in self._search_text)
+        if column not in self._search_text:
+            _, labels = self.codes(column)
+            self._search_text[column] = np.char.lower(np.asarray(labels, dtype=str))
+        return self._search_text[column]
+
+    @synchronized
+    def match(self, rows, text, columns):
+        """Boolean mask over ``rows`` of tracks whose columns contain ``text``"""
+        text = text.strip().lower()
+        if not text:
+            return np.ones(len(rows), dtype=bool)
+        mask = np.zeros(len(rows), dtype=bool)
+        for column in columns:
+            # Each distinct value is searched once, then looked up by code
+            hits = np.char.find(self.search_text(column), text) >= 0
+            mask |= hits[self.codes(column)[0][rows]]
+        return mask
+
+
+def intern_values(values):
+    """Object array in which equal strings are one shared object"""
+    values = values.tolist() if isinstance(values, np.ndarray) else list(values)
+    array = np.empty(len(values), dtype=object)
+    try:
+        # Each distinct string is interned once; other values map to themselves
+        interned = {value: sys.intern(value) for value in dict.fromkeys(values) if type(value) is str}
+        array[:] = list(map(interned.get, values, values))
+    except TypeError:  # unhashable values
+        array[:] = [sys.intern(value) if type(value) is str else value for value in values]
+    return array
+
+
+def _column_array(values):
+    """Store numbers as numeric arrays and everything else as interned object arrays"""
+    if values and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+        return np.array(values)
+    return intern_values(values)
+
+
+class CategoryRecords(Sequence):
+    """Tracks of one category as record dictionaries, built on access.
+
+    ``route_coords`` is a view into the store's vertex table, not a copy.
+    """
+
+    def __init__(self, store, category, fields):
+        self.store = store
+        self.category = category
+        self.fields = [field for field in fields if field in store.columns]
+
+    @property
+    def rows(self):
+        return self.store.rows(self.category)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        row = int(self.rows[index])
+        record = {field: self.store.columns[field][row] for field in self.fields}
+        record['route_coords'] = self.store.route_coords(row)
+        return record
+
+    def columns(self, fields=None):
+        """``{field: array}`` of this category's rows, e.g. for ``pd.DataFrame`` without building records"""
+        rows = self.rows
+        return {field: self.store.columns[field][rows] for field in (fields or self.fields)}
+
+    def __iter__(self):
+        rows = self.rows
+        columns = [self.store.columns[field][rows].tolist() for field in self.fields]
+        for row, values in zip(rows.tolist(), zip(*columns) if columns else ((),) * len(rows)):
+            record = dict(zip(self.fields, values))
+            record['route_coords'] = self.store.route_coords(row)
+            yield record
+
+
+class TrackRecords(Mapping):
+    """Read-only ``tracks_data``-style view of a store: ``{category: records}``.
+
+    Lets code written against the dictionaries share one columnar store
+    instead of holding its own nested lists.  ``fields`` maps each category
+    to the columns its records carry.
+    """
+
+    def __init__(self, store, fields):
+        self.store = store
+        self._categories = {category: CategoryRecords(store, category, fields[category])
+                            for category in CATEGORIES}
+
+    def __getitem__(self, category):
+        return self._categories[category]
+
+    def __iter__(self):
+        return iter(self._categories)
+
+    def __len__(self):
+        return len(self._categories)
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Railway Track Monitoring System - Virtual Track Table
+A ttk.Treeview wrapper that only materializes the rows currently on screen.
+Sorting and filtering run against the columnar TrackStore, so the widget stays
+responsive with hundreds of thousands of tracks.
+"""
+
+import tkinter as tk
+from tkinter import ttk
+import numpy as np
+
+
+class VirtualTreeview(tk.Frame):
+    """Scrollable track table backed by a TrackStore category"""
+
+    def __init__(self, parent, store, category, columns, column_width=180,
+                 show_filter=True, bg="#ecf0f1"):
+        super().__init__(parent, bg=bg)
+        self.store = store
+        self.category = category
+        # columns: list of (heading, store column name)
+        self.headings = [heading for heading, _ in columns]
+        self.fields = [field for _, field in columns]
+
+        self.offset = 0
+        self.sort_field = None
+        self.sort_descending = False
+        self.filter_text = ""
+        self.view_rows = store.rows(category)
+        self.slot_rows = []
+        self._pending_resize = None
+
+        if show_filter:
+            self.create_filter_bar(bg)
+
+        table_frame = tk.Frame(self, bg=bg)
+        table_frame.pack(fill=tk.BOTH, expand=True)
+
+        self.tree = ttk.Treeview(table_frame, columns=self.headings, show="headings", height=12)
+        for heading, field in columns:
+            self.tree.heading(heading, text=heading, command=lambda f=field: self.sort_by(f))
+            self.tree.column(heading, width=column_width, anchor=tk.CENTER)
+
+        self.scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.on_scrollbar)
+
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        # Fixed pool of tree items reused for every visible row
+        self.slots = [self.tree.insert("", tk.END, values=()) for _ in range(int(self.tree.cget("height")))]
+        self.attached = len(self.slots)
+
+        self.tree.bind("<Configure>", self.on_resize)
+        self.tree.bind("<MouseWheel>", self.on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll_by(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_by(3))
+        self.tree.bind("<Prior>", lambda e: self.scroll_by(-len(self.slots)))
+        self.tree.bind("<Next>", lambda e: self.scroll_by(len(self.slots)))
+        self.bind("<Destroy>", self.on_destroy)
+
+        self.store.subscribe(self.on_store_change)
+        self.render()
+
+    def create_filter_bar(self, bg):
+        """Create the search box used for filtering rows"""
+        filter_frame = tk.Frame(self, bg=bg)
+        filter_frame.pack(fill=tk.X, pady=(0, 5))
+
+        tk.Label(filter_frame, text="🔍 Filter:", font=("Arial", 10, "bold"),
+                bg=bg, fg="#2c3e50").pack(side=tk.LEFT)
+
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add("write", lambda *args: self.set_filter(self.filter_var.get()))
+        tk.Entry(filter_frame, textvariable=self.filter_var, width=30).pack(side=tk.LEFT, padx=5)
+
+        self.count_label = tk.Label(filter_frame, text="", font=("Arial", 9), bg=bg, fg="#7f8c8d")
+        self.count_label.pack(side=tk.RIGHT)
+
+    # ------------------------------------------------------------------
+    # View computation
+    # ------------------------------------------------------------------
+    def refresh_view(self):
+        """Recompute the ordered row list from the current sort and filter"""
+        rows = self.store.rows(self.category)
+        if self.sort_field is not None:
+            rows = self.store.sorted_rows(rows, self.sort_field, self.sort_descending)
+        if self.filter_text:
+            rows = rows[self.store.match(rows, self.filter_text, self.fields)]
+        self.view_rows = rows
+        self.offset = max(0, min(self.offset, len(rows) - len(self.slots)))
+        self.render()
+
+    def sort_by(self, field):
+        """Sort on a column, toggling direction when clicked twice"""
+        if self.sort_field == field:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_field = field
+            self.sort_descending = False
+
+        for heading, column_field in zip(self.headings, self.fields):
+            arrow = ""
+            if column_field == field:
+                arrow = " ▼" if self.sort_descending else " ▲"
+            self.tree.heading(heading, text=heading + arrow)
+        self.refresh_view()
+
+    def set_filter(self, text):
+        """Show only rows containing ``text`` in any column"""
+        self.filter_text = text.strip()
+        self.offset = 0
+        self.refresh_view()
+
+    # ------------------------------------------------------------------
+    # Rendering
+    # ------------------------------------------------------------------
+    def render(self):
+        """Write the visible window of rows into the pooled tree items"""
+        total = len(self.view_rows)
+        self.slot_rows = self.view_rows[self.offset:self.offset + len(self.slots)]
+        values = self.store.values(self.slot_rows, self.fields)
+
+        for index, item in enumerate(self.slots):
+            if index < len(values):
+                self.tree.item(item, values=values[index])
+                if index >= self.attached:
+                    self.tree.move(item, "", index)
+            elif index < self.attached:
+                self.tree.detach(item)
+        self.attached = min(len(values), len(self.slots))
+
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + len(self.slots)) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+        if hasattr(self, "count_label"):
+            self.count_label.configure(text=f"{total:,} of {len(self.store.rows(self.category)):,} tracks")
+
+    def scroll_to(self, offset):
+        limit = max(0, len(self.view_rows) - len(self.slots))
+        offset = max(0, min(int(offset), limit))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def scroll_by(self, count):
+        self.scroll_to(self.offset + count)
+        return "break"
+
+    def on_scrollbar(self, action, amount, unit=None):
+        """Translate scrollbar commands into row offsets"""
+        if action == "moveto":
+            self.scroll_to(float(amount) * len(self.view_rows))
+        elif action == "scroll":
+            step = len(self.slots) if unit == "pages" else 1
+            self.scroll_by(int(amount) * step)
+
+    def on_mousewheel(self, event):
+        return self.scroll_by(-3 if event.delta > 0 else 3)
+
+    def on_resize(self, event):
+        """Resize the item pool once the burst of <Configure> events has settled"""
+        if self._pending_resize is None:
+            self._pending_resize = self.after_idle(self.fit_pool)
+
+    def fit_pool(self):
+        """Grow or shrink the item pool to the number of rows that fit.
+
+        The tree's requested height is left alone: it is sized by its
+        container, and changing it here would trigger another <Configure>.
+        """
+        self._pending_resize = None
+        row_height = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        wanted = max(1, (self.tree.winfo_height() - row_height) // row_height)
+        if wanted == len(self.slots):
+            return
+        while len(self.slots) < wanted:
+            item = self.tree.insert("", tk.END, values=())
+            self.tree.detach(item)
+            self.slots.append(item)
+        while len(self.slots) > wanted:
+            self.tree.delete(self.slots.pop())
+        self.attached = min(self.attached, len(self.slots))
+        self.offset = max(0, min(self.offset, len(self.view_rows) - wanted))
+        self.render()
+
+    def on_store_change(self, rows, columns):
+        """Update visible cells in place when telemetry changes the store"""
+        if ('category' in columns or self.sort_field in columns
+                or (self.filter_text and set(columns) & set(self.fields))):
+            self.refresh_view()
+            return
+
+        if not set(columns) & set(self.fields):
+            return
+        visible = np.flatnonzero(np.isin(self.slot_rows, rows))
+        if len(visible) == 0:
+            return
+        values = self.store.values(self.slot_rows[visible], self.fields)
+        for slot, row_values in zip(visible, values):
+            self.tree.item(self.slots[slot], values=row_values)
+
+    def on_destroy(self, event):
+        if event.widget is self:
+            if self._pending_resize is not None:
+                self.after_cancel(self._pending_resize)
+            self.store.unsubscribe(self.on_store_change)